@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import argparse
+
+# Ensure local 'src' package is importable when running from repo root
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC_PATH = os.path.join(REPO_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from processing.detector import ObjectDetector
+from input_ouput.image_sequence import ImageSequenceSource
+
+
+def load_frames(frames_dir, max_frames):
+    source = ImageSequenceSource(frames_dir, max_frames=max_frames)
+    frames = []
+    while True:
+        frame = source.get_frame()
+        if frame is None:
+            break
+        frames.append(frame)
+    source.release()
+    return frames
+
+
+def run_per_frame(model, frames):
+    detector = ObjectDetector(model_name=model)
+    detector.detect_and_track(frames[0])  # warm-up (model fuse, tracker init)
+    detector = ObjectDetector(model_name=model)
+    start = time.perf_counter()
+    outputs = [detector.detect_and_track(f) for f in frames]
+    return time.perf_counter() - start, outputs
+
+
+def run_batched(model, frames, batch_size):
+    detector = ObjectDetector(model_name=model)
+    detector.detect_and_track_batch(frames[:batch_size])  # warm-up
+    detector = ObjectDetector(model_name=model)
+    start = time.perf_counter()
+    outputs = []
+    for i in range(0, len(frames), batch_size):
+        outputs.extend(detector.detect_and_track_batch(frames[i:i + batch_size]))
+    return time.perf_counter() - start, outputs
+
+
+def same_ids(a, b):
+    return all([int(d['id']) for d in fa] == [int(d['id']) for d in fb] for fa, fb in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-frame vs batched detector throughput on a frame directory")
+    parser.add_argument('--frames', default=os.path.join('assets', '0001'), help='Directory with ordered frames (default assets/0001)')
+    parser.add_argument('--model', default='yolov8s.pt', help='YOLO model name/path (default yolov8s.pt)')
+    parser.add_argument('--max-frames', type=int, default=120, help='Frames used for the benchmark (default 120)')
+    parser.add_argument('--batch-sizes', nargs='*', type=int, default=[2, 4, 8], help='Batch sizes to compare')
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.max_frames)
+    n = len(frames)
+    print(f"Benchmark on {n} frames from {args.frames}")
+
+    base_time, base_out = run_per_frame(args.model, frames)
+    print(f"{'mode':<12}{'fps':>10}{'speedup':>10}{'ids match':>12}")
+    print(f"{'per-frame':<12}{n / base_time:>10.2f}{1.0:>10.2f}{'-':>12}")
+
+    for bs in args.batch_sizes:
+        t, out = run_batched(args.model, frames, bs)
+        print(f"{'batch=' + str(bs):<12}{n / t:>10.2f}{base_time / t:>10.2f}{str(same_ids(base_out, out)):>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import time
+import random
+import argparse
+
+import cv2
+import numpy as np
+
+from src.behavior.state_machine import SAFE_STATE, WARNING_STATE, DANGER_STATE
+from src.input_ouput.hud_renderer import HudRenderer
+
+DISPLAY_SIZE = (1280, 720)
+
+
+def draw_then_resize(frame, tracks):
+    """Previous rendering path: annotate at full resolution, then downscale the whole frame."""
+    for obj_id, (x1, y1, x2, y2), state in tracks:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), state.color, 2)
+        label = f"ID:{obj_id} [{state.name}]"
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+        cv2.rectangle(frame, (x1, y1 - 20), (x1 + w, y1), state.color, -1)
+        cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+    return cv2.resize(frame, DISPLAY_SIZE)
+
+
+def synthetic_tracks(num_tracks, width, height, seed=0):
+    rng = random.Random(seed)
+    states = (SAFE_STATE, WARNING_STATE, DANGER_STATE)
+    tracks = []
+    for i in range(num_tracks):
+        bw, bh = rng.randint(40, width // 5), rng.randint(30, height // 5)
+        x1, y1 = rng.randint(0, width - bw), rng.randint(20, height - bh)
+        tracks.append((i, (x1, y1, x1 + bw, y1 + bh), rng.choice(states)))
+    return tracks
+
+
+def time_per_frame(render, frame, tracks, repeats):
+    # Each iteration draws on a fresh copy, as the pipeline does with a new frame; the copy is not timed
+    copies = [frame.copy() for _ in range(repeats)]
+    start = time.perf_counter()
+    for f in copies:
+        render(f, tracks)
+    return 1000.0 * (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HUD render time per frame vs number of tracks")
+    parser.add_argument('--width', type=int, default=1920, help='Input frame width (default 1920)')
+    parser.add_argument('--height', type=int, default=1080, help='Input frame height (default 1080)')
+    parser.add_argument('--tracks', nargs='*', type=int, default=[0, 5, 20, 50, 100], help='Numbers of tracks to compare')
+    parser.add_argument('--repeats', type=int, default=50, help='Frames rendered per measurement (default 50)')
+    args = parser.parse_args()
+
+    frame = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    hud = HudRenderer(DISPLAY_SIZE)
+
+    print(f"Input {args.width}x{args.height} -> {DISPLAY_SIZE[0]}x{DISPLAY_SIZE[1]}")
+    print(f"{'tracks':<10}{'draw+resize ms':>16}{'HudRenderer ms':>16}{'speedup':>10}")
+    for n in args.tracks:
+        tracks = synthetic_tracks(n, args.width, args.height)
+        hud.recycle(hud.render(frame, tracks))  # warm-up: buffers and label cache
+        old = time_per_frame(draw_then_resize, frame, tracks, args.repeats)
+        new = time_per_frame(lambda f, t: hud.recycle(hud.render(f, t)), frame, tracks, args.repeats)
+        print(f"{n:<10}{old:>16.2f}{new:>16.2f}{old / new:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import os
+import time
+import argparse
+
+import easyocr
+
+from src.input_ouput.image_sequence import ImageSequenceSource
+from src.processing.plate_recognizer import recognize_plate, recognize_plates_batch, OCR_LANGUAGES
+
+
+def load_crops(crops_dir, max_crops):
+    source = ImageSequenceSource(crops_dir, max_frames=max_crops)
+    crops = []
+    while True:
+        crop = source.get_frame()
+        if crop is None:
+            break
+        crops.append(crop)
+    source.release()
+    return crops
+
+
+def bench_localization(reader, crops):
+    """OCR time per crop on the full vehicle crop vs. localized plate regions."""
+    print(f"{'mode':<12}{'ms/crop':>10}{'plates':>10}")
+    for name, localize in (("full-crop", False), ("localized", True)):
+        start = time.perf_counter()
+        plates = sum(1 for crop in crops if recognize_plate(reader, crop, localize=localize))
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12}{1000.0 * elapsed / len(crops):>10.1f}{plates:>10}")
+
+
+def bench_batching(reader, crops, batch_sizes, localize):
+    """Throughput (crops/s) of recognize_plates_batch at different batch sizes."""
+    print(f"{'batch':<12}{'crops/s':>10}{'plates':>10}")
+    for bs in batch_sizes:
+        start = time.perf_counter()
+        plates = 0
+        for i in range(0, len(crops), bs):
+            plates += sum(1 for plate, _ in recognize_plates_batch(reader, crops[i:i + bs], localize=localize) if plate)
+        elapsed = time.perf_counter() - start
+        print(f"{bs:<12}{len(crops) / elapsed:>10.2f}{plates:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR time per vehicle crop")
+    parser.add_argument('--crops', default=os.path.join('assets', 'crops'),
+                        help='Directory with vehicle crop images (default assets/crops)')
+    parser.add_argument('--max-crops', type=int, default=100, help='Crops used for the benchmark (default 100)')
+    parser.add_argument('--batch-sizes', nargs='*', type=int, default=[1, 2, 4, 8], help='Batch sizes to compare')
+    parser.add_argument('--no-localize', action='store_true', help='Disable plate localization in the batch benchmark')
+    args = parser.parse_args()
+
+    crops = load_crops(args.crops, args.max_crops)
+    print(f"Benchmark on {len(crops)} crops from {args.crops}")
+
+    reader = easyocr.Reader(OCR_LANGUAGES, gpu=False)
+    # Warm-up: the first call pays model initialization
+    recognize_plate(reader, crops[0], localize=False)
+
+    bench_localization(reader, crops)
+    print()
+    bench_batching(reader, crops, args.batch_sizes, localize=not args.no_localize)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import os
+import random
+import time
+import argparse
+import tracemalloc
+import contextlib
+
+from src.behavior.state_machine import TrackedObject
+
+FRAME_W, FRAME_H = 1280, 720
+
+
+def synthetic_detections(num_tracks, num_frames, seed=0):
+    """Per-frame detections of num_tracks vehicles that drift, grow and shrink randomly."""
+    rng = random.Random(seed)
+    cars = [[rng.randint(200, 1080), rng.randint(100, 620), rng.randint(20, 120)] for _ in range(num_tracks)]
+    frames = []
+    for _ in range(num_frames):
+        dets = []
+        for i, car in enumerate(cars):
+            car[0] += rng.randint(-5, 5)
+            car[2] = max(5, car[2] + rng.choice([-2, 0, 1, 3]))
+            x1, y1 = car[0] - car[2], car[1] - car[2] // 2
+            x2, y2 = car[0] + car[2], car[1] + car[2] // 2
+            dets.append({'id': i, 'bbox': (x1, y1, x2, y2), 'class_id': 2,
+                         'center': (int((x1 + x2) / 2), int((y1 + y2) / 2))})
+        frames.append(dets)
+    return frames
+
+
+def bench_update(num_tracks, num_frames):
+    """Average TrackedObject.update time (debug prints suppressed)."""
+    frames = synthetic_detections(num_tracks, num_frames)
+    objects = [TrackedObject(d['id'], d) for d in frames[0]]
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for dets in frames:
+            for obj, det in zip(objects, dets):
+                obj.update(det, FRAME_W, FRAME_H)
+        elapsed = time.perf_counter() - start
+    return 1e6 * elapsed / (num_tracks * num_frames)
+
+
+def bench_memory(num_tracks, warmup_frames=30):
+    """Bytes still allocated per track once its history buffers are full (input detections excluded)."""
+    frames = synthetic_detections(num_tracks, warmup_frames)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        objects = [TrackedObject(d['id'], d) for d in frames[0]]
+        for dets in frames:
+            for obj, det in zip(objects, dets):
+                obj.update(det, FRAME_W, FRAME_H)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return allocated / num_tracks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of TrackedObject: time per update and memory per track")
+    parser.add_argument('--tracks', nargs='*', type=int, default=[10, 50, 200], help='Numbers of tracks to compare')
+    parser.add_argument('--frames', type=int, default=300, help='Updates per track (default 300)')
+    args = parser.parse_args()
+
+    print(f"{'tracks':<10}{'us/update':>12}{'bytes/track':>14}")
+    for n in args.tracks:
+        us = bench_update(n, args.frames)
+        per_track = bench_memory(n)
+        print(f"{n:<10}{us:>12.2f}{per_track:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
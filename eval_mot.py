@@ -1,65 +1,71 @@
-import os
-import sys
-import argparse
-import cv2
-
-# Ensure local 'src' package is importable when running from repo root
-REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
-SRC_PATH = os.path.join(REPO_ROOT, 'src')
-if SRC_PATH not in sys.path:
-    sys.path.append(SRC_PATH)
-
-from evaluation.gt_loader import init_gt_loader, get_gt_for_frame
-from evaluation.mot_evaluator import MotEvaluator
-from processing.detector import ObjectDetector
-
-
-def list_images_sorted(frames_dir):
-    exts = {'.jpg', '.jpeg', '.png', '.bmp'}
-    files = [f for f in os.listdir(frames_dir) if os.path.splitext(f)[1].lower() in exts]
-    files.sort()
-    return [os.path.join(frames_dir, f) for f in files]
-
-
-def main():
-    parser = argparse.ArgumentParser(description="Evaluate MOT metrics over a frame directory using gt.csv")
-    parser.add_argument('--frames', default=os.path.join('assets', '0001'), help='Directory with ordered frames (default assets/0001)')
-    parser.add_argument('--gt', default=os.path.join('assets', 'gt.csv'), help='Path to GT CSV (default assets/gt.csv)')
-    parser.add_argument('--model', default='yolov8s.pt', help='YOLO model name/path (default yolov8s.pt)')
-    parser.add_argument('--iou', type=float, default=0.5, help='IoU threshold for matching (default 0.5)')
-    parser.add_argument('--max-frames', type=int, default=None, help='Optional limit on frames processed')
-    parser.add_argument('--pred-classes', nargs='*', type=int, default=[2, 5, 7],
-                        help='Filter predictions to these COCO class IDs (car=2, bus=5, truck=7)')
-
-    args = parser.parse_args()
-
-    frames = list_images_sorted(args.frames)
-    if not frames:
-        raise RuntimeError(f"No image frames found in {args.frames}")
-
-    # Init GT loader and evaluator
-    init_gt_loader(args.gt)
-    evaluator = MotEvaluator(iou_threshold=args.iou, id_tag=os.path.basename(args.frames.rstrip('/\\')) or 'run')
-
-    # Init detector once
-    detector = ObjectDetector(model_name=args.model)
-
-    for idx, img_path in enumerate(frames):
-        if args.max_frames is not None and idx >= args.max_frames:
-            break
-        img = cv2.imread(img_path)
-        if img is None:
-            continue
-
-        preds = detector.detect_and_track(img)
-        if args.pred_classes is not None:
-            preds = [p for p in preds if int(p.get('class_id', -1)) in args.pred_classes]
-
-        gt = get_gt_for_frame(idx)
-        evaluator.update(idx, gt, preds)
-
-    evaluator.print_summary()
-
-
-if __name__ == '__main__':
-    main()
+import os
+import sys
+import argparse
+
+# Ensure local 'src' package is importable when running from repo root
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC_PATH = os.path.join(REPO_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from evaluation.gt_loader import init_gt_loader, get_gt_for_frame
+from evaluation.mot_evaluator import MotEvaluator
+from processing.detector import ObjectDetector
+from input_ouput.image_sequence import ImageSequenceSource
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate MOT metrics over a frame directory using gt.csv")
+    parser.add_argument('--frames', default=os.path.join('assets', '0001'), help='Directory with ordered frames (default assets/0001)')
+    parser.add_argument('--gt', default=os.path.join('assets', 'gt.csv'), help='Path to GT CSV (default assets/gt.csv)')
+    parser.add_argument('--model', default='yolov8s.pt', help='YOLO model name/path (default yolov8s.pt)')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU threshold for matching (default 0.5)')
+    parser.add_argument('--max-frames', type=int, default=None, help='Optional limit on frames processed')
+    parser.add_argument('--pred-classes', nargs='*', type=int, default=[2, 5, 7],
+                        help='Filter predictions to these COCO class IDs (car=2, bus=5, truck=7)')
+    parser.add_argument('--decode-workers', type=int, default=4, help='Threads decoding frames ahead (default 4)')
+    parser.add_argument('--prefetch', type=int, default=8, help='Max decoded frames kept in memory (default 8)')
+    parser.add_argument('--backend', default='pytorch', choices=['pytorch', 'onnx', 'openvino'],
+                        help='Inference backend; onnx/openvino export once and cache next to the weights')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for inference (default: runtime default)')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Frames per batched detector forward pass (default 1 = per-frame)')
+
+    args = parser.parse_args()
+
+    try:
+        source = ImageSequenceSource(args.frames, num_workers=args.decode_workers,
+                                     prefetch=args.prefetch, max_frames=args.max_frames)
+    except ValueError as e:
+        raise RuntimeError(f"No image frames found in {args.frames}") from e
+
+    # Init GT loader and evaluator
+    init_gt_loader(args.gt)
+    evaluator = MotEvaluator(iou_threshold=args.iou, id_tag=os.path.basename(args.frames.rstrip('/\\')) or 'run')
+
+    # Init detector once
+    detector = ObjectDetector(model_name=args.model, backend=args.backend, num_threads=args.threads)
+
+    while True:
+        frames, indices = source.get_batch(args.batch_size)
+        if not frames:
+            break
+
+        if args.batch_size > 1:
+            batch_preds = detector.detect_and_track_batch(frames)
+        else:
+            batch_preds = [detector.detect_and_track(frames[0])]
+
+        for idx, preds in zip(indices, batch_preds):
+            if args.pred_classes is not None:
+                preds = [p for p in preds if int(p.get('class_id', -1)) in args.pred_classes]
+
+            gt = get_gt_for_frame(idx)
+            evaluator.update(idx, gt, preds)
+
+    source.release()
+    evaluator.print_summary()
+
+
+if __name__ == '__main__':
+    main()
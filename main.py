@@ -1,164 +1,327 @@
-import cv2
-import traceback
-import os
-
-from src.input_ouput.video_facade import VideoInputFacade
-from src.processing.detector import ObjectDetector
-# Importiamo il Manager e l'Observer invece delle singole classi logiche
-from src.behavior.risk_observer import TrackManager, ConsoleAlertObserver
-from src.data.db_manager import DBManager
-from src.processing.plate_recognizer import PlateRecognizer
-
-
-
-def draw_hud(frame, tracks):
-
-    """.
-    Disegna box e testi sul frame.
-    """
-    for obj in tracks:
-        # Nota: il detector restituisce 'bbox', assicuriamoci che l'oggetto lo abbia aggiornato
-        x1, y1, x2, y2 = obj.info['bbox']
-        
-        #  chiediamo il colore allo stato corrente dell'oggetto
-        color = obj.state.color
-        state_name = obj.state.name
-        
-        # Disegno del box
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        
-        # Etichetta sfondo nero per leggibilità
-        label = f"ID:{obj.id} [{state_name}]"
-        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-        cv2.rectangle(frame, (x1, y1 - 20), (x1 + w, y1), color, -1)
-        cv2.putText(frame, label, (x1, y1 - 5), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-
-def main():
-
-# CONFIGURAZIONE
-   # video_path = "http://192.168.1.9:8080/video"  # Sostituisci con 0 per la webcam
-    video_path = "assets/videoOBS/video4.mp4"
-    model_name = "yolov8s.pt"  # Modello YOLO da usare
-    conf_threshold = 0.50   # Soglia di confidenza per il detector
-
-    
-    try:
-        # 1. INIZIALIZZAZIONE COMPONENTI
-        video_loader = VideoInputFacade(video_path)
-        # Otteniamo le dimensioni del video per i calcoli di rischi
-        w, h, fps = video_loader.get_video_info()
-        detector = ObjectDetector(model_name=model_name,conf_threshold=conf_threshold)
-        
-        # 2. INIZIALIZZAZIONE LOGICA COMPORTAMENTALE
-        manager = TrackManager()            # Il "Cervello" che gestisce le tracce
-        alert_system = ConsoleAlertObserver() # La "Voce" che urla in caso di pericolo
-        manager.attach(alert_system)   # Colleghiamo l'observer al manager
-
-        # 3. INIZIALIZZAZIONE DB E OCR
-        print("Connessione al database in corso...")
-        try:
-            db_manager = DBManager()
-            print("Connessione al database stabilita con successo.")
-        except Exception as e:
-            print(f"ERRORE CRITICO: Impossibile connettersi al database: {e}")
-            # Non ritorniamo, continuiamo senza DB se necessario, o ritorniamo se è bloccante.
-            # return 
-
-        plate_recognizer = PlateRecognizer()
-        
-        # ID Mapping for reassignments
-        id_map = {}
-
-        #evaluator = MotEvaluator(iou_threshold=0.5, id_tag="run-1")
-
-        print(f"Sistema avviato. Risoluzione: {w}x{h}")
-
-        frame_count = 0
-        while True:
-            # A. INPUT
-            frame = video_loader.get_frame()
-            if frame is None: break 
-            frame_count += 1
-
-            # B. PROCESSING (YOLO)
-            
-            # Check for ID reassignments from PlateRecognizer
-            reassignments = plate_recognizer.get_pending_reassignments()
-            for old_id, new_id in reassignments:
-                print(f"[MAIN] Applying reassignment: {old_id} -> {new_id}")
-                
-                # Update existing mappings that point to old_id to point to new_id
-                for k, v in id_map.items():
-                    if v == old_id:
-                        id_map[k] = new_id
-                
-                id_map[old_id] = new_id
-                # Also merge history in PlateRecognizer so it knows about the new ID
-                plate_recognizer.merge_history(old_id, new_id)
-
-            # --- OCR PLATE MAP (sync for this frame) ---
-            ocr_plate_map = {}  # {(x1, y1, x2, y2): plate_text}
-            # Optionally, you could maintain a shared structure between PlateRecognizer and here
-            # For demo: let's assume you have a synchronous recognizer for this step
-            # (If not, you need to collect confirmed plates from PlateRecognizer's history)
-
-            # For each detection, try to get a confirmed plate from PlateRecognizer
-            for det in detections if 'detections' in locals() else []:
-                bbox = det['bbox']
-                obj_id = det['id']
-                # Try to get the most common plate for this obj_id from PlateRecognizer
-                plate = None
-                if obj_id in plate_recognizer.plate_history:
-                    counts = plate_recognizer.plate_history[obj_id]
-                    if counts:
-                        from collections import Counter
-                        c = Counter(counts)
-                        most_common, count = c.most_common(1)[0]
-                        if count >= 3:
-                            plate = most_common
-                if plate:
-                    ocr_plate_map[bbox] = plate
-
-            # Set the map for the detector to use in this frame
-            detector.ocr_plate_map = ocr_plate_map if ocr_plate_map else None
-
-            # Now run detection/tracking
-            detections = detector.detect_and_track(frame)
-
-            # Apply ID mapping to detections
-            for det in detections:
-                # If this ID has been remapped, update it
-                if det['id'] in id_map:
-                    det['id'] = id_map[det['id']]
-
-            # C. LOGIC (Observer + State Pattern)
-            manager.update_tracks(detections, w, h)
-            
-
-            # D. OCR (Riconoscimento Targhe)
-            for det in detections:
-                obj_id = det['id']
-                bbox = det['bbox']
-                bbox_w = bbox[2] - bbox[0]
-                if frame_count % 5 == 0 and bbox_w > 70:
-                    plate_recognizer.add_to_queue(frame, obj_id, bbox)
-
-            # E. RENDERING
-            current_objects = manager.get_tracks()
-            draw_hud(frame, current_objects)
-
-            display_frame = cv2.resize(frame, (1280, 720))
-            cv2.imshow("SafeDrive", display_frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-        video_loader.release()
-        cv2.destroyAllWindows()
-
-
-    except Exception as e:
-        print(f"Errore critico: {e}")
-        traceback.print_exc()
-
-if __name__ == "__main__":
+import cv2
+import traceback
+import os
+import argparse
+
+from src.input_ouput.video_facade import VideoInputFacade
+from src.input_ouput.video_writer import AsyncVideoWriter
+from src.input_ouput.hud_renderer import HudRenderer
+from src.processing.detector import ObjectDetector
+# Importiamo il Manager e l'Observer invece delle singole classi logiche
+from src.behavior.risk_observer import TrackManager, ConsoleAlertObserver
+from src.data.detection_history import DetectionHistory, FileHistoryBackend, MongoHistoryBackend
+from src.data.event_stream import EventStreamWriter
+from src.processing.plate_recognizer import PlateRecognizer
+from src.processing.identity_registry import IdentityRegistry
+from src.processing.quality_scheduler import QualityScheduler
+from src.processing.pipeline import PipelineRunner, Stage, MODE_LATENCY, MODE_THROUGHPUT
+
+
+
+def track_snapshot(tracks):
+    """
+    Copia leggera delle tracce per il rendering: (id, bbox, stato) per oggetto.
+    """
+    return [(obj.id, obj.info['bbox'], obj.state) for obj in tracks]
+
+DISPLAY_SIZE = (1280, 720)  # Risoluzione della finestra e del video annotato
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SafeDrive: collision warning da video o webcam")
+    parser.add_argument('--video', default="assets/videoOBS/video4.mp4",
+                        help='File video, URL dello stream o indice della webcam (es. 0)')
+    parser.add_argument('--headless', action='store_true',
+                        help='Nessuna finestra (unità senza display): usare --output-video e/o --events')
+    parser.add_argument('--output-video', default=None,
+                        help='Salva il video annotato (codifica in un thread separato, non rallenta la detection)')
+    parser.add_argument('--events', default=None,
+                        help='File JSON-lines con tracce, stati e allarmi per frame '
+                             '("-" = standard output, tutti gli altri messaggi vanno su standard error)')
+    parser.add_argument('--events-only-changes', action='store_true',
+                        help='Scrive solo i frame con almeno un evento (allarmi, tracce nuove o perse)')
+    parser.add_argument('--history', choices=['file', 'mongo'], default=None,
+                        help='Storico delle traiettorie per ricostruire gli incidenti: "file" (locale, offline) '
+                             'o "mongo" (default: disattivato)')
+    parser.add_argument('--history-path', default="output/detection_history.jsonl",
+                        help='File dello storico con --history file (accumula le esecuzioni, distinte per run_id)')
+    parser.add_argument('--pipeline-mode', choices=[MODE_LATENCY, MODE_THROUGHPUT], default=None,
+                        help='Default: latency-first per sorgenti live, throughput-first per i file')
+    parser.add_argument('--sequential', action='store_true', help='Tutti gli stadi nello stesso thread')
+    parser.add_argument('--adaptive-quality', choices=['auto', 'on', 'off'], default='auto',
+                        help='Degrada la qualità quando si supera il budget per frame (auto = solo sorgenti live)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+# CONFIGURAZIONE
+   # video_path = "http://192.168.1.9:8080/video"  # Sostituisci con 0 per la webcam
+    video_path = args.video
+    model_name = "yolov8s.pt"  # Modello YOLO da usare
+    conf_threshold = 0.50   # Soglia di confidenza per il detector
+    backend = "pytorch"     # "pytorch", "onnx" o "openvino" (più veloci su CPU senza GPU)
+    num_threads = None      # Thread CPU per l'inferenza (None = default del runtime)
+    keyframe_interval = 1   # YOLO ogni K frame, box propagati con optical flow negli altri (1 = sempre YOLO)
+    imgsz = 640             # Risoluzione di inferenza di YOLO
+    scene_change_threshold = 0.08  # Cambio di scena (0-1) che forza un keyframe anticipato
+    roi_mode = False        # YOLO solo sul ritaglio della corsia (+ margine), frame intero ogni 10 passaggi
+    feature_max_side = 128  # Lato massimo del ritaglio per l'istogramma TOOCM (None = risoluzione piena)
+    ocr_workers = 2         # Processi OCR, ognuno con il proprio EasyOCR (0 = thread nel processo principale)
+    ocr_queue_size = 32     # Ritagli massimi in attesa di OCR
+    ocr_batch_size = 4      # Ritagli elaborati insieme da un processo OCR (attesa massima 20 ms per riempire il batch)
+    ocr_candidate_interval = 5  # Ogni quanti frame si propone un ritaglio candidato per l'OCR (come in origine)
+    ocr_scheduling = "priority"  # "priority" (DANGER/WARNING e targhe non confermate prima) o "fifo"
+    ocr_overflow_policy = "drop-per-track-duplicates"  # solo "fifo": "drop-oldest", "drop-per-track-duplicates" o "block"
+    threaded_capture = True  # Decodifica dei frame in un thread separato (buffer circolare)
+    history_backend = args.history  # Storico delle traiettorie: "file" (locale, offline), "mongo" o None (disattivato)
+    history_path = args.history_path
+    history_chunk_frames = 300  # Frame per blocco colonnare scritto in blocco nello storico
+    pipelined = not args.sequential  # Cattura, detection, logica e rendering su thread separati collegati da code limitate
+    pipeline_mode = args.pipeline_mode  # "latency-first" (scarta frame sotto carico), "throughput-first" (nessuno scartato)
+                            # o None: latency-first per sorgenti live, throughput-first per i file
+    pipeline_queue_size = 2  # Frame massimi in attesa davanti a ogni stadio
+    headless = args.headless  # Nessuna finestra: output solo su file / stream di eventi
+    output_video = args.output_video
+    output_queue_size = 8   # Frame massimi in attesa di codifica (oltre: scartati, mai bloccare la pipeline)
+    adaptive_quality = args.adaptive_quality  # Budget per frame = 1/fps; sopra budget: niente OCR, imgsz ridotto,
+                                              # keyframe più radi, poi frame scartati (e ritorno quando c'è margine)
+    reduced_imgsz = 480     # imgsz usato dallo scheduler adattivo (multiplo di 32)
+    degraded_keyframe_interval = 3  # K usato dallo scheduler adattivo
+
+    
+    try:
+        # Stream di eventi per primo: con "-" si prende lo standard output prima che
+        # qualunque componente stampi, e da qui in poi ogni altro messaggio va su stderr
+        event_stream = None
+        if args.events:
+            event_stream = EventStreamWriter(args.events, only_changes=args.events_only_changes)
+
+        # 1. INIZIALIZZAZIONE COMPONENTI
+        # Sorgenti live -> "latest-only" (scarta i frame vecchi), file -> "lossless"
+        video_loader = VideoInputFacade(video_path, threaded=threaded_capture)
+        # Otteniamo le dimensioni del video per i calcoli di rischi
+        w, h, fps = video_loader.get_video_info()
+        detector = ObjectDetector(model_name=model_name,conf_threshold=conf_threshold, imgsz=imgsz,
+                                  backend=backend, num_threads=num_threads,
+                                  keyframe_interval=keyframe_interval,
+                                  scene_change_threshold=scene_change_threshold,
+                                  roi_mode=roi_mode,
+                                  feature_max_side=feature_max_side)
+        
+        # 2. INIZIALIZZAZIONE LOGICA COMPORTAMENTALE
+        manager = TrackManager()            # Il "Cervello" che gestisce le tracce
+        if args.events != "-":
+            # Con gli eventi su stdout gli allarmi sono già nello stream
+            alert_system = ConsoleAlertObserver() # La "Voce" che urla in caso di pericolo
+            manager.attach(alert_system)   # Colleghiamo l'observer al manager
+        if event_stream is not None:
+            manager.attach(event_stream)
+
+        # 3. INIZIALIZZAZIONE DB E OCR
+        # Il DB delle targhe è del PlateRecognizer: il DBManager non si connette nel costruttore,
+        # quindi un database spento non blocca l'avvio né disattiva l'OCR
+
+        # Storico delle rilevazioni per la ricostruzione degli incidenti
+        detection_history = None
+        if history_backend == "mongo":
+            detection_history = DetectionHistory(MongoHistoryBackend(), chunk_frames=history_chunk_frames)
+        elif history_backend == "file":
+            detection_history = DetectionHistory(FileHistoryBackend(history_path), chunk_frames=history_chunk_frames)
+
+        # Uscite per l'esecuzione senza display
+        # Buffer di display riusati: il video writer li restituisce al renderer dopo la codifica
+        hud = HudRenderer(DISPLAY_SIZE, num_buffers=output_queue_size + 2 if output_video else 1)
+        video_writer = None
+        if output_video:
+            video_writer = AsyncVideoWriter(output_video, fps, DISPLAY_SIZE, queue_size=output_queue_size,
+                                            on_done=hud.recycle)
+
+        plate_recognizer = PlateRecognizer(num_workers=ocr_workers, queue_size=ocr_queue_size,
+                                           overflow_policy=ocr_overflow_policy, scheduling=ocr_scheduling,
+                                           batch_size=ocr_batch_size)
+        
+        # Registro condiviso delle identità: un'unione di ID sposta memoria TOOCM e storico OCR
+        # sull'ID che sopravvive; il TrackManager riallinea le proprie tracce nel thread della logica
+        identity = IdentityRegistry()
+        detector.identity = identity
+        manager.identity = identity
+        plate_recognizer.identity = identity
+        identity.on_merge(detector.memory.merge_ids)
+        identity.on_merge(plate_recognizer.merge_history)
+
+        #evaluator = MotEvaluator(iou_threshold=0.5, id_tag="run-1")
+
+        print(f"Sistema avviato. Risoluzione: {w}x{h}")
+
+        # --- STADI DELLA PIPELINE ---
+        # Ogni frame viaggia come un dizionario con i propri risultati: gli stadi successivi
+        # lavorano su frame diversi in parallelo senza mescolarne i dati.
+        frame_count = 0
+        last_detections = []
+        last_behavior_index = 0  # ultimo frame arrivato alla logica (per il TTC con frame scartati)
+
+        # Scheduler adattivo: misura gli stadi e sceglie il livello di qualità
+        if adaptive_quality == 'auto':
+            adaptive_quality = 'on' if video_loader.is_live else 'off'
+        scheduler = None
+        if adaptive_quality == 'on':
+            scheduler = QualityScheduler(fps, pipelined=pipelined, base_imgsz=imgsz, reduced_imgsz=reduced_imgsz,
+                                         base_keyframe_interval=keyframe_interval,
+                                         degraded_keyframe_interval=degraded_keyframe_interval)
+
+        def capture():
+            # A. INPUT
+            nonlocal frame_count
+            while True:
+                frame = video_loader.get_frame()
+                if frame is None:
+                    return None
+                frame_count += 1
+                # Ultimo livello di degradazione: i frame scartati non entrano nemmeno nella pipeline
+                if scheduler is None or scheduler.should_process(frame_count):
+                    return {"index": frame_count, "frame": frame}
+
+        def detect(item):
+            # B. PROCESSING (YOLO)
+            nonlocal last_detections
+            
+            # Check for ID reassignments from PlateRecognizer
+            reassignments = plate_recognizer.get_pending_reassignments()
+            visible_ids = {det['id'] for det in last_detections}
+            for old_id, new_id in reassignments:
+                # Due ID visibili nello stesso frame sono due veicoli distinti (lettura OCR errata):
+                # unirli darebbe lo stesso ID a due rilevazioni
+                if identity.resolve(old_id) in visible_ids and identity.resolve(new_id) in visible_ids:
+                    print(f"[MAIN] Reassignment {old_id} -> {new_id} ignored: both IDs are visible")
+                    continue
+                print(f"[MAIN] Applying reassignment: {old_id} -> {new_id}")
+                identity.merge(old_id, new_id)
+
+            # --- OCR PLATE MAP (sync for this frame) ---
+            # Istantanea thread-safe delle targhe confermate dal PlateRecognizer: {obj_id: targa}
+            confirmed_plates = plate_recognizer.get_confirmed_plates()
+            ocr_plate_map = {}  # {(x1, y1, x2, y2): plate_text}
+            for det in last_detections:
+                plate = confirmed_plates.get(det['id'])
+                if plate:
+                    ocr_plate_map[det['bbox']] = plate
+
+            # Set the map for the detector to use in this frame
+            detector.ocr_plate_map = ocr_plate_map if ocr_plate_map else None
+
+            if scheduler is not None:
+                detector.imgsz = scheduler.imgsz
+                detector.set_keyframe_interval(scheduler.keyframe_interval)
+
+            # Now run detection/tracking (gli ID escono già risolti nell'ID canonico)
+            detections = detector.detect_and_track(item["frame"])
+
+            last_detections = detections
+            item["detections"] = detections
+            return item
+
+        def behavior(item):
+            # C. LOGIC (Observer + State Pattern)
+            nonlocal last_behavior_index
+            detections = item["detections"]
+            # Frame scartati (scheduler o pipeline latency-first): il TTC resta in frame della sorgente
+            frame_gap = item["index"] - last_behavior_index
+            last_behavior_index = item["index"]
+            manager.update_tracks(detections, w, h, frame_gap=frame_gap)
+            if detection_history is not None:
+                detection_history.record(item["index"], manager.get_tracks())
+
+            # D. OCR (Riconoscimento Targhe) - primo servizio sospeso quando si è sopra budget
+            ocr_enabled = scheduler is None or scheduler.ocr_enabled
+            for det in detections:
+                obj_id = det['id']
+                bbox = det['bbox']
+                bbox_w = bbox[2] - bbox[0]
+                # Ogni ritaglio è solo un candidato: per ogni traccia la coda OCR tiene gli ultimi
+                # e manda all'OCR il migliore (nitidezza, dimensione, proporzioni, posizione)
+                if item["index"] % ocr_candidate_interval == 0 and bbox_w > 70 and ocr_enabled:
+                    # Lo stato di rischio decide la priorità del ritaglio nella coda OCR
+                    track = manager.tracks.get(obj_id)
+                    state_name = track.state.name if track is not None else None
+                    plate_recognizer.add_to_queue(item["frame"], obj_id, bbox, state_name=state_name)
+
+            if event_stream is not None:
+                event_stream.write_frame(item["index"], manager.get_tracks())
+
+            # Istantanea delle tracce per il rendering: il manager intanto passa al frame successivo
+            item["tracks"] = track_snapshot(manager.get_tracks())
+            return item
+
+        def render(item):
+            # E. RENDERING
+            if headless and video_writer is None:
+                return item
+            # Prima la resize, poi box ed etichette direttamente alla risoluzione di display
+            display_frame = hud.render(item["frame"], item["tracks"])
+            if not headless:
+                cv2.imshow("SafeDrive", display_frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    runner.stop()
+            # Il buffer torna al renderer dopo la codifica (video writer) o subito dopo la finestra
+            if video_writer is not None:
+                video_writer.write(display_frame)
+            else:
+                hud.recycle(display_frame)
+            return item
+
+        if pipeline_mode is None:
+            pipeline_mode = MODE_LATENCY if video_loader.is_live else MODE_THROUGHPUT
+        # Detection e rendering possono saltare frame (latency-first), la logica comportamentale no
+        runner = PipelineRunner(capture,
+                                [Stage("detect", detect, droppable=True),
+                                 Stage("behavior", behavior),
+                                 Stage("render", render, droppable=True)],
+                                mode=pipeline_mode, queue_size=pipeline_queue_size,
+                                threaded=pipelined,
+                                on_stage=scheduler.record if scheduler is not None else None)
+        runner.run()
+
+        stats = video_loader.get_stats()
+        print(f"Lettura video: {stats['frames_read']} frame letti, {stats['frames_dropped']} scartati, "
+              f"decodifica media {stats['avg_decode_ms']:.1f} ms")
+        print(f"Detector: {detector.detector_calls} frame elaborati da YOLO, {detector.propagated_frames} propagati")
+        mem = detector.memory.get_stats()
+        print(f"Memoria TOOCM: {mem['hits']} recuperi, {mem['misses']} mancati, "
+              f"{mem['evictions']} eliminati per capacità, {mem['expirations']} scaduti")
+        ocr = plate_recognizer.get_stats()
+        print(f"OCR: {ocr['processed']} ritagli elaborati, {ocr['dropped']} scartati, "
+              f"coda {ocr['queue_depth']}, latenza media {ocr['avg_latency_ms']:.0f} ms")
+        print(f"OCR: {ocr['ocr_calls']} chiamate su {ocr['candidates']} candidati, "
+              f"{ocr['confirmed_plates']} targhe confermate "
+              f"({ocr['calls_per_confirmed_plate']:.1f} chiamate per targa)")
+        for name, st in runner.get_stats().items():
+            print(f"Stadio {name}: {st['processed']} frame, {st['dropped']} scartati, "
+                  f"{st['avg_ms']:.1f} ms/frame, occupazione {100 * st['occupancy']:.0f}%, "
+                  f"coda media {st['avg_queue']:.1f}")
+        if scheduler is not None:
+            q = scheduler.get_stats()
+            print(f"Qualità adattiva: livello finale {q['level_name']}, {q['level_changes']} cambi, "
+                  f"{q['time_over_budget_s']:.1f} s sopra il budget di {q['budget_ms']:.1f} ms/frame")
+        if video_writer is not None:
+            video_writer.release()
+            out = video_writer.get_stats()
+            print(f"Video annotato: {out['frames_written']} frame scritti in {output_video}, "
+                  f"{out['frames_dropped']} scartati, codifica media {out['avg_encode_ms']:.1f} ms")
+        if event_stream is not None:
+            event_stream.close()
+        if detection_history is not None:
+            detection_history.close()
+            print(f"Storico (run {detection_history.run_id}): {detection_history.rows_recorded} rilevazioni in "
+                  f"{detection_history.chunks_written} blocchi, "
+                  f"{len(detection_history.danger_episodes())} episodi DANGER")
+        video_loader.release()
+        if not headless:
+            cv2.destroyAllWindows()
+
+
+    except Exception as e:
+        print(f"Errore critico: {e}")
+        traceback.print_exc()
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,75 +1,296 @@
-from abc import ABC, abstractmethod
-# Assicurati che l'import sia corretto in base alla tua struttura
-from src.behavior.state_machine import TrackedObject, DangerState
-from src.behavior.state_machine import SafeState, WarningState
-
-class Observer(ABC):
-    @abstractmethod
-    def update(self, event_type, track_id, message=""):
-        pass
-
-class ConsoleAlertObserver(Observer):
-    def update(self, event_type, track_id, message=""):
-        if event_type == "DANGER":
-            # Codice ANSI per testo ROSSO in console
-            print(f"\033[91m[ALLARME] Veicolo {track_id}: {message}\033[0m")  
-        elif event_type == "NEW_TRACK":
-            print(f"[INFO] Nuova traccia: {track_id}")
-        elif event_type == "LOST_TRACK":
-            print(f"[INFO] Perso contatto: {track_id}")
-
-class TrackManager:
-    """
-    SOGGETTO (Subject). Gestisce gli oggetti e notifica gli Observer.
-    """
-    def __init__(self):
-        self.observers = [] #Lista di chi sta ascoltando (es. la Console)
-        self.tracks = {} # Memoria delle auto (Dizionario ID -> Oggetto)
-
-    def attach(self, observer):
-        self.observers.append(observer) # Aggiunge un nuovo ascoltatore alla lista
-
-    def notify(self, event_type, track_id, message=""):   #Quando succede qualcosa, il Manager non fa print(). Chiama il metodo notify. Questo metodo dice: "Per tutti quelli che mi stanno ascoltando (observers), ecco l'aggiornamento!"
-        for observer in self.observers:
-            observer.update(event_type, track_id, message)
-
-    def update_tracks(self, detections, frame_w, frame_h):
-        active_ids = []
-
-        for det in detections:
-            obj_id = det["id"]           
-            active_ids.append(obj_id)   #prende id e lo mette nella lista degli attivi
-
-            # 1. È una NUOVA traccia?
-            if obj_id not in self.tracks:
-                # l'oggetto new_obj che contiene tutta la logica del file state_machine.py
-                new_obj = TrackedObject(obj_id, det) # Crea nuovo oggetto
-                new_obj.update(det, frame_w, frame_h) # aggiunge l'oggetto
-                
-                self.tracks[obj_id] = new_obj # Memorizza la traccia
-                 #Notifica tutti gli observer che c'è una nuova traccia
-                self.notify("NEW_TRACK", obj_id)
-            else:
-                # 2. Aggiorna traccia ESISTENTE
-                current_obj = self.tracks[obj_id]
-                old_state_name = current_obj.state.name
-                
-                 #Qui il flusso di esecuzione SALTA dal file risk_observer.py al file state_machine.py. Dentro state_machine.py, il metodo update fa i calcoli matematici (Area, Centro). Sempre dentro state_machine.py, l'oggetto decide se cambiare il suo stato interno (es. self.state = DangerState()). Finito il calcolo, il flusso torna al Manager.
-                current_obj.update(det, frame_w, frame_h)
-                
-                new_state_name = current_obj.state.name # Il Manager sbircia dentro l'oggetto per vedere lo stato corrente
-
-                # 3. Controllo cambio stato -> PERICOLO
-                # Se passa a DANGER e prima non lo era, notifica!
-                if new_state_name == "DANGER" and old_state_name != "DANGER":
-                    self.notify("DANGER", obj_id, "COLLISIONE IMMINENTE!")
-
-        # 4. Gestione tracce PERSE
-        current_track_ids = list(self.tracks.keys())
-        for track_id in current_track_ids:
-            if track_id not in active_ids:
-                del self.tracks[track_id]
-                self.notify("LOST_TRACK", track_id)
-                
-    def get_tracks(self):
+from abc import ABC, abstractmethod
+import threading
+import numpy as np
+# Assicurati che l'import sia corretto in base alla tua struttura
+from src.behavior.state_machine import TrackedObject, DangerState
+from src.behavior.state_machine import SafeState, WarningState
+from src.behavior.state_machine import STATES_BY_CODE
+from src.behavior.state_machine import (lane_bounds, DANGER_AREA_RATIO, DANGER_TTC, WARNING_AREA_RATIO,
+                                        WARNING_TTC, CUT_IN_AREA_RATIO, TTC_WINDOW, TTC_MIN_GROWTH,
+                                        STATE_BUFFER_SIZE, STATE_VOTES)
+
+# Codici numerici degli stati usati dalla valutazione vettoriale (indici di STATES_BY_CODE)
+SAFE, WARNING, DANGER = 0, 1, 2
+
+class Observer(ABC):
+    @abstractmethod
+    def update(self, event_type, track_id, message=""):
+        pass
+
+class ConsoleAlertObserver(Observer):
+    def update(self, event_type, track_id, message=""):
+        if event_type == "DANGER":
+            # Codice ANSI per testo ROSSO in console
+            print(f"\033[91m[ALLARME] Veicolo {track_id}: {message}\033[0m")  
+        elif event_type == "NEW_TRACK":
+            print(f"[INFO] Nuova traccia: {track_id}")
+        elif event_type == "LOST_TRACK":
+            print(f"[INFO] Perso contatto: {track_id}")
+        elif event_type == "MERGED":
+            print(f"[INFO] Traccia {track_id} unita a {message}")
+
+class TrackManager:
+    """
+    SOGGETTO (Subject). Gestisce gli oggetti e notifica gli Observer.
+    """
+    def __init__(self, vectorized=True, initial_capacity=64):
+        """
+        :param vectorized: valuta il rischio di tutte le tracce del frame in un unico passaggio NumPy
+                           (stessi risultati di TrackedObject.update, chiamato per oggetto se False).
+        """
+        self.observers = [] #Lista di chi sta ascoltando (es. la Console)
+        self.tracks = {} # Memoria delle auto (Dizionario ID -> Oggetto)
+        self.vectorized = vectorized
+        # Registro condiviso delle identità (IdentityRegistry): se impostato, gli ID delle rilevazioni
+        # vengono risolti nell'ID canonico (frame già in coda prima di un'unione)
+        self.identity = None
+        self._lock = threading.RLock()  # update_tracks e merge_ids possono arrivare da thread diversi
+
+        # Cinematica per traccia in forma vettoriale (una riga per traccia attiva, solo in modalità vettoriale)
+        self._rows = {}       # obj_id -> riga
+        self._row_ids = []    # riga -> obj_id
+        capacity = max(1, int(initial_capacity))
+        self._areas = np.zeros((capacity, TTC_WINDOW))              # ultime aree (buffer circolare)
+        self._area_len = np.zeros(capacity, dtype=np.int64)
+        self._area_pos = np.zeros(capacity, dtype=np.int64)
+        self._votes = np.full((capacity, STATE_BUFFER_SIZE), -1, dtype=np.int8)  # ultime proposte di stato
+        self._vote_pos = np.zeros(capacity, dtype=np.int64)
+        self._state_codes = np.zeros(capacity, dtype=np.int8)       # stato corrente
+
+    def attach(self, observer):
+        self.observers.append(observer) # Aggiunge un nuovo ascoltatore alla lista
+
+    def notify(self, event_type, track_id, message=""):   #Quando succede qualcosa, il Manager non fa print(). Chiama il metodo notify. Questo metodo dice: "Per tutti quelli che mi stanno ascoltando (observers), ecco l'aggiornamento!"
+        for observer in self.observers:
+            observer.update(event_type, track_id, message)
+
+    def update_tracks(self, detections, frame_w, frame_h, frame_gap=1):
+        """
+        :param frame_gap: frame della sorgente trascorsi dal frame precedente passato qui (>1 quando
+                          la pipeline o lo scheduler scartano frame). Il TTC è espresso in frame della
+                          sorgente, così le soglie scattano allo stesso TTC reale anche scartando frame.
+        """
+        with self._lock:
+            if self.identity is not None:
+                # resolve() prende solo il lock del registro, che non chiama mai i componenti tenendolo
+                self.identity.resolve_detections(detections)
+                self._apply_merges()
+            if self.vectorized:
+                self._update_tracks_vectorized(detections, frame_w, frame_h, frame_gap)
+            else:
+                self._update_tracks_per_object(detections, frame_w, frame_h, frame_gap)
+
+    def _apply_merges(self):
+        """
+        Riallinea le tracce con il registro delle identità: ogni traccia il cui ID è stato unito
+        a un altro continua con l'ID canonico. Gira nel thread della logica, prima di ogni frame,
+        così le unioni decise dal thread di detection arrivano qui insieme ai frame già risolti.
+        """
+        if not len(self.identity):
+            return
+        for track_id in list(self.tracks):
+            root = self.identity.resolve(track_id)
+            if root != track_id:
+                self.merge_ids(track_id, root)
+
+    def merge_ids(self, old_id, new_id):
+        """
+        Unione di identità (vedi IdentityRegistry): la traccia old_id continua come new_id,
+        con tutto il suo storico (aree, voti, stato). Se new_id è ancora attiva viene sostituita:
+        la traccia che ha appena confermato la targa è quella osservata adesso.
+        Gli observer ricevono MERGED per old_id, con new_id (la traccia che prosegue) come messaggio.
+        """
+        with self._lock:
+            obj = self.tracks.pop(old_id, None)
+            if obj is None:
+                return
+            if new_id in self.tracks:
+                del self.tracks[new_id]
+                if new_id in self._rows:
+                    self._remove_row(new_id)
+            obj.id = new_id
+            self.tracks[new_id] = obj
+            if old_id in self._rows:
+                row = self._rows.pop(old_id)
+                self._rows[new_id] = row
+                self._row_ids[row] = new_id
+            self.notify("MERGED", old_id, str(new_id))
+
+    # --- VALUTAZIONE VETTORIALE ---
+    def _add_row(self, obj_id):
+        row = len(self._row_ids)
+        if row == len(self._area_len):
+            grow = len(self._area_len)
+            self._areas = np.concatenate([self._areas, np.zeros((grow, TTC_WINDOW))])
+            self._area_len = np.concatenate([self._area_len, np.zeros(grow, dtype=np.int64)])
+            self._area_pos = np.concatenate([self._area_pos, np.zeros(grow, dtype=np.int64)])
+            self._votes = np.concatenate([self._votes, np.full((grow, STATE_BUFFER_SIZE), -1, dtype=np.int8)])
+            self._vote_pos = np.concatenate([self._vote_pos, np.zeros(grow, dtype=np.int64)])
+            self._state_codes = np.concatenate([self._state_codes, np.zeros(grow, dtype=np.int8)])
+        self._areas[row] = 0
+        self._area_len[row] = 0
+        self._area_pos[row] = 0
+        self._votes[row] = -1
+        self._vote_pos[row] = 0
+        self._state_codes[row] = SAFE
+        self._rows[obj_id] = row
+        self._row_ids.append(obj_id)
+        return row
+
+    def _remove_row(self, obj_id):
+        # L'ultima riga prende il posto di quella rimossa (niente buchi negli array)
+        row = self._rows.pop(obj_id)
+        last = len(self._row_ids) - 1
+        if row != last:
+            for arr in (self._areas, self._area_len, self._area_pos, self._votes, self._vote_pos, self._state_codes):
+                arr[row] = arr[last]
+            moved_id = self._row_ids[last]
+            self._row_ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._row_ids.pop()
+
+    def _evaluate(self, rows, bboxes, centers, frame_w, frame_h, frame_gap=1):
+        """
+        Un passaggio vettoriale per tutte le tracce del frame: area, TTC, corsia, stato proposto
+        e filtro anti-flickering, con la stessa logica (e le stesse soglie) di TrackedObject.update.
+        :return: (ttc, stato proposto, cambio di stato confermato) per riga.
+        """
+        area = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        area_ratio = area / (frame_w * frame_h)
+
+        # TTC: media delle ultime TTC_WINDOW aree (gli slot vuoti valgono 0)
+        n_prev = self._area_len[rows]
+        avg_prev_area = self._areas[rows].sum(axis=1) / np.maximum(n_prev, 1)
+        diff_area = area - avg_prev_area
+        approaching = (n_prev > 0) & (diff_area > area * TTC_MIN_GROWTH * frame_gap)
+        ttc = np.full(len(rows), np.inf)
+        ttc[approaching] = frame_gap * area[approaching] / diff_area[approaching]
+
+        pos = self._area_pos[rows]
+        self._areas[rows, pos] = area
+        self._area_pos[rows] = (pos + 1) % TTC_WINDOW
+        self._area_len[rows] = np.minimum(n_prev + 1, TTC_WINDOW)
+
+        # Corsia trapezoidale (lane_bounds lavora anche su array)
+        lane_start, lane_end = lane_bounds(centers[:, 1], frame_w, frame_h)
+        in_lane = (lane_start < centers[:, 0]) & (centers[:, 0] < lane_end)
+
+        danger = in_lane & ((area_ratio > DANGER_AREA_RATIO) | (ttc < DANGER_TTC))
+        warning = (in_lane & ~danger & ((area_ratio > WARNING_AREA_RATIO) | (ttc < WARNING_TTC))) | \
+                  (~in_lane & (area_ratio > CUT_IN_AREA_RATIO))
+        proposed = np.full(len(rows), SAFE, dtype=np.int8)
+        proposed[warning] = WARNING
+        proposed[danger] = DANGER
+
+        pos = self._vote_pos[rows]
+        self._votes[rows, pos] = proposed
+        self._vote_pos[rows] = (pos + 1) % STATE_BUFFER_SIZE
+        votes = (self._votes[rows] == proposed[:, None]).sum(axis=1)
+        switch = (votes >= STATE_VOTES) & (proposed != self._state_codes[rows])
+        self._state_codes[rows[switch]] = proposed[switch]
+        return ttc, proposed, switch
+
+    def _update_tracks_vectorized(self, detections, frame_w, frame_h, frame_gap=1):
+        active_ids = set()
+        events = []  # (indice rilevazione, evento, id, messaggio): notificati dopo il passaggio
+
+        # Un ID ripetuto nello stesso frame viene aggiornato più volte in ordine, come nel ciclo per oggetto:
+        # ogni "giro" contiene al massimo una rilevazione per ID
+        rounds = []
+        occurrences = {}
+        for i, det in enumerate(detections):
+            n = occurrences.get(det["id"], 0)
+            occurrences[det["id"]] = n + 1
+            if n == len(rounds):
+                rounds.append([])
+            rounds[n].append(i)
+
+        for indices in rounds:
+            rows = np.empty(len(indices), dtype=np.int64)
+            objects = []
+            for k, i in enumerate(indices):
+                det = detections[i]
+                obj_id = det["id"]
+                active_ids.add(obj_id)
+                obj = self.tracks.get(obj_id)
+                if obj is None:
+                    obj = TrackedObject(obj_id, det)
+                    self.tracks[obj_id] = obj
+                    rows[k] = self._add_row(obj_id)
+                    events.append((i, "NEW_TRACK", obj_id, ""))
+                else:
+                    rows[k] = self._rows[obj_id]
+                objects.append(obj)
+
+            bboxes = np.array([detections[i]['bbox'] for i in indices], dtype=np.float64).reshape(-1, 4)
+            centers = np.array([detections[i]['center'] for i in indices], dtype=np.float64).reshape(-1, 2)
+            ttc, proposed, switch = self._evaluate(rows, bboxes, centers, frame_w, frame_h, frame_gap)
+
+            # Scrittura dei risultati negli oggetti: info, TTC e stato solo dove è cambiato
+            ttc_list = ttc.tolist()
+            switch_list = switch.tolist()
+            for k, (i, obj) in enumerate(zip(indices, objects)):
+                obj.info = detections[i]
+                obj.ttc = ttc_list[k]
+                if obj.ttc != float('inf'):
+                    area_ratio = float((bboxes[k, 2] - bboxes[k, 0]) * (bboxes[k, 3] - bboxes[k, 1])) / (frame_w * frame_h)
+                    print(f"[DEBUG] Veicolo ID {obj.id}: TTC = {obj.ttc:.2f} frame | Ratio Area = {area_ratio:.4f}")
+                if switch_list[k]:
+                    old_state_name = obj.state.name
+                    obj.set_state(STATES_BY_CODE[proposed[k]])
+                    # Se passa a DANGER e prima non lo era, notifica!
+                    if obj.state.name == "DANGER" and old_state_name != "DANGER":
+                        events.append((i, "DANGER", obj.id, "COLLISIONE IMMINENTE!"))
+
+        events.sort(key=lambda e: e[0])
+        for _, event_type, obj_id, message in events:
+            self.notify(event_type, obj_id, message)
+
+        # Gestione tracce PERSE
+        for track_id in list(self.tracks.keys()):
+            if track_id not in active_ids:
+                del self.tracks[track_id]
+                self._remove_row(track_id)
+                self.notify("LOST_TRACK", track_id)
+
+    # --- VALUTAZIONE PER OGGETTO (riferimento) ---
+    def _update_tracks_per_object(self, detections, frame_w, frame_h, frame_gap=1):
+        active_ids = []
+
+        for det in detections:
+            obj_id = det["id"]           
+            active_ids.append(obj_id)   #prende id e lo mette nella lista degli attivi
+
+            # 1. È una NUOVA traccia?
+            if obj_id not in self.tracks:
+                # l'oggetto new_obj che contiene tutta la logica del file state_machine.py
+                new_obj = TrackedObject(obj_id, det) # Crea nuovo oggetto
+                new_obj.update(det, frame_w, frame_h, frame_gap) # aggiunge l'oggetto
+                
+                self.tracks[obj_id] = new_obj # Memorizza la traccia
+                 #Notifica tutti gli observer che c'è una nuova traccia
+                self.notify("NEW_TRACK", obj_id)
+            else:
+                # 2. Aggiorna traccia ESISTENTE
+                current_obj = self.tracks[obj_id]
+                old_state_name = current_obj.state.name
+                
+                 #Qui il flusso di esecuzione SALTA dal file risk_observer.py al file state_machine.py. Dentro state_machine.py, il metodo update fa i calcoli matematici (Area, Centro). Sempre dentro state_machine.py, l'oggetto decide se cambiare il suo stato interno (es. self.state = DangerState()). Finito il calcolo, il flusso torna al Manager.
+                current_obj.update(det, frame_w, frame_h, frame_gap)
+                
+                new_state_name = current_obj.state.name # Il Manager sbircia dentro l'oggetto per vedere lo stato corrente
+
+                # 3. Controllo cambio stato -> PERICOLO
+                # Se passa a DANGER e prima non lo era, notifica!
+                if new_state_name == "DANGER" and old_state_name != "DANGER":
+                    self.notify("DANGER", obj_id, "COLLISIONE IMMINENTE!")
+
+        # 4. Gestione tracce PERSE
+        current_track_ids = list(self.tracks.keys())
+        for track_id in current_track_ids:
+            if track_id not in active_ids:
+                del self.tracks[track_id]
+                self.notify("LOST_TRACK", track_id)
+                
+    def get_tracks(self):
         return self.tracks.values()
\ No newline at end of file
@@ -1,136 +1,211 @@
-from abc import ABC, abstractmethod
-
-# --- 1. INTERFACCIA STATE (L'astrazione) ---
-class VehicleState(ABC):
-    """
-    Classe astratta che definisce come deve comportarsi uno stato.
-    Ogni stato deve avere un colore (per il disegno) e un nome.
-    """
-    @property
-    @abstractmethod
-    def color(self):
-        pass
-
-    @property
-    @abstractmethod
-    def name(self):
-        pass
-
-# --- 2. STATI CONCRETI (Le implementazioni) ---
-class SafeState(VehicleState):
-    """Stato: Lontano o non in traiettoria. Colore: Verde."""
-    @property
-    def color(self):
-        return (0, 255, 0)  # Verde
-    
-    @property
-    def name(self):
-        return "SAFE"
-
-class WarningState(VehicleState):
-    """Stato: Si sta avvicinando o è a media distanza. Colore: Giallo."""
-    @property
-    def color(self):
-        return (0, 255, 255)  # Giallo
-    
-    @property
-    def name(self):
-        return "WARNING"
-
-class DangerState(VehicleState):
-    """Stato: Vicino e in traiettoria di collisione. Colore: Rosso."""
-    @property
-    def color(self):
-        return (0, 0, 255)  # Rosso
-    
-    @property
-    def name(self):
-        return "DANGER"
-
-# 3. CONTEXT (L'oggetto tracciato) 
-class TrackedObject:
-    """
-    Rappresenta un veicolo tracciato. Mantiene il suo Stato corrente.
-    """
-    def __init__(self, obj_id, initial_info):
-        self.id = obj_id
-        self.info = initial_info
-        self.state = SafeState()  # Stato iniziale di default
-        
-        # Storico delle aree per capire se si avvicina (non usato in questa versione base ma utile)
-        self.area_history = [] 
-        self.state_buffer = []
-
-    def update(self, new_info, frame_width, frame_height):
-        """
-        Aggiorna i dati dell'oggetto e ricalcola lo stato.
-        """
-        self.info = new_info
-        bbox = new_info['bbox']
-        
-        # Calcoli geometrici
-        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-        video_area = frame_width * frame_height
-        area_ratio = area / video_area  # Quanto spazio occupa nel frame (0.0 a 1.0)
-
-        # --- CALCOLO TTC (Comportamentale) ---
-        ttc = float('inf')
-        if len(self.area_history) > 0:
-            # Calcoliamo la media delle ultime aree per stabilizzare il calcolo
-            avg_prev_area = sum(self.area_history[-5:]) / len(self.area_history[-5:])
-            diff_area = area - avg_prev_area
-            
-            # Questo ignora le oscillazioni random di YOLO sulle auto ferme a lato
-            if diff_area > (area * 0.05): 
-                ttc = area / diff_area
-
-        # Stampa i dati TTC nel terminale per ogni auto
-        if ttc != float('inf'):
-            print(f"[DEBUG] Veicolo ID {self.id}: TTC = {ttc:.2f} frame | Ratio Area = {area_ratio:.4f}")        
-
-        # Aggiornamento storico aree
-        self.area_history.append(area)
-        if len(self.area_history) > 20: self.area_history.pop(0)
-        
-        center_x = new_info['center'][0]
-        center_y = new_info['center'][1]
-
-        # Più l'auto è in basso (y alto), più la corsia considerata è larga
-        horizon_ratio = center_y / frame_height
-        lane_width = 0.10 + (horizon_ratio * 0.20)
-
-        # Definizione della "Zona Centrale" (Traiettoria di collisione)
-        lane_start = frame_width * (0.5 - lane_width/2)
-        lane_end = frame_width * (0.5 + lane_width/2)
-        is_in_lane = lane_start < center_x < lane_end
-
-        # --- LOGICA DI TRANSIZIONE ROBUSTA ---
-        new_proposed_state = SafeState()
-
-        if is_in_lane:
-            if area_ratio > 0.20 or ttc < 3: 
-                new_proposed_state = DangerState()
-            elif area_ratio > 0.15 or ttc < 15:
-                new_proposed_state = WarningState()
-        
-        # Se l'auto è fuori corsia ma è gigantesca (ci sta tagliando la strada)
-        elif area_ratio > 0.45:
-            new_proposed_state = WarningState()
-
-        # 4. FILTRO DI STABILITÀ (Anti-Flickering)
-        # Memorizziamo la proposta e cambiamo solo se c'è una maggioranza chiara
-        self.state_buffer.append(new_proposed_state.name)
-        if len(self.state_buffer) > 10: 
-            self.state_buffer.pop(0)
-
-        # Cambiamo stato solo se abbiamo almeno 6 conferme su 8 frame
-        # Questo rende il sistema solido e non "nervoso"
-        current_proposal_count = self.state_buffer.count(new_proposed_state.name)
-        if current_proposal_count >= 8:
-            self.set_state(new_proposed_state)
-
-    def set_state(self, new_state):
-        """Cambia lo stato corrente."""
-        if type(self.state) != type(new_state):
-            print(f"Veicolo {self.id}: {self.state.name} -> {new_state.name}") # Debug opzionale
+from abc import ABC, abstractmethod
+from array import array
+
+# --- 1. INTERFACCIA STATE (L'astrazione) ---
+class VehicleState(ABC):
+    """
+    Classe astratta che definisce come deve comportarsi uno stato.
+    Ogni stato deve avere un colore (per il disegno) e un nome.
+    """
+    @property
+    @abstractmethod
+    def color(self):
+        pass
+
+    @property
+    @abstractmethod
+    def name(self):
+        pass
+
+# --- 2. STATI CONCRETI (Le implementazioni) ---
+class SafeState(VehicleState):
+    """Stato: Lontano o non in traiettoria. Colore: Verde."""
+    @property
+    def color(self):
+        return (0, 255, 0)  # Verde
+    
+    @property
+    def name(self):
+        return "SAFE"
+
+class WarningState(VehicleState):
+    """Stato: Si sta avvicinando o è a media distanza. Colore: Giallo."""
+    @property
+    def color(self):
+        return (0, 255, 255)  # Giallo
+    
+    @property
+    def name(self):
+        return "WARNING"
+
+class DangerState(VehicleState):
+    """Stato: Vicino e in traiettoria di collisione. Colore: Rosso."""
+    @property
+    def color(self):
+        return (0, 0, 255)  # Rosso
+    
+    @property
+    def name(self):
+        return "DANGER"
+
+# --- SOGLIE DELLA LOGICA DI RISCHIO ---
+# (condivise tra TrackedObject.update e la valutazione vettoriale di TrackManager)
+DANGER_AREA_RATIO = 0.20    # area del box / area del frame oltre cui l'auto in corsia è pericolosa
+DANGER_TTC = 3              # TTC (frame) sotto cui l'auto in corsia è pericolosa
+WARNING_AREA_RATIO = 0.15
+WARNING_TTC = 15
+CUT_IN_AREA_RATIO = 0.45    # auto fuori corsia ma gigantesca (ci sta tagliando la strada)
+TTC_WINDOW = 5              # aree precedenti mediate per il calcolo del TTC
+TTC_MIN_GROWTH = 0.05       # crescita minima dell'area (frazione) per considerare l'auto in avvicinamento
+AREA_HISTORY_SIZE = 20
+STATE_BUFFER_SIZE = 10      # proposte di stato ricordate dal filtro anti-flickering
+STATE_VOTES = 8             # conferme necessarie per cambiare stato
+
+# --- GEOMETRIA DELLA CORSIA ---
+# Corsia trapezoidale: larga il 10% del frame all'orizzonte (y=0), il 30% in basso (y=altezza)
+LANE_MIN_WIDTH = 0.10
+LANE_WIDTH_GAIN = 0.20
+
+def lane_bounds(center_y, frame_width, frame_height):
+    """
+    Restituisce (x_inizio, x_fine) della corsia centrale all'altezza center_y.
+    Più l'auto è in basso (y alto), più la corsia considerata è larga.
+    """
+    horizon_ratio = center_y / frame_height
+    lane_width = LANE_MIN_WIDTH + (horizon_ratio * LANE_WIDTH_GAIN)
+
+    lane_start = frame_width * (0.5 - lane_width/2)
+    lane_end = frame_width * (0.5 + lane_width/2)
+    return lane_start, lane_end
+
+# Istanze condivise (flyweight): gli stati non hanno dati propri, basta un oggetto per tipo
+SAFE_STATE = SafeState()
+WARNING_STATE = WarningState()
+DANGER_STATE = DangerState()
+STATES_BY_CODE = (SAFE_STATE, WARNING_STATE, DANGER_STATE)   # codice compatto (0, 1, 2) -> stato
+STATE_CODES = {state: code for code, state in enumerate(STATES_BY_CODE)}
+
+# 3. CONTEXT (L'oggetto tracciato) 
+class TrackedObject:
+    """
+    Rappresenta un veicolo tracciato. Mantiene il suo Stato corrente.
+    Rappresentazione compatta: buffer circolari di dimensione fissa, somma corrente delle ultime
+    TTC_WINDOW aree e contatori dei voti aggiornati a ogni inserimento (niente pop(0), sum o count).
+    """
+    __slots__ = ("id", "info", "state", "ttc",
+                 "_areas", "_area_pos", "_area_len", "_area_sum",
+                 "_votes", "_vote_pos", "_vote_len", "_vote_counts")
+
+    def __init__(self, obj_id, initial_info):
+        self.id = obj_id
+        self.info = initial_info
+        self.state = SAFE_STATE  # Stato iniziale di default
+        self.ttc = float('inf')   # Ultimo Time-To-Collision calcolato (in frame)
+        
+        # Storico delle aree per capire se si avvicina (buffer circolare di double, senza oggetti int)
+        self._areas = array('d', bytes(8 * AREA_HISTORY_SIZE))
+        self._area_pos = 0
+        self._area_len = 0
+        self._area_sum = 0.0      # somma delle ultime TTC_WINDOW aree (esatta: le aree sono intere)
+        # Ultime proposte di stato come codici (buffer circolare) e quante volte compare ciascun codice
+        self._votes = bytearray(STATE_BUFFER_SIZE)
+        self._vote_pos = 0
+        self._vote_len = 0
+        self._vote_counts = [0, 0, 0]
+
+    @property
+    def area_history(self):
+        """Aree memorizzate, dalla più vecchia alla più recente."""
+        start = (self._area_pos - self._area_len) % AREA_HISTORY_SIZE
+        return [self._areas[(start + i) % AREA_HISTORY_SIZE] for i in range(self._area_len)]
+
+    @property
+    def state_buffer(self):
+        """Nomi delle ultime proposte di stato, dalla più vecchia alla più recente."""
+        start = (self._vote_pos - self._vote_len) % STATE_BUFFER_SIZE
+        return [STATES_BY_CODE[self._votes[(start + i) % STATE_BUFFER_SIZE]].name for i in range(self._vote_len)]
+
+    def update(self, new_info, frame_width, frame_height, frame_gap=1):
+        """
+        Aggiorna i dati dell'oggetto e ricalcola lo stato.
+        :param frame_gap: frame della sorgente trascorsi dall'aggiornamento precedente (>1 se sono
+                          stati scartati frame): il TTC resta in frame della sorgente, quindi le
+                          soglie DANGER_TTC / WARNING_TTC valgono lo stesso tempo reale.
+        """
+        self.info = new_info
+        bbox = new_info['bbox']
+        
+        # Calcoli geometrici
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        video_area = frame_width * frame_height
+        area_ratio = area / video_area  # Quanto spazio occupa nel frame (0.0 a 1.0)
+
+        # --- CALCOLO TTC (Comportamentale) ---
+        ttc = float('inf')
+        if self._area_len > 0:
+            # Calcoliamo la media delle ultime aree per stabilizzare il calcolo
+            avg_prev_area = self._area_sum / min(self._area_len, TTC_WINDOW)
+            diff_area = area - avg_prev_area
+            
+            # Questo ignora le oscillazioni random di YOLO sulle auto ferme a lato
+            # (la crescita minima è per frame della sorgente, come il TTC)
+            if diff_area > (area * TTC_MIN_GROWTH * frame_gap): 
+                ttc = frame_gap * area / diff_area
+        self.ttc = ttc
+
+        # Stampa i dati TTC nel terminale per ogni auto
+        if ttc != float('inf'):
+            print(f"[DEBUG] Veicolo ID {self.id}: TTC = {ttc:.2f} frame | Ratio Area = {area_ratio:.4f}")        
+
+        # Aggiornamento storico aree: l'area che esce dalla finestra del TTC lascia la somma corrente
+        pos = self._area_pos
+        if self._area_len >= TTC_WINDOW:
+            self._area_sum -= self._areas[(pos - TTC_WINDOW) % AREA_HISTORY_SIZE]
+        self._area_sum += area
+        self._areas[pos] = area
+        self._area_pos = (pos + 1) % AREA_HISTORY_SIZE
+        if self._area_len < AREA_HISTORY_SIZE:
+            self._area_len += 1
+        
+        center_x = new_info['center'][0]
+        center_y = new_info['center'][1]
+
+        # Definizione della "Zona Centrale" (Traiettoria di collisione)
+        lane_start, lane_end = lane_bounds(center_y, frame_width, frame_height)
+        is_in_lane = lane_start < center_x < lane_end
+
+        # --- LOGICA DI TRANSIZIONE ROBUSTA ---
+        new_proposed_state = SAFE_STATE
+
+        if is_in_lane:
+            if area_ratio > DANGER_AREA_RATIO or ttc < DANGER_TTC: 
+                new_proposed_state = DANGER_STATE
+            elif area_ratio > WARNING_AREA_RATIO or ttc < WARNING_TTC:
+                new_proposed_state = WARNING_STATE
+        
+        # Se l'auto è fuori corsia ma è gigantesca (ci sta tagliando la strada)
+        elif area_ratio > CUT_IN_AREA_RATIO:
+            new_proposed_state = WARNING_STATE
+
+        # 4. FILTRO DI STABILITÀ (Anti-Flickering)
+        # Memorizziamo la proposta e cambiamo solo se c'è una maggioranza chiara
+        code = STATE_CODES[new_proposed_state]
+        pos = self._vote_pos
+        if self._vote_len == STATE_BUFFER_SIZE:
+            self._vote_counts[self._votes[pos]] -= 1
+        else:
+            self._vote_len += 1
+        self._votes[pos] = code
+        self._vote_counts[code] += 1
+        self._vote_pos = (pos + 1) % STATE_BUFFER_SIZE
+
+        # Cambiamo stato solo se abbiamo almeno 8 conferme sugli ultimi 10 frame
+        # Questo rende il sistema solido e non "nervoso"
+        if self._vote_counts[code] >= STATE_VOTES:
+            self.set_state(new_proposed_state)
+
+    def set_state(self, new_state):
+        """Cambia lo stato corrente."""
+        if type(self.state) != type(new_state):
+            print(f"Veicolo {self.id}: {self.state.name} -> {new_state.name}") # Debug opzionale
             self.state = new_state
\ No newline at end of file
@@ -1,49 +1,211 @@
-
-from pymongo import MongoClient
-from datetime import datetime
-
-class DBManager:
-    def __init__(self, uri="mongodb://localhost:27017/", db_name="idTracking_db", collection_name="tracked_objects"):
-        self.client = MongoClient(uri)
-        self.db = self.client[db_name]
-        self.collection = self.db[collection_name]
-        print(f"Connected to MongoDB: {db_name}.{collection_name}")
-
-    def update_object_plate(self, obj_id, plate_text):
-        """
-        Updates the document for the given object ID with the detected license plate.
-        If the document doesn't exist, it creates one.
-        """
-        # Convert numpy types to native Python types for MongoDB
-        if hasattr(obj_id, 'item'):
-            obj_id = obj_id.item()
-
-        filter_query = {"track_id": obj_id}
-        update_query = {
-            "$set": {
-                "plate": plate_text,
-                "last_updated": datetime.now()
-            },
-            "$setOnInsert": {
-                "created_at": datetime.now()
-            }
-        }
-        self.collection.update_one(filter_query, update_query, upsert=True)
-        print(f"DB: Updated object {obj_id} with plate '{plate_text}'")
-
-    def save_detection(self, obj_data):
-        """
-        Saves a raw detection record (optional, if we want a history of all detections).
-        """
-        obj_data["timestamp"] = datetime.now()
-        self.collection.insert_one(obj_data)
-
-
-    def get_object_id_by_plate(self, plate_text):
-        """
-        Returns the track_id associated with a given plate, or None if not found.
-        """
-        doc = self.collection.find_one({"plate": plate_text})
-        if doc:
-            return doc.get("track_id")
-        return None
\ No newline at end of file
+import atexit
+import threading
+from pymongo import MongoClient, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime
+
+DUPLICATE_KEY_ERROR = 11000
+
+class DBManager:
+    def __init__(self, uri="mongodb://localhost:27017/", db_name="idTracking_db", collection_name="tracked_objects",
+                 collection=None, flush_size=100, flush_interval=1.0, max_pending=10000,
+                 server_timeout_ms=5000):
+        """
+        Writes are buffered (write-behind) and sent with bulk_write by a background thread,
+        either when flush_size operations are pending or every flush_interval seconds.
+        Plate -> track_id lookups are answered from an in-process index warmed from the collection,
+        so callers (e.g. the OCR thread) never wait on network I/O.
+        The constructor does no network I/O: index creation and warm-up run on the flush thread
+        and are retried at every flush until the server answers.
+        :param collection: optional collection object to use instead of connecting to uri
+                           (any pymongo-compatible stand-in, e.g. mongomock).
+        :param max_pending: cap on buffered operations while the server is unreachable.
+        :param server_timeout_ms: how long a flush waits for an unreachable server before giving up.
+        """
+        if collection is None:
+            # MongoClient is lazy: the connection is opened by the first operation, on the flush thread
+            self.client = MongoClient(uri, serverSelectionTimeoutMS=server_timeout_ms)
+            self.db = self.client[db_name]
+            collection = self.db[collection_name]
+        self.collection = collection
+        print(f"MongoDB collection: {db_name}.{collection_name}")
+
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped_writes = 0
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+
+        # In-process plate index: plate -> track_id (and the reverse, to keep it consistent)
+        self._plate_to_track = {}
+        self._track_to_plate = {}
+        self.ready = False  # indexes created and plate index warmed from the collection
+
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.close)
+
+    def _prepare(self):
+        """
+        Creates the indexes and warms the plate index, once. Runs on the flush thread.
+        On failure it is retried at the next flush; until then lookups only see in-process updates.
+        """
+        if self.ready:
+            return True
+        try:
+            self._ensure_indexes()
+            self._warm_plate_index()
+        except Exception as e:
+            print(f"DB: server not ready, will retry: {e}")
+            return False
+        self.ready = True
+        return True
+
+    def _ensure_indexes(self):
+        """Indexes used by plate and track lookups (no-op if they already exist)."""
+        self.collection.create_index("plate")
+        self.collection.create_index("track_id")
+
+    def _warm_plate_index(self):
+        """Loads every known plate -> track_id pair once at startup."""
+        known = []
+        for doc in self.collection.find({"plate": {"$exists": True}}, {"plate": 1, "track_id": 1, "_id": 0}):
+            plate, track_id = doc.get("plate"), doc.get("track_id")
+            if plate is not None and track_id is not None:
+                known.append((plate, track_id))
+        with self._lock:
+            for plate, track_id in known:
+                # Plates updated in this process meanwhile are newer than the stored ones
+                if track_id in self._track_to_plate:
+                    continue
+                # Like find_one: the first document found for a plate wins
+                self._plate_to_track.setdefault(plate, track_id)
+                self._track_to_plate[track_id] = plate
+
+    @staticmethod
+    def _native(value):
+        # Convert numpy types to native Python types for MongoDB
+        if hasattr(value, 'item'):
+            return value.item()
+        return value
+
+    def _enqueue(self, operation):
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._pending.pop(0)
+                self.dropped_writes += 1
+            self._pending.append(operation)
+            should_flush = len(self._pending) >= self.flush_size
+        if should_flush:
+            self._wakeup.set()
+
+    def update_object_plate(self, obj_id, plate_text):
+        """
+        Updates the document for the given object ID with the detected license plate.
+        If the document doesn't exist, it creates one.
+        The plate index is updated immediately; the write itself is buffered.
+        """
+        obj_id = self._native(obj_id)
+
+        with self._lock:
+            old_plate = self._track_to_plate.get(obj_id)
+            if old_plate is not None and self._plate_to_track.get(old_plate) == obj_id:
+                del self._plate_to_track[old_plate]
+            self._track_to_plate[obj_id] = plate_text
+            self._plate_to_track.setdefault(plate_text, obj_id)
+
+        filter_query = {"track_id": obj_id}
+        update_query = {
+            "$set": {
+                "plate": plate_text,
+                "last_updated": datetime.now()
+            },
+            "$setOnInsert": {
+                "created_at": datetime.now()
+            }
+        }
+        self._enqueue(UpdateOne(filter_query, update_query, upsert=True))
+        print(f"DB: Updated object {obj_id} with plate '{plate_text}'")
+
+    def save_detection(self, obj_data):
+        """
+        Saves a raw detection record (optional, if we want a history of all detections).
+        """
+        obj_data["timestamp"] = datetime.now()
+        self._enqueue(InsertOne({k: self._native(v) for k, v in obj_data.items()}))
+
+
+    def get_object_id_by_plate(self, plate_text):
+        """
+        Returns the track_id associated with a given plate, or None if not found.
+        Answered from the in-process index, without a database round trip.
+        """
+        with self._lock:
+            return self._plate_to_track.get(plate_text)
+
+    def flush(self):
+        """
+        Sends every buffered write in a single ordered bulk_write.
+        If the server cannot be reached the operations are put back in the buffer and retried at the
+        next flush. If some operations fail (BulkWriteError), the ones before the first error were
+        applied and are not sent again: the failed one is dropped (a duplicate key means it was
+        already written by an earlier, interrupted attempt) and the rest is sent again right away.
+        """
+        with self._lock:
+            operations, self._pending = self._pending, []
+        while operations:
+            try:
+                self.collection.bulk_write(operations, ordered=True)
+                return
+            except BulkWriteError as e:
+                operations = self._unapplied_operations(operations, e.details)
+            except Exception as e:
+                print(f"DB: bulk write of {len(operations)} operations failed, will retry: {e}")
+                self._requeue(operations)
+                return
+
+    def _unapplied_operations(self, operations, details):
+        """Operations still to send after an ordered bulk_write stopped at its first write error."""
+        write_errors = details.get("writeErrors") or []
+        if not write_errors:
+            # Only a write concern error: every operation was applied
+            print(f"DB: bulk write applied with write concern errors: {details.get('writeConcernErrors')}")
+            return []
+        error = write_errors[0]
+        index = error["index"]
+        applied = details.get("nInserted", 0) + details.get("nUpserted", 0) + details.get("nModified", 0)
+        if error.get("code") != DUPLICATE_KEY_ERROR:
+            with self._lock:
+                self.dropped_writes += 1
+            print(f"DB: write {index} of {len(operations)} rejected and dropped "
+                  f"({applied} applied before it): {error.get('errmsg')}")
+        return operations[index + 1:]
+
+    def _requeue(self, operations):
+        with self._lock:
+            self._pending = operations + self._pending
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.dropped_writes += overflow
+
+    def _flush_loop(self):
+        """Background thread: flushes on size trigger (wakeup) or every flush_interval seconds."""
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._prepare():
+                self.flush()
+
+    def close(self):
+        """Stops the background thread and writes what is still buffered."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._flush_thread.join(timeout=self.flush_interval + 1.0)
+        self.flush()
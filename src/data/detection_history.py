@@ -0,0 +1,354 @@
+import json
+import math
+import os
+import queue
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+# Columns stored for every (frame, track) row of a chunk
+COLUMNS = ("frame", "id", "x1", "y1", "x2", "y2", "class_id", "state", "ttc")
+
+
+def new_run_id():
+    """Identifier of one run: start time (sortable) plus a random suffix."""
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def _native(value):
+    # Convert numpy types to native Python types (BSON / JSON friendly)
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _chunk_rows(chunk):
+    """Iterates over the rows of a columnar chunk as dicts."""
+    columns = chunk["columns"]
+    for i in range(len(columns["frame"])):
+        yield {
+            "frame": columns["frame"][i],
+            "id": columns["id"][i],
+            "bbox": (columns["x1"][i], columns["y1"][i], columns["x2"][i], columns["y2"][i]),
+            "class_id": columns["class_id"][i],
+            "state": columns["state"][i],
+            "ttc": columns["ttc"][i],
+        }
+
+
+# --- BACKENDS ---
+class HistoryBackend(ABC):
+    """
+    Storage for sealed chunks. A chunk is one document holding every detection of a
+    window of frames in columnar form, plus the metadata used to select it in queries:
+    run_id, frame_start, frame_end, track_ids and danger_ids.
+    Track IDs and frame indices restart at every run, so queries are scoped by run_id.
+    """
+    def prepare(self):
+        """One-time setup (e.g. indexes). Runs on the writer thread before the first insert, retried on failure."""
+        pass
+
+    @abstractmethod
+    def insert_chunks(self, chunks):
+        pass
+
+    @abstractmethod
+    def find_chunks(self, run_id=None, track_id=None, frame_start=None, frame_end=None, danger=False):
+        """
+        Chunks of run_id (every run if None) containing track_id / overlapping
+        [frame_start, frame_end] / with DANGER rows.
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class MongoHistoryBackend(HistoryBackend):
+    """
+    Bucketed documents in a MongoDB collection (one document per chunk).
+    The constructor does no network I/O: indexes are created by prepare() on the writer thread.
+    """
+    def __init__(self, uri="mongodb://localhost:27017/", db_name="idTracking_db",
+                 collection_name="detection_history", collection=None, server_timeout_ms=5000):
+        """
+        :param server_timeout_ms: how long an operation waits for an unreachable server before giving up.
+        """
+        if collection is None:
+            from pymongo import MongoClient
+            # MongoClient is lazy: the connection is opened by the first operation
+            self.client = MongoClient(uri, serverSelectionTimeoutMS=server_timeout_ms)
+            collection = self.client[db_name][collection_name]
+        self.collection = collection
+
+    def prepare(self):
+        self.collection.create_index([("run_id", 1), ("track_ids", 1)])
+        self.collection.create_index([("run_id", 1), ("danger_ids", 1)])
+        self.collection.create_index([("run_id", 1), ("frame_start", 1), ("frame_end", 1)])
+
+    def insert_chunks(self, chunks):
+        if chunks:
+            self.collection.insert_many(chunks, ordered=False)
+
+    def find_chunks(self, run_id=None, track_id=None, frame_start=None, frame_end=None, danger=False):
+        query = {}
+        if run_id is not None:
+            query["run_id"] = run_id
+        if track_id is not None:
+            query["track_ids"] = track_id
+        if frame_start is not None:
+            query["frame_end"] = {"$gte": frame_start}
+        if frame_end is not None:
+            query["frame_start"] = {"$lte": frame_end}
+        if danger:
+            query["danger_ids.0"] = {"$exists": True}
+        return list(self.collection.find(query, {"_id": 0}).sort("frame_start", 1))
+
+
+_COLUMNS_KEY = b',"columns":'
+
+
+def _chunk_metadata(line):
+    """Metadata of a chunk line, decoding only what precedes the columns (whole line as fallback)."""
+    head = line.find(_COLUMNS_KEY)
+    if head != -1:
+        try:
+            return json.loads(line[:head] + b"}")
+        except ValueError:
+            pass
+    return json.loads(line)
+
+
+class FileHistoryBackend(HistoryBackend):
+    """
+    Embedded backend for offline use: chunks are appended as JSON lines to a single file.
+    Chunk metadata and file offsets are kept in memory, so a query only reads the lines it needs.
+    Metadata is written before the columns, so indexing an existing file at startup only decodes
+    the head of each line, not its rows.
+    """
+    def __init__(self, path="output/detection_history.jsonl"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._index = []   # [(run_id, frame_start, frame_end, set(track_ids), has_danger, offset)]
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                offset = f.tell()
+                for line in iter(f.readline, b""):
+                    if line.strip():
+                        self._add_to_index(_chunk_metadata(line), offset)
+                    offset = f.tell()
+
+    def _add_to_index(self, chunk, offset):
+        # Chunks written before run_id existed get None and only match queries over every run
+        self._index.append((chunk.get("run_id"), chunk["frame_start"], chunk["frame_end"],
+                            set(chunk["track_ids"]), bool(chunk["danger_ids"]), offset))
+
+    def insert_chunks(self, chunks):
+        with self._lock, open(self.path, "ab") as f:
+            for chunk in chunks:
+                offset = f.tell()
+                f.write(json.dumps(chunk, separators=(",", ":")).encode("utf-8") + b"\n")
+                self._add_to_index(chunk, offset)
+
+    def find_chunks(self, run_id=None, track_id=None, frame_start=None, frame_end=None, danger=False):
+        with self._lock:
+            offsets = [offset for chunk_run, start, end, ids, has_danger, offset in self._index
+                       if (run_id is None or chunk_run == run_id)
+                       and (track_id is None or track_id in ids)
+                       and (frame_start is None or end >= frame_start)
+                       and (frame_end is None or start <= frame_end)
+                       and (not danger or has_danger)]
+            if not offsets:
+                return []
+            chunks = []
+            with open(self.path, "rb") as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    chunks.append(json.loads(f.readline()))
+        chunks.sort(key=lambda c: c["frame_start"])
+        return chunks
+
+
+# --- STORE ---
+class DetectionHistory:
+    """
+    Per-frame detection history (id, bbox, class, risk state, TTC) for incident reconstruction.
+    Rows are buffered in a columnar chunk covering chunk_frames frames; when a frame of the next
+    window arrives the chunk is sealed and written in bulk by a background thread, so the video
+    loop never waits on the backend.
+    Every chunk is stamped with the run_id of this instance and queries only see this run by default:
+    the same backend (file or collection) keeps the history of many runs.
+    """
+    def __init__(self, backend, chunk_frames=300, run_id=None):
+        """
+        :param run_id: identifier of this run (default: start time plus a random suffix).
+        """
+        self.backend = backend
+        self.chunk_frames = max(1, int(chunk_frames))
+        self.run_id = run_id if run_id is not None else new_run_id()
+        self.rows_recorded = 0
+        self.chunks_written = 0
+        self._backend_ready = False  # backend.prepare() done (on the writer thread)
+        self._lock = threading.Lock()
+        self._chunk = None
+        self._chunk_number = None
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _empty_chunk(self, chunk_number):
+        return {"run_id": self.run_id, "chunk": chunk_number, "frame_start": None, "frame_end": None,
+                "track_ids": [], "danger_ids": [], "columns": {name: [] for name in COLUMNS}}
+
+    def _seal(self):
+        # Called with self._lock held
+        if self._chunk is not None and self._chunk["columns"]["frame"]:
+            self._write_queue.put(self._chunk)
+        self._chunk = None
+
+    def record(self, frame_index, tracks):
+        """
+        Appends one row per tracked object of the frame.
+        :param tracks: TrackedObject instances (id, info['bbox'], info['class_id'], state, ttc).
+        """
+        chunk_number = frame_index // self.chunk_frames
+        with self._lock:
+            if chunk_number != self._chunk_number:
+                self._seal()
+                self._chunk_number = chunk_number
+            if self._chunk is None:
+                self._chunk = self._empty_chunk(chunk_number)
+
+            chunk = self._chunk
+            columns = chunk["columns"]
+            for obj in tracks:
+                obj_id = _native(obj.id)
+                x1, y1, x2, y2 = (_native(v) for v in obj.info['bbox'])
+                state_name = obj.state.name
+                ttc = getattr(obj, 'ttc', math.inf)
+
+                columns["frame"].append(frame_index)
+                columns["id"].append(obj_id)
+                columns["x1"].append(x1)
+                columns["y1"].append(y1)
+                columns["x2"].append(x2)
+                columns["y2"].append(y2)
+                columns["class_id"].append(_native(obj.info.get('class_id')))
+                columns["state"].append(state_name)
+                # TTC infinito (nessun avvicinamento) -> None, valido sia in JSON che in BSON
+                columns["ttc"].append(None if ttc is None or math.isinf(ttc) else float(ttc))
+
+                if obj_id not in chunk["track_ids"]:
+                    chunk["track_ids"].append(obj_id)
+                if state_name == "DANGER" and obj_id not in chunk["danger_ids"]:
+                    chunk["danger_ids"].append(obj_id)
+                self.rows_recorded += 1
+
+            if chunk["frame_start"] is None:
+                chunk["frame_start"] = frame_index
+            chunk["frame_end"] = frame_index
+
+    def _write_loop(self):
+        while True:
+            chunk = self._write_queue.get()
+            if chunk is None:
+                self._write_queue.task_done()
+                break
+            # Drain whatever else is ready so it goes out in a single bulk insert
+            batch = [chunk]
+            stop = False
+            while True:
+                try:
+                    extra = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    self._write_queue.task_done()
+                    break
+                batch.append(extra)
+            try:
+                if not self._backend_ready:
+                    self.backend.prepare()
+                    self._backend_ready = True
+                self.backend.insert_chunks(batch)
+                self.chunks_written += len(batch)
+            except Exception as e:
+                print(f"DetectionHistory: failed to write {len(batch)} chunks: {e}")
+            for _ in batch:
+                self._write_queue.task_done()
+            if stop:
+                break
+
+    def flush(self):
+        """Seals the current chunk and waits until every chunk has been written."""
+        with self._lock:
+            self._seal()
+            self._chunk_number = None
+        self._write_queue.join()
+
+    def close(self):
+        self.flush()
+        self._write_queue.put(None)
+        self._writer.join(timeout=5.0)
+        self.backend.close()
+
+    # --- QUERIES ---
+    def _chunks(self, run_id=None, **criteria):
+        """
+        Written chunks of run_id (this run if None) matching the criteria,
+        plus the chunk still being filled when querying this run.
+        """
+        run_id = self.run_id if run_id is None else run_id
+        self._write_queue.join()
+        chunks = self.backend.find_chunks(run_id=run_id, **criteria)
+        with self._lock:
+            if run_id == self.run_id and self._chunk is not None and self._chunk["columns"]["frame"]:
+                chunks.append(json.loads(json.dumps(self._chunk)))
+        return chunks
+
+    def trajectory(self, track_id, run_id=None):
+        """All rows of a track in run_id (this run if None), ordered by frame."""
+        rows = [row for chunk in self._chunks(run_id, track_id=track_id)
+                for row in _chunk_rows(chunk) if row["id"] == track_id]
+        rows.sort(key=lambda r: r["frame"])
+        return rows
+
+    def frame_range(self, frame_start, frame_end, run_id=None):
+        """All rows of run_id (this run if None) with frame_start <= frame <= frame_end, ordered by frame."""
+        rows = [row for chunk in self._chunks(run_id, frame_start=frame_start, frame_end=frame_end)
+                for row in _chunk_rows(chunk) if frame_start <= row["frame"] <= frame_end]
+        rows.sort(key=lambda r: r["frame"])
+        return rows
+
+    def danger_episodes(self, max_gap=1, min_frames=1, run_id=None):
+        """
+        Contiguous runs of DANGER rows per track in run_id (this run if None);
+        a gap of up to max_gap frames keeps the episode open.
+        :return: list of dicts with track_id, frame_start, frame_end, frames and min_ttc, ordered by start.
+        """
+        rows = [row for chunk in self._chunks(run_id, danger=True)
+                for row in _chunk_rows(chunk) if row["state"] == "DANGER"]
+        rows.sort(key=lambda r: (r["id"], r["frame"]))
+
+        episodes = []
+        current = None
+        for row in rows:
+            if current is not None and current["track_id"] == row["id"] \
+                    and row["frame"] - current["frame_end"] <= max_gap:
+                current["frame_end"] = row["frame"]
+                current["frames"] += 1
+            else:
+                current = {"track_id": row["id"], "frame_start": row["frame"], "frame_end": row["frame"],
+                           "frames": 1, "min_ttc": None}
+                episodes.append(current)
+            if row["ttc"] is not None and (current["min_ttc"] is None or row["ttc"] < current["min_ttc"]):
+                current["min_ttc"] = row["ttc"]
+
+        episodes = [e for e in episodes if e["frames"] >= min_frames]
+        episodes.sort(key=lambda e: (e["frame_start"], e["track_id"]))
+        return episodes
@@ -0,0 +1,84 @@
+import io
+import json
+import math
+import os
+import sys
+import threading
+
+from src.behavior.risk_observer import Observer
+
+
+def _native(value):
+    # Convert numpy types to native Python types (JSON friendly)
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def claim_stdout():
+    """
+    Reserves standard output for the event stream: returns a line-buffered stream on the original
+    stdout and redirects everything else the process prints (print, logging, native libraries)
+    to stderr, so the JSON lines on stdout stay parseable.
+    """
+    sys.stdout.flush()
+    try:
+        stdout_fd = sys.stdout.fileno()
+        events_fd = os.dup(stdout_fd)
+        os.dup2(sys.stderr.fileno(), stdout_fd)
+        return os.fdopen(events_fd, "w", encoding="utf-8", buffering=1)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        # stdout without a file descriptor (e.g. captured): redirect at the Python level only
+        stream = sys.stdout
+        sys.stdout = sys.stderr
+        return stream
+
+
+class EventStreamWriter(Observer):
+    """
+    Compact per-frame JSON-lines stream for headless runs: one line per frame with the
+    tracks (id, bbox, state, ttc) and the alarms raised in that frame.
+    Attach it to the TrackManager to collect the events; write_frame() then flushes them
+    together with the tracks of the frame.
+    Line format: {"frame": 12, "tracks": [[id, [x1, y1, x2, y2], "SAFE", ttc|null], ...],
+                  "events": [["DANGER", id, "message"], ...]}
+    """
+    def __init__(self, output_path="-", only_changes=False):
+        """
+        :param output_path: file path, or "-" for standard output (see claim_stdout: create the writer
+                            before anything else prints, every other output then goes to stderr).
+        :param only_changes: write only frames with at least one event (alarms, new/lost/merged tracks).
+        """
+        self.output_path = output_path
+        self.only_changes = only_changes
+        self.frames_written = 0
+        self._owns_file = output_path != "-"
+        self._file = open(output_path, "w", encoding="utf-8") if self._owns_file else claim_stdout()
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def update(self, event_type, track_id, message=""):
+        with self._lock:
+            self._pending.append([event_type, _native(track_id), message])
+
+    def write_frame(self, frame_index, tracks):
+        """
+        :param tracks: TrackedObject instances of the frame.
+        """
+        with self._lock:
+            events, self._pending = self._pending, []
+        if self.only_changes and not events:
+            return
+        rows = []
+        for obj in tracks:
+            ttc = getattr(obj, 'ttc', math.inf)
+            rows.append([_native(obj.id), [_native(v) for v in obj.info['bbox']], obj.state.name,
+                         None if ttc is None or math.isinf(ttc) else round(float(ttc), 2)])
+        line = {"frame": frame_index, "tracks": rows, "events": events}
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.frames_written += 1
+
+    def close(self):
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
@@ -0,0 +1,99 @@
+import threading
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+class HudRenderer:
+    """
+    Disegna box ed etichette delle tracce alla risoluzione di visualizzazione.
+    Il frame viene prima ridimensionato (in un buffer preallocato) e poi annotato con coordinate
+    scalate: si disegna su 1280x720 invece che sul frame a piena risoluzione, e la resize non
+    deve più rielaborare le annotazioni. Le misure delle etichette sono in cache per (ID, stato).
+    I buffer di uscita vengono presi da una lista di buffer liberi: chi riceve l'immagine da render()
+    la restituisce con recycle() quando non gli serve più (es. AsyncVideoWriter dopo la codifica),
+    così un frame ancora in coda o in codifica non viene mai sovrascritto.
+    """
+    def __init__(self, display_size=(1280, 720), font_scale=0.6, thickness=2, num_buffers=1,
+                 max_cached_labels=1024):
+        """
+        :param display_size: (larghezza, altezza) dell'immagine prodotta.
+        :param font_scale, thickness: dimensioni del testo e dei box misurate sul frame originale;
+                                      vengono scalate insieme al frame (stesso aspetto di prima).
+        :param num_buffers: buffer preallocati. Se sono tutti in uso se ne alloca uno nuovo.
+        """
+        self.display_size = tuple(display_size)
+        self.base_font_scale = font_scale
+        self.base_thickness = thickness
+        self.max_cached_labels = max_cached_labels
+        width, height = self.display_size
+        self._free = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(max(1, int(num_buffers)))]
+        self._free_lock = threading.Lock()  # recycle() arriva anche dal thread di codifica
+        self.buffers_allocated = len(self._free)
+        self._label_cache = {}   # (obj_id, state_name) -> (label, larghezza, altezza) in pixel di display
+        self._scale = None       # (sx, sy, font_scale, thickness, altezza etichetta) per la risoluzione corrente
+
+    def _update_scale(self, frame_w, frame_h):
+        width, height = self.display_size
+        sx, sy = width / frame_w, height / frame_h
+        if self._scale is not None and self._scale[:2] == (sx, sy):
+            return
+        font_scale = self.base_font_scale * sx
+        thickness = max(1, int(round(self.base_thickness * sx)))
+        label_h = max(1, int(round(20 * sy)))
+        self._scale = (sx, sy, font_scale, thickness, label_h)
+        self._label_cache.clear()  # le misure dipendono dalla scala del testo
+
+    def _label(self, obj_id, state_name):
+        key = (obj_id, state_name)
+        cached = self._label_cache.get(key)
+        if cached is None:
+            if len(self._label_cache) >= self.max_cached_labels:
+                self._label_cache.clear()
+            label = f"ID:{obj_id} [{state_name}]"
+            (text_w, text_h), _ = cv2.getTextSize(label, FONT, self._scale[2], self._scale[3])
+            cached = (label, text_w, text_h)
+            self._label_cache[key] = cached
+        return cached
+
+    def _take_buffer(self):
+        with self._free_lock:
+            if self._free:
+                return self._free.pop()
+            self.buffers_allocated += 1
+        width, height = self.display_size
+        return np.empty((height, width, 3), dtype=np.uint8)
+
+    def recycle(self, buffer):
+        """Restituisce un'immagine prodotta da render(): il buffer potrà essere riusato (thread-safe)."""
+        with self._free_lock:
+            self._free.append(buffer)
+
+    def render(self, frame, tracks):
+        """
+        :param tracks: iterabile di (id, bbox, stato), bbox nelle coordinate del frame originale.
+        :return: immagine annotata alla risoluzione di display (un buffer interno: va restituito con recycle).
+        """
+        frame_h, frame_w = frame.shape[:2]
+        self._update_scale(frame_w, frame_h)
+        sx, sy, font_scale, thickness, label_h = self._scale
+
+        display = self._take_buffer()
+        if (frame_w, frame_h) == self.display_size:
+            np.copyto(display, frame)
+        else:
+            cv2.resize(frame, self.display_size, dst=display, interpolation=cv2.INTER_LINEAR)
+
+        text_offset = max(1, int(round(5 * sy)))
+        for obj_id, bbox, state in tracks:
+            x1, y1, x2, y2 = bbox
+            x1, y1, x2, y2 = int(x1 * sx), int(y1 * sy), int(x2 * sx), int(y2 * sy)
+            color = state.color
+            label, text_w, _ = self._label(obj_id, state.name)
+
+            # Box e etichetta con sfondo colorato per leggibilità
+            cv2.rectangle(display, (x1, y1), (x2, y2), color, thickness)
+            cv2.rectangle(display, (x1, y1 - label_h), (x1 + text_w, y1), color, -1)
+            cv2.putText(display, label, (x1, y1 - text_offset), FONT, font_scale, (0, 0, 0), thickness)
+        return display
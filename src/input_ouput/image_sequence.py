@@ -0,0 +1,109 @@
+import os
+import cv2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def list_images_sorted(frames_dir, extensions=IMAGE_EXTENSIONS):
+    """Restituisce i percorsi delle immagini della cartella, in ordine di nome (00000, 00001...)."""
+    files = [f for f in os.listdir(frames_dir) if os.path.splitext(f)[1].lower() in extensions]
+    files.sort()
+    return [os.path.join(frames_dir, f) for f in files]
+
+
+class ImageSequenceSource:
+    """
+    Sorgente di frame da una cartella di immagini (sequenze KITTI/MOT).
+    Espone la stessa interfaccia di VideoInputFacade (get_frame, get_video_info, release),
+    ma decodifica in anticipo i frame successivi con un pool di thread.
+    cv2.imread rilascia il GIL durante la decodifica PNG, quindi i thread lavorano davvero in parallelo.
+    """
+    def __init__(self, frames_dir, fps=10.0, num_workers=4, prefetch=8, max_frames=None, extensions=IMAGE_EXTENSIONS):
+        """
+        :param frames_dir: cartella con i frame ordinati.
+        :param fps: frame rate nominale della sequenza (le immagini non lo contengono).
+        :param num_workers: numero di thread di decodifica.
+        :param prefetch: numero massimo di frame decodificati (o in decodifica) tenuti in memoria.
+        :param max_frames: limite opzionale sul numero di frame letti.
+        """
+        if not os.path.isdir(frames_dir):
+            raise ValueError(f"Errore: Cartella non trovata: {frames_dir}")
+
+        self.video_source = frames_dir
+        self.paths = list_images_sorted(frames_dir, extensions)
+        if max_frames is not None:
+            self.paths = self.paths[:max_frames]
+        if not self.paths:
+            raise ValueError(f"Errore: Nessuna immagine trovata in {frames_dir}")
+
+        self.fps = fps
+        self.prefetch = max(1, int(prefetch))
+        # Indice (posizione nella cartella) dell'ultimo frame restituito da get_frame
+        self.frame_index = -1
+        self.frames_skipped = 0  # immagini che cv2.imread non è riuscito a decodificare
+
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(num_workers)))
+        # Coda FIFO di (indice, future): l'ordine di consegna è quello di sottomissione
+        self._pending = deque()
+        self._next_to_submit = 0
+        self._fill()
+
+    def _fill(self):
+        """Sottomette nuove decodifiche finché non si raggiunge il limite di prefetch."""
+        while len(self._pending) < self.prefetch and self._next_to_submit < len(self.paths):
+            idx = self._next_to_submit
+            self._pending.append((idx, self._executor.submit(cv2.imread, self.paths[idx])))
+            self._next_to_submit += 1
+
+    def get_frame(self):
+        """
+        Restituisce il prossimo frame della sequenza, in ordine.
+        Le immagini illeggibili vengono saltate; frame_index indica la posizione del frame restituito.
+        :return: Il frame se disponibile, altrimenti None (fine sequenza).
+        """
+        while self._pending:
+            idx, future = self._pending.popleft()
+            frame = future.result()
+            self._fill()
+            if frame is None:
+                self.frames_skipped += 1
+                continue
+            self.frame_index = idx
+            return frame
+        return None
+
+    def get_batch(self, batch_size):
+        """
+        Restituisce fino a batch_size frame consecutivi e le rispettive posizioni nella sequenza.
+        :return: (frames, indici); liste vuote a fine sequenza.
+        """
+        frames, indices = [], []
+        while len(frames) < batch_size:
+            frame = self.get_frame()
+            if frame is None:
+                break
+            frames.append(frame)
+            indices.append(self.frame_index)
+        return frames, indices
+
+    def get_video_info(self):
+        """
+        Restituisce larghezza, altezza e FPS, letti dalla prima immagine della sequenza.
+        """
+        first = cv2.imread(self.paths[0])
+        height, width = first.shape[:2] if first is not None else (0, 0)
+        return width, height, self.fps
+
+    def __len__(self):
+        return len(self.paths)
+
+    def release(self):
+        """
+        Interrompe le decodifiche in sospeso e chiude il pool di thread.
+        """
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
@@ -1,49 +1,175 @@
-import cv2                   #In parole semplici: è il "cervello" che permette ai computer di "vedere" e capire cosa c'è in un'immagine o in un video
-
-class VideoInputFacade:      #Inizializza la sorgente video
-    def __init__(self, source_path): #parametro  video_source: Percorso del file video (es. "assets/video.mp4") oppure 0 per la webcam
-                                
-        self.video_source = source_path
-
-    # Se source_path è un numero (es. 0), lo converte in int per la webcam
-        if str(source_path).isdigit():                                          #questo controllo serve a capire se l'input è una stringa o un numero , se è una stringa e quindi un mercorso di un video lo apre altrimenti lo converte in un numero e in base al numero esegue derminati comportamenti per esempio se metto 0 si riferisce alla webcam di defaultdel pc , se metto 1 alla webcam esterna collegata tramite usb eccusb ecc 
-            source_path = int(source_path)
-            
-        self.capture = cv2.VideoCapture(source_path)
-        
-        if not self.capture.isOpened():
-            raise ValueError(f"Errore: Impossibile aprire il video o la webcam: {source_path}")
-       # if type(source_path) != str or "http" in str(source_path):
-          #  self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-
-    def get_frame(self):
-        """
-        Restituisce il prossimo frame del video.
-        :return: Il frame (immagine) se disponibile, altrimenti None (fine video).
-        """
-        ret, frame = self.capture.read()
-
-        #cv2.imshow('Frame', frame)
-        
-        if not ret:
-            return None
-        return frame
-
-    def get_video_info(self):
-        """
-        Restituisce larghezza, altezza e FPS. Utile per salvare il video output dopo.
-        """
-        width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = self.capture.get(cv2.CAP_PROP_FPS)
-        return width, height, fps
-
-    def release(self):
-        """
-        Chiude correttamente la risorsa video.
-        """
-        self.capture.release()
-        cv2.destroyAllWindows()
-    
-
-    
\ No newline at end of file
+import cv2                   #In parole semplici: è il "cervello" che permette ai computer di "vedere" e capire cosa c'è in un'immagine o in un video
+import threading
+import time
+from collections import deque
+
+# Politiche del buffer per la lettura in background
+POLICY_LOSSLESS = "lossless"        # File video: nessun frame viene scartato, il lettore aspetta
+POLICY_LATEST_ONLY = "latest-only"  # Sorgenti live: si tengono solo i frame più recenti
+
+class VideoInputFacade:      #Inizializza la sorgente video
+    def __init__(self, source_path, threaded=False, buffer_size=4, policy=None): #parametro  video_source: Percorso del file video (es. "assets/video.mp4") oppure 0 per la webcam
+        """
+        :param threaded: se True un thread dedicato decodifica i frame in un buffer circolare.
+        :param buffer_size: capacità massima del buffer (numero di frame).
+        :param policy: "lossless" o "latest-only". Se None viene scelta in base alla sorgente
+                       (live -> latest-only, file -> lossless).
+        """
+        self.video_source = source_path
+
+    # Se source_path è un numero (es. 0), lo converte in int per la webcam
+        if str(source_path).isdigit():                                          #questo controllo serve a capire se l'input è una stringa o un numero , se è una stringa e quindi un mercorso di un video lo apre altrimenti lo converte in un numero e in base al numero esegue derminati comportamenti per esempio se metto 0 si riferisce alla webcam di defaultdel pc , se metto 1 alla webcam esterna collegata tramite usb eccusb ecc
+            source_path = int(source_path)
+
+        self.capture = cv2.VideoCapture(source_path)
+
+        if not self.capture.isOpened():
+            raise ValueError(f"Errore: Impossibile aprire il video o la webcam: {source_path}")
+       # if type(source_path) != str or "http" in str(source_path):
+          #  self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.is_live = isinstance(source_path, int) or "://" in str(source_path)
+        if policy is None:
+            policy = POLICY_LATEST_ONLY if self.is_live else POLICY_LOSSLESS
+        if policy not in (POLICY_LOSSLESS, POLICY_LATEST_ONLY):
+            raise ValueError(f"Errore: Politica del buffer sconosciuta: {policy}")
+
+        self.threaded = threaded
+        self.policy = policy
+        self.buffer_size = max(1, int(buffer_size))
+
+        # Statistiche di lettura
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.last_decode_time = 0.0   # secondi spesi nell'ultima read()
+        self.total_decode_time = 0.0
+
+        self._stopped = False
+        self._capture_released = False
+        self._release_lock = threading.Lock()
+        if self.threaded:
+            # Buffer circolare: con maxlen, append() scarta automaticamente il frame più vecchio
+            self._buffer = deque(maxlen=self.buffer_size)
+            self._cond = threading.Condition()
+            self._eof = False
+            if self.is_live:
+                # Il backend non deve accumulare frame vecchi: ci pensa il nostro buffer
+                self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self._reader_thread = threading.Thread(target=self._reader, daemon=True)
+            self._reader_thread.start()
+
+    def _read_timed(self):
+        """Legge un frame dalla sorgente misurando il tempo di decodifica."""
+        start = time.perf_counter()
+        ret, frame = self.capture.read()
+        elapsed = time.perf_counter() - start
+        self.last_decode_time = elapsed
+        self.total_decode_time += elapsed
+        if ret:
+            self.frames_read += 1
+        return ret, frame
+
+    def _reader(self):
+        """
+        Thread di lettura: decodifica continuamente i frame nel buffer circolare.
+        - lossless: se il buffer è pieno aspetta che il consumatore liberi un posto.
+        - latest-only: se il buffer è pieno scarta il frame più vecchio.
+        Se release() non è riuscita ad aspettarlo (read() bloccata su uno stream lento),
+        è questo thread a chiudere la sorgente appena la lettura in corso termina.
+        """
+        try:
+            while not self._stopped:
+                ret, frame = self._read_timed()
+                with self._cond:
+                    if not ret:
+                        self._eof = True
+                        self._cond.notify_all()
+                        return
+                    if self.policy == POLICY_LOSSLESS:
+                        while len(self._buffer) >= self.buffer_size and not self._stopped:
+                            self._cond.wait()
+                    elif len(self._buffer) >= self.buffer_size:
+                        self.frames_dropped += 1
+                    self._buffer.append(frame)
+                    self._cond.notify_all()
+        finally:
+            if self._stopped:
+                self._release_capture()
+
+    def _release_capture(self):
+        # Una sola volta, da release() o dal thread di lettura: mai durante una read()
+        with self._release_lock:
+            if self._capture_released:
+                return
+            self._capture_released = True
+        self.capture.release()
+
+    def get_frame(self):
+        """
+        Restituisce il prossimo frame del video.
+        :return: Il frame (immagine) se disponibile, altrimenti None (fine video).
+        """
+        if self.threaded:
+            with self._cond:
+                while not self._buffer and not self._eof and not self._stopped:
+                    self._cond.wait()
+                if not self._buffer:
+                    return None
+                if self.policy == POLICY_LATEST_ONLY:
+                    # Consegniamo il frame più recente e scartiamo quelli rimasti indietro
+                    frame = self._buffer.pop()
+                    self.frames_dropped += len(self._buffer)
+                    self._buffer.clear()
+                else:
+                    frame = self._buffer.popleft()
+                self._cond.notify_all()
+                return frame
+
+        ret, frame = self._read_timed()
+
+        #cv2.imshow('Frame', frame)
+
+        if not ret:
+            return None
+        return frame
+
+    def get_video_info(self):
+        """
+        Restituisce larghezza, altezza e FPS. Utile per salvare il video output dopo.
+        """
+        width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        return width, height, fps
+
+    def get_stats(self):
+        """
+        Restituisce le statistiche di lettura: frame letti, frame scartati,
+        tempo di decodifica dell'ultimo frame e medio (in millisecondi).
+        """
+        avg_decode = self.total_decode_time / self.frames_read if self.frames_read else 0.0
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "last_decode_ms": self.last_decode_time * 1000.0,
+            "avg_decode_ms": avg_decode * 1000.0,
+        }
+
+    def release(self):
+        """
+        Chiude correttamente la risorsa video.
+        """
+        self._stopped = True
+        if self.threaded:
+            with self._cond:
+                self._cond.notify_all()
+            self._reader_thread.join(timeout=1.0)
+        # Se il lettore è ancora dentro capture.read() la sorgente la chiude lui quando esce
+        if not self.threaded or not self._reader_thread.is_alive():
+            self._release_capture()
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            pass  # OpenCV senza supporto GUI (unità headless)
+
+
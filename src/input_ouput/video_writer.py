@@ -0,0 +1,97 @@
+import cv2
+import threading
+import time
+from collections import deque
+
+class AsyncVideoWriter:
+    """
+    Scrive un video su file in un thread separato: chi chiama write() non aspetta mai la codifica.
+    I frame passano da una coda limitata; se il codificatore resta indietro e la coda è piena,
+    il nuovo frame viene scartato (e contato) invece di bloccare la pipeline.
+    I frame sono tenuti per riferimento: chi li scrive non deve modificarli finché on_done non
+    li restituisce (es. HudRenderer.recycle).
+    """
+    def __init__(self, output_path, fps, frame_size, queue_size=8, fourcc="mp4v", on_done=None):
+        """
+        :param frame_size: (larghezza, altezza) dei frame che verranno scritti.
+        :param queue_size: frame massimi in attesa di codifica.
+        :param on_done: callback(frame) chiamato quando un frame è stato codificato o scartato.
+        """
+        self.output_path = output_path
+        self.frame_size = tuple(frame_size)
+        self.writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps if fps and fps > 0 else 30.0,
+                                      self.frame_size)
+        if not self.writer.isOpened():
+            raise ValueError(f"Errore: Impossibile creare il video di output: {output_path}")
+
+        self.queue_size = max(1, int(queue_size))
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.total_encode_time = 0.0
+        self.on_done = on_done
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._encoder, daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        """
+        Accoda un frame per la codifica. Non blocca mai.
+        :return: False se il frame è stato scartato (coda piena o writer chiuso).
+        """
+        with self._cond:
+            accepted = not self._closed and len(self._queue) < self.queue_size
+            if accepted:
+                self._queue.append(frame)
+                self._cond.notify()
+            else:
+                self.frames_dropped += 1
+        if not accepted and self.on_done is not None:
+            self.on_done(frame)
+        return accepted
+
+    def _encoder(self):
+        """Thread di codifica: svuota la coda finché il writer non viene chiuso."""
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                frame = self._queue.popleft()
+
+            encoded = frame
+            if (frame.shape[1], frame.shape[0]) != self.frame_size:
+                encoded = cv2.resize(frame, self.frame_size)
+            start = time.perf_counter()
+            self.writer.write(encoded)
+            self.total_encode_time += time.perf_counter() - start
+            self.frames_written += 1
+            if self.on_done is not None:
+                self.on_done(frame)
+
+    def get_stats(self):
+        """
+        Restituisce frame scritti, frame scartati, frame in coda e tempo medio di codifica (ms).
+        """
+        with self._cond:
+            pending = len(self._queue)
+        avg_encode = self.total_encode_time / self.frames_written if self.frames_written else 0.0
+        return {
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "queue_depth": pending,
+            "avg_encode_ms": avg_encode * 1000.0,
+        }
+
+    def release(self):
+        """
+        Codifica i frame ancora in coda e chiude il file.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.writer.release()
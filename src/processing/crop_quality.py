@@ -0,0 +1,44 @@
+import math
+import cv2
+import numpy as np
+
+# Valori di riferimento per normalizzare ogni termine di qualità in [0, 1]
+SHARPNESS_REF = 300.0     # varianza del Laplaciano di un ritaglio ben a fuoco
+WIDTH_REF = 300.0         # larghezza del ritaglio (px) da cui le targhe sono di solito leggibili
+ASPECT_REF = 1.3          # larghezza/altezza tipica di un veicolo visto da dietro
+ANALYSIS_SIDE = 160       # lato a cui si riducono i ritagli prima di misurarne la nitidezza
+
+
+def crop_quality(vehicle_crop, bbox, frame_shape):
+    """
+    Stima economica (0..1) di quanto è probabile leggere una targa dal ritaglio di un veicolo.
+    Combina:
+    - nitidezza: varianza del Laplaciano su una piccola copia in scala di grigi (mosso -> bassa);
+    - dimensione: larghezza del ritaglio rispetto a WIDTH_REF (veicoli lontani -> bassa);
+    - proporzioni: distanza dalle proporzioni tipiche di un retro (box parziali/occlusi -> basse);
+    - posizione: i box tagliati dal bordo del frame sono penalizzati (targa probabilmente tagliata).
+    """
+    h, w = vehicle_crop.shape[:2]
+    if h == 0 or w == 0:
+        return 0.0
+
+    scale = min(1.0, ANALYSIS_SIDE / max(h, w))
+    small = vehicle_crop
+    if scale < 1.0:
+        small = cv2.resize(vehicle_crop, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    sharpness = min(1.0, float(cv2.Laplacian(gray, cv2.CV_64F).var()) / SHARPNESS_REF)
+
+    size = min(1.0, w / WIDTH_REF)
+    aspect = math.exp(-abs(math.log((w / h) / ASPECT_REF)))
+
+    frame_h, frame_w = frame_shape[:2]
+    x1, y1, x2, y2 = bbox
+    clipped = x1 <= 0 or y1 <= 0 or x2 >= frame_w or y2 >= frame_h
+    position = 0.5 if clipped else 1.0
+
+    # Media geometrica pesata: un solo termine pessimo abbassa tutto il punteggio
+    terms = np.array([sharpness, size, aspect, position]) + 1e-6
+    weights = np.array([0.4, 0.3, 0.15, 0.15])
+    return float(np.exp(np.sum(weights * np.log(terms))))
@@ -1,87 +1,277 @@
-from ultralytics import YOLO
-import cv2
-from src.processing.tracker_memory import VisualMemory
-
-class ObjectDetector:
-    # 1. Aggiungiamo 'conf_threshold' come parametro opzionale (default 0.60)
-    def __init__(self, model_name="yolo11s.pt", conf_threshold=0.60):
-        print(f"Caricamento modello {model_name} con soglia confidenza {conf_threshold}...")
-        self.model = YOLO(model_name)
-        self.target_classes = [0, 2, 3, 5, 7]
-        self.conf_threshold = conf_threshold  # Salviamo la soglia
-        
-        # Inizializza la memoria dinamica
-        self.memory = VisualMemory() 
-        
-        # Set per evitare conflitti ID nello stesso frame
-        self.active_ids_in_frame = set()
-
-
-    def detect_and_track(self, frame):
-       
-        self.memory.increment_lost_counters()
-            # Tracking YOLO base 
-        # 2. Usiamo self.conf_threshold invece del valore fisso 0.25
-        # Questo dirà a YOLO: "Ignora tutto ciò di cui non sei sicuro almeno al 60%"
-        results = self.model.track(
-            source=frame, 
-            conf=self.conf_threshold, 
-            iou=0.5, 
-            persist=True, 
-            tracker="botsort.yaml", 
-            imgsz=640, 
-            verbose=False,
-            # --- MODIFICA AGGIUNTA ---
-            # Passando le classi QUI, il tracker ignora completamente oggetti inutili (es. panchine)
-            # e non assegna loro numeri. Così i numeri per auto/camion saranno sequenziali.
-            classes=self.target_classes
-        )
-        
-        detected_objects = [] 
-        if not results or results[0].boxes is None or results[0].boxes.id is None:
-            return []
-
-        result = results[0]
-        boxes = result.boxes.xyxy.cpu().numpy()
-        
-        # Nota: Se vuoi vedere la confidenza di ogni oggetto rilevato, puoi estrarla qui:
-        # confs = result.boxes.conf.cpu().numpy()
-        
-        track_ids = result.boxes.id.int().cpu().numpy()
-        class_ids = result.boxes.cls.int().cpu().numpy()
-        
-        h, w, _ = frame.shape
-         # Reset ID attivi per questo frame
-        self.active_ids_in_frame = set(track_ids)
-
-        for box, track_id, class_id in zip(boxes, track_ids, class_ids):
-            if class_id in self.target_classes:
-                x1, y1, x2, y2 = map(int, box)
-                
-                # Calcolo Centro
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-                current_center = (center_x, center_y)
-
-                final_id = track_id
-                # Ritaglio Texture Corrente
-                crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
-
-                if crop.size > 0:
-                    # --- LOGICA TOOCM ---
-                    matched_id = self.memory.find_match(crop, current_center)
-                    if matched_id is not None:
-                        if matched_id not in self.active_ids_in_frame:
-                            final_id = matched_id
-                            self.active_ids_in_frame.add(final_id)
-                    self.memory.update_memory(final_id, crop, current_center)
-
-                obj_data = {
-                    "id": final_id,
-                    "bbox": (x1, y1, x2, y2),
-                    "class_id": class_id,
-                    "center": current_center
-                }
-                detected_objects.append(obj_data)
-
-        return detected_objects
\ No newline at end of file
+import cv2
+from src.processing.tracker_memory import VisualMemory
+from src.processing.inference_backend import load_model, BACKEND_PYTORCH
+from src.processing.motion_propagator import MotionPropagator
+from src.behavior.state_machine import lane_bounds
+
+class ObjectDetector:
+    # 1. Aggiungiamo 'conf_threshold' come parametro opzionale (default 0.60)
+    # backend: "pytorch" (checkpoint .pt), "onnx" o "openvino" (modello esportato e messo in cache)
+    # keyframe_interval: YOLO gira un frame ogni K; nei frame intermedi i box vengono propagati con optical flow.
+    # scene_change_threshold: se la scena cambia più di questa soglia (0-1) si forza subito un keyframe.
+    def __init__(self, model_name="yolo11s.pt", conf_threshold=0.60, backend=BACKEND_PYTORCH, imgsz=640, num_threads=None,
+                 keyframe_interval=1, scene_change_threshold=None,
+                 roi_mode=False, roi_margin=0.15, roi_full_frame_interval=10,
+                 feature_max_side=None):
+        print(f"Caricamento modello {model_name} ({backend}) con soglia confidenza {conf_threshold}...")
+        self.backend = backend
+        self.imgsz = imgsz
+        self.model = load_model(model_name, backend=backend, imgsz=imgsz, num_threads=num_threads)
+        self.target_classes = [0, 2, 3, 5, 7]
+        self.conf_threshold = conf_threshold  # Salviamo la soglia
+
+        # Inizializza la memoria dinamica
+        # feature_max_side: lato massimo del ritaglio usato per l'istogramma (None = risoluzione piena)
+        self.memory = VisualMemory(feature_max_side=feature_max_side)
+
+        # Set per evitare conflitti ID nello stesso frame
+        self.active_ids_in_frame = set()
+        # Registro condiviso delle identità (IdentityRegistry): se impostato, gli ID uniti
+        # vengono risolti nell'ID canonico prima di memoria TOOCM e output
+        self.identity = None
+
+        # Modalità keyframe (keyframe_interval=1 -> YOLO su ogni frame, comportamento originale)
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.scene_change_threshold = scene_change_threshold
+        self.propagator = MotionPropagator()
+        self.frames_since_keyframe = 0
+        self.detector_calls = 0      # frame elaborati da YOLO
+        self.propagated_frames = 0   # frame ottenuti per propagazione
+
+        # Modalità ROI: YOLO lavora solo sul ritaglio che contiene la corsia (più un margine),
+        # con un passaggio a frame intero ogni roi_full_frame_interval per non perdere i tagli di strada.
+        # I veicoli fuori dal ritaglio visti nell'ultimo passaggio intero vengono riportati, marcati
+        # "stale", nei passaggi ROI: per TrackManager e memoria TOOCM non spariscono a ogni passaggio.
+        self.roi_mode = roi_mode
+        self.roi_margin = roi_margin
+        self.roi_full_frame_interval = max(1, int(roi_full_frame_interval))
+        self._roi_cache = {}          # (h, w) -> (x1, y1, x2, y2)
+        self._roi_context = None      # (x0, y0, frame intero) durante un passaggio ROI
+        self._off_roi_objects = []    # rilevazioni fuori ROI dell'ultimo passaggio a frame intero
+        # Il callback va eseguito PRIMA del tracker: riporta i box in coordinate frame
+        # così BoT-SORT vede sempre lo stesso sistema di riferimento.
+        self.model.callbacks["on_predict_postprocess_end"].insert(0, self._roi_to_frame)
+
+    def _track(self, source):
+        """
+        Esegue YOLO + tracker su un frame o su una lista di frame.
+        Con una lista la rete fa un unico forward pass batch, poi ultralytics
+        aggiorna il tracker frame per frame nell'ordine della lista.
+        """
+        # 2. Usiamo self.conf_threshold invece del valore fisso 0.25
+        # Questo dirà a YOLO: "Ignora tutto ciò di cui non sei sicuro almeno al 60%"
+        return self.model.track(
+            source=source,
+            conf=self.conf_threshold,
+            iou=0.5,
+            persist=True,
+            tracker="botsort.yaml",
+            imgsz=self.imgsz,
+            verbose=False,
+            # --- MODIFICA AGGIUNTA ---
+            # Passando le classi QUI, il tracker ignora completamente oggetti inutili (es. panchine)
+            # e non assegna loro numeri. Così i numeri per auto/camion saranno sequenziali.
+            classes=self.target_classes
+        )
+
+    def detect_and_track(self, frame):
+
+        if self.keyframe_interval > 1:
+            propagated = self._propagate(frame)
+            if propagated is not None:
+                return propagated
+
+        self.memory.increment_lost_counters()
+            # Tracking YOLO base
+        roi_pass = self.roi_mode and self.detector_calls % self.roi_full_frame_interval != 0
+        if roi_pass:
+            self._refresh_off_roi_ids()
+            # Non visibili nel ritaglio, ma non persi: niente invecchiamento né recupero TOOCM
+            self.memory.keep_alive(det['id'] for det in self._off_roi_objects)
+            x1, y1, x2, y2 = self.get_roi(frame.shape)
+            self._roi_context = (x1, y1, frame)
+            try:
+                results = self._track(frame[y1:y2, x1:x2])
+            finally:
+                self._roi_context = None
+        else:
+            results = self._track(frame)
+        self.detector_calls += 1
+        detected_objects = self._process_result(frame, results[0]) if results else []
+        if self.roi_mode:
+            detected_objects = self._carry_off_roi(frame.shape, detected_objects, roi_pass)
+
+        if self.keyframe_interval > 1:
+            self.propagator.reset(frame, detected_objects)
+            self.frames_since_keyframe = 0
+        return detected_objects
+
+    def set_keyframe_interval(self, keyframe_interval):
+        """
+        Cambia K durante l'esecuzione (es. scheduler adattivo).
+        Il frame successivo è sempre un keyframe, così il propagatore riparte da box aggiornati.
+        """
+        keyframe_interval = max(1, int(keyframe_interval))
+        if keyframe_interval != self.keyframe_interval:
+            self.keyframe_interval = keyframe_interval
+            self.frames_since_keyframe = keyframe_interval
+
+    def _propagate(self, frame):
+        """
+        Decide se il frame corrente può fare a meno di YOLO.
+        Restituisce i box propagati dall'ultimo keyframe, oppure None se serve un nuovo keyframe:
+        intervallo K raggiunto, cambio di scena sopra soglia o propagazione non affidabile.
+        La memoria TOOCM non invecchia sui frame propagati: conta i passaggi del detector.
+        """
+        if self.frames_since_keyframe + 1 >= self.keyframe_interval:
+            return None
+        # Scala di grigi e riduzione una sola volta, per il cambio di scena e per l'optical flow
+        gray = self.propagator.prepare(frame)
+        if self.scene_change_threshold is not None and \
+                self.propagator.scene_change(frame, gray) > self.scene_change_threshold:
+            return None
+
+        detections = self.propagator.propagate(frame, gray)
+        if detections is None:
+            return None
+        self.frames_since_keyframe += 1
+        self.propagated_frames += 1
+        if self.identity is not None:
+            # Un'unione di ID può essere arrivata dopo l'ultimo keyframe
+            self.identity.resolve_detections(detections)
+        return detections
+
+    def detect_and_track_batch(self, frames):
+        """
+        Versione batch di detect_and_track per le elaborazioni offline (eval_mot.py, video su file).
+        Il detector lavora su tutti i frame in un solo forward pass; tracker e logica TOOCM
+        vengono poi applicati frame per frame, in ordine, quindi gli ID coincidono con la modalità sequenziale.
+        :return: lista (una per frame) di liste di oggetti rilevati.
+        """
+        if not frames:
+            return []
+        results = self._track(list(frames))
+
+        batch_objects = []
+        for frame, result in zip(frames, results):
+            # La memoria invecchia di un passo per ogni frame, come nella modalità sequenziale
+            self.memory.increment_lost_counters()
+            batch_objects.append(self._process_result(frame, result))
+        return batch_objects
+
+    def get_roi(self, frame_shape):
+        """
+        Ritaglio (x1, y1, x2, y2) che contiene la corsia trapezoidale di TrackedObject.update,
+        allargato di roi_margin (frazione della larghezza) per i veicoli con il centro in corsia
+        ma il box che ne esce. La corsia è più larga in basso, quindi basta la sua base.
+        """
+        h, w = frame_shape[:2]
+        if (h, w) not in self._roi_cache:
+            lane_start, lane_end = lane_bounds(h, w, h)
+            margin = self.roi_margin * w
+            x1 = max(0, int(lane_start - margin))
+            x2 = min(w, int(lane_end + margin))
+            self._roi_cache[(h, w)] = (x1, 0, x2, h)
+        return self._roi_cache[(h, w)]
+
+    def _refresh_off_roi_ids(self):
+        # Un'unione di ID può essere arrivata dopo l'ultimo passaggio a frame intero
+        if self.identity is not None:
+            for det in self._off_roi_objects:
+                det['id'] = self.identity.resolve(det['id'])
+
+    def _carry_off_roi(self, frame_shape, detected_objects, roi_pass):
+        """
+        Passaggio a frame intero: ricorda le rilevazioni con il box non contenuto nel ritaglio ROI.
+        Passaggio ROI: le aggiunge all'output (ultimo box noto, "stale": True) se il ritaglio
+        non le ha già viste con lo stesso ID.
+        """
+        roi_x1, roi_y1, roi_x2, roi_y2 = self.get_roi(frame_shape)
+        if not roi_pass:
+            self._off_roi_objects = [dict(det) for det in detected_objects
+                                     if det['bbox'][0] < roi_x1 or det['bbox'][2] > roi_x2
+                                     or det['bbox'][1] < roi_y1 or det['bbox'][3] > roi_y2]
+            return detected_objects
+        seen = {det['id'] for det in detected_objects}
+        carried = [dict(det, stale=True) for det in self._off_roi_objects if det['id'] not in seen]
+        return detected_objects + carried
+
+    def _roi_to_frame(self, predictor):
+        """Callback ultralytics: trasla i box dal ritaglio ROI alle coordinate del frame intero."""
+        if self._roi_context is None:
+            return
+        x0, y0, full_frame = self._roi_context
+        im0s = predictor.batch[1]
+        for i, result in enumerate(predictor.results):
+            if result.boxes is not None and len(result.boxes):
+                data = result.boxes.data
+                data[:, 0] += x0
+                data[:, 2] += x0
+                data[:, 1] += y0
+                data[:, 3] += y0
+                result.boxes.orig_shape = full_frame.shape[:2]
+            result.orig_img = full_frame
+            result.orig_shape = full_frame.shape[:2]
+            if isinstance(im0s, list):
+                im0s[i] = full_frame
+
+    def _process_result(self, frame, result):
+        """Converte il risultato YOLO di un frame in oggetti rilevati, applicando il recupero TOOCM."""
+        detected_objects = []
+        if result.boxes is None or result.boxes.id is None:
+            return []
+
+        boxes = result.boxes.xyxy.cpu().numpy()
+
+        # Nota: Se vuoi vedere la confidenza di ogni oggetto rilevato, puoi estrarla qui:
+        # confs = result.boxes.conf.cpu().numpy()
+
+        track_ids = result.boxes.id.int().cpu().numpy()
+        class_ids = result.boxes.cls.int().cpu().numpy()
+
+        h, w, _ = frame.shape
+         # Reset ID attivi per questo frame
+        self.active_ids_in_frame = set(track_ids)
+        if self.identity is not None:
+            self.active_ids_in_frame = {self.identity.resolve(t) for t in self.active_ids_in_frame}
+
+        candidates = []
+        for box, track_id, class_id in zip(boxes, track_ids, class_ids):
+            if class_id in self.target_classes:
+                x1, y1, x2, y2 = map(int, box)
+
+                # Calcolo Centro
+                center_x = int((x1 + x2) / 2)
+                center_y = int((y1 + y2) / 2)
+                current_center = (center_x, center_y)
+
+                # Ritaglio Texture Corrente
+                crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+                # Descrittore di aspetto calcolato una sola volta: serve sia al recupero sia alla memoria
+                feature = self.memory.compute_feature(crop)
+                candidates.append((track_id, (x1, y1, x2, y2), class_id, current_center, feature))
+
+        # --- LOGICA TOOCM ---
+        # Un unico assegnamento globale per tutte le rilevazioni del frame contro gli ID persi
+        matches = self.memory.find_matches(
+            [c[4] for c in candidates], [c[3] for c in candidates], exclude_ids=self.active_ids_in_frame
+        )
+
+        for i, (track_id, bbox, class_id, current_center, feature) in enumerate(candidates):
+            final_id = matches.get(i, track_id)
+            if self.identity is not None:
+                final_id = self.identity.resolve(final_id)
+            if final_id != track_id:
+                self.active_ids_in_frame.add(final_id)
+            if feature is not None:
+                self.memory.update_memory(final_id, None, current_center, feature=feature)
+
+            obj_data = {
+                "id": final_id,
+                "bbox": bbox,
+                "class_id": class_id,
+                "center": current_center
+            }
+            detected_objects.append(obj_data)
+
+        return detected_objects
@@ -0,0 +1,74 @@
+import threading
+
+class IdentityRegistry:
+    """
+    Registro condiviso delle identità (union-find).
+    Quando due ID risultano lo stesso veicolo (es. stessa targa già nel DB), merge(old, new) li unisce:
+    da quel momento resolve() restituisce per entrambi l'ID canonico, quello che sopravvive.
+    - resolve: risalita fino alla radice con path compression (quasi O(1) ammortizzato);
+    - merge: O(1) più i callback registrati (memoria TOOCM, storico OCR), eseguiti DOPO aver rilasciato
+      il lock: nessun lock dei componenti viene mai preso mentre si tiene quello del registro, così un
+      componente può chiamare resolve() sotto il proprio lock senza rischio di deadlock.
+      Chi legge lo stato da un altro thread deve tollerare l'intervallo tra l'unione e il callback
+      (es. TrackManager riallinea le proprie tracce con resolve() a ogni frame).
+    Gli ID mai uniti non occupano memoria: resolve(x) restituisce x.
+    """
+    def __init__(self):
+        self._parent = {}            # id -> id padre (solo per gli ID uniti a un altro)
+        self._callbacks = []         # callback(old_root, new_root) chiamati a ogni unione
+        self._lock = threading.RLock()
+        self.merges = 0
+
+    def __len__(self):
+        """Numero di ID che puntano a un altro ID."""
+        return len(self._parent)
+
+    def on_merge(self, callback):
+        """Registra callback(old_id, new_id): deve spostare lo stato di old_id su new_id."""
+        self._callbacks.append(callback)
+
+    def _find(self, obj_id):
+        parent = self._parent
+        root = obj_id
+        while root in parent:
+            root = parent[root]
+        # Path compression: tutti i nodi attraversati puntano direttamente alla radice
+        while obj_id != root:
+            next_id = parent[obj_id]
+            parent[obj_id] = root
+            obj_id = next_id
+        return root
+
+    def resolve(self, obj_id):
+        """ID canonico di obj_id (obj_id stesso se non è mai stato unito)."""
+        if obj_id not in self._parent:
+            return obj_id
+        with self._lock:
+            return self._find(obj_id)
+
+    def resolve_detections(self, detections):
+        """Sostituisce in place 'id' di ogni rilevazione con l'ID canonico."""
+        if not self._parent:
+            return detections
+        with self._lock:
+            for det in detections:
+                if det['id'] in self._parent:
+                    det['id'] = self._find(det['id'])
+        return detections
+
+    def merge(self, old_id, new_id):
+        """
+        Unisce old_id a new_id: sopravvive l'ID canonico di new_id (es. quello già presente nel DB).
+        :return: l'ID canonico risultante.
+        """
+        with self._lock:
+            old_root = self._find(old_id)
+            new_root = self._find(new_id)
+            if old_root == new_root:
+                return new_root
+            self._parent[old_root] = new_root
+            self.merges += 1
+        # Fuori dal lock: i callback prendono i lock dei rispettivi componenti
+        for callback in self._callbacks:
+            callback(old_root, new_root)
+        return new_root
@@ -0,0 +1,122 @@
+import os
+import hashlib
+import shutil
+import numpy as np
+from ultralytics import YOLO
+
+# Backend di inferenza supportati
+BACKEND_PYTORCH = "pytorch"
+BACKEND_ONNX = "onnx"
+BACKEND_OPENVINO = "openvino"
+
+# backend -> suffisso del file/cartella esportata (ultralytics riconosce il formato dal nome)
+_EXPORT_SUFFIX = {
+    BACKEND_ONNX: ".onnx",
+    BACKEND_OPENVINO: "_openvino_model",
+}
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    """Hash SHA-1 (primi 12 caratteri) del file dei pesi: cambia se cambiano i pesi."""
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+
+def _resolve_weights(model_name):
+    """
+    Restituisce il percorso locale del checkpoint .pt.
+    Se il file non esiste ancora, YOLO lo scarica e ce ne restituisce il percorso.
+    """
+    if os.path.isfile(model_name):
+        return model_name, None
+    model = YOLO(model_name)
+    return str(model.ckpt_path), model
+
+
+def exported_model_path(weights_path, backend, imgsz):
+    """
+    Percorso del modello esportato in cache, accanto ai pesi.
+    Es: yolov8s.pt -> yolov8s-<hash>-640.onnx
+    """
+    folder = os.path.dirname(os.path.abspath(weights_path))
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    return os.path.join(folder, f"{stem}-{_file_hash(weights_path)}-{imgsz}{_EXPORT_SUFFIX[backend]}")
+
+
+def configure_threads(num_threads):
+    """
+    Limita i thread usati da PyTorch per l'inferenza su CPU.
+    OMP_NUM_THREADS non viene impostata: torch e cv2 sono già importati qui, e il runtime OpenMP
+    la legge solo all'avvio. ONNX Runtime e OpenVINO ricevono i thread in _apply_runtime_threads.
+    """
+    if not num_threads:
+        return
+    import torch
+    torch.set_num_threads(num_threads)
+
+
+def _apply_runtime_threads(model, backend, exported_path, imgsz, num_threads):
+    """
+    Esegue un'inferenza di riscaldamento (così il primo frame reale non paga l'inizializzazione)
+    e, dove il runtime lo permette, ricrea la sessione con il numero di thread richiesto.
+    """
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    if not num_threads or model.predictor is None:
+        return
+    backend_model = model.predictor.model
+
+    try:
+        if backend == BACKEND_ONNX and hasattr(backend_model, "session"):
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+            backend_model.session = onnxruntime.InferenceSession(
+                exported_path, sess_options=options, providers=backend_model.session.get_providers()
+            )
+        elif backend == BACKEND_OPENVINO and hasattr(backend_model, "ov_compiled_model"):
+            import openvino as ov
+            core = ov.Core()
+            xml_path = next(p for p in os.listdir(exported_path) if p.endswith(".xml"))
+            backend_model.ov_compiled_model = core.compile_model(
+                core.read_model(os.path.join(exported_path, xml_path)),
+                device_name="CPU",
+                config={"INFERENCE_NUM_THREADS": num_threads, "PERFORMANCE_HINT": "LATENCY"},
+            )
+    except Exception as e:
+        # Non bloccante: restano le impostazioni di default del runtime
+        print(f"Impossibile impostare {num_threads} thread per il backend {backend}: {e}")
+
+
+def load_model(model_name, backend=BACKEND_PYTORCH, imgsz=640, num_threads=None):
+    """
+    Carica il modello YOLO con il backend richiesto.
+    - pytorch: carica direttamente il checkpoint .pt (comportamento originale).
+    - onnx / openvino: esporta il modello una sola volta e lo mette in cache accanto ai pesi,
+      con nome legato all'hash dei pesi e a imgsz; gli avvii successivi caricano direttamente l'export.
+    """
+    configure_threads(num_threads)
+
+    if backend == BACKEND_PYTORCH:
+        return YOLO(model_name)
+    if backend not in _EXPORT_SUFFIX:
+        raise ValueError(f"Backend di inferenza sconosciuto: {backend}")
+
+    weights_path, pt_model = _resolve_weights(model_name)
+    cached_path = exported_model_path(weights_path, backend, imgsz)
+
+    if not os.path.exists(cached_path):
+        print(f"Esportazione del modello {weights_path} in formato {backend} (imgsz={imgsz})...")
+        if pt_model is None:
+            pt_model = YOLO(weights_path)
+        # dynamic=True: l'export accetta batch di più frame (detect_and_track_batch)
+        exported = pt_model.export(format=backend, imgsz=imgsz, dynamic=True)
+        shutil.move(str(exported), cached_path)
+    print(f"Uso del modello esportato: {cached_path}")
+
+    model = YOLO(cached_path, task="detect")
+    _apply_runtime_threads(model, backend, cached_path, imgsz, num_threads)
+    return model
@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+
+class MotionPropagator:
+    """
+    Propaga i box dell'ultimo keyframe sui frame successivi senza eseguire YOLO.
+    Per ogni box si seguono pochi punti caratteristici con optical flow sparso (Lucas-Kanade):
+    - la mediana degli spostamenti sposta il box;
+    - la mediana del rapporto delle distanze dal baricentro ne stima la scala
+      (serve al calcolo del TTC, che si basa sulla crescita dell'area).
+    """
+    def __init__(self, max_points_per_box=20, min_points=4, max_side=640):
+        self.max_points_per_box = max_points_per_box
+        # Sotto questo numero di punti validi il box non viene più considerato affidabile
+        self.min_points = min_points
+        # Il flusso viene calcolato su una copia ridotta del frame (lato massimo in pixel)
+        self.max_side = max_side
+
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+
+        self.prev_gray = None
+        self.thumb = None      # miniatura del keyframe per misurare i cambi di scena
+        self.scale = 1.0       # fattore frame originale -> frame ridotto
+        self.tracks = []       # [{'det': dict, 'box': np.array xyxy float (coord. ridotte), 'points': Nx2}]
+
+    def prepare(self, frame):
+        """
+        Frame in scala di grigi ridotto su cui lavorano scene_change e propagate:
+        calcolato una volta per frame e passato a entrambi.
+        """
+        h, w = frame.shape[:2]
+        self.scale = min(1.0, self.max_side / max(h, w))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale < 1.0:
+            gray = cv2.resize(gray, (int(w * self.scale), int(h * self.scale)), interpolation=cv2.INTER_AREA)
+        return gray
+
+    @staticmethod
+    def _thumbnail(gray):
+        return cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def reset(self, frame, detections):
+        """Chiamato su ogni keyframe: memorizza i box del detector e cerca i punti da seguire."""
+        gray = self.prepare(frame)
+        self.prev_gray = gray
+        self.thumb = self._thumbnail(gray)
+        self.tracks = []
+
+        gh, gw = gray.shape[:2]
+        for det in detections:
+            box = np.array(det['bbox'], dtype=np.float32) * self.scale
+            x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+            x2, y2 = min(gw, int(box[2])), min(gh, int(box[3]))
+            points = None
+            if x2 - x1 > 4 and y2 - y1 > 4:
+                points = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_points_per_box, 0.01, 3)
+            if points is None:
+                points = np.empty((0, 2), dtype=np.float32)
+            else:
+                points = points.reshape(-1, 2) + np.array([x1, y1], dtype=np.float32)
+            self.tracks.append({'det': det, 'box': box, 'points': points})
+
+    def scene_change(self, frame, gray=None):
+        """
+        Misura quanto il frame si discosta dall'ultimo keyframe (0.0 identico, 1.0 completamente diverso).
+        Usa una miniatura 64x36 in scala di grigi, quindi costa molto meno di un passaggio di YOLO.
+        :param gray: prepare(frame), se già calcolato.
+        """
+        if self.thumb is None:
+            return 1.0
+        if gray is None:
+            gray = self.prepare(frame)
+        return float(np.mean(np.abs(self._thumbnail(gray) - self.thumb)) / 255.0)
+
+    def propagate(self, frame, gray=None):
+        """
+        Sposta i box sul frame corrente.
+        :param gray: prepare(frame), se già calcolato.
+        :return: lista di rilevamenti nello stesso formato del detector, oppure None
+                 se la maggior parte dei box ha perso i punti (serve un nuovo keyframe).
+        """
+        if self.prev_gray is None:
+            return None
+        if gray is None:
+            gray = self.prepare(frame)
+        h, w = frame.shape[:2]
+
+        counts = [len(t['points']) for t in self.tracks]
+        total = sum(counts)
+        new_points = np.empty((0, 2), dtype=np.float32)
+        status = np.empty((0,), dtype=bool)
+        if total > 0:
+            old_points = np.concatenate([t['points'] for t in self.tracks]).reshape(-1, 1, 2)
+            new_points, st, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, old_points, None, **self.lk_params)
+            new_points = new_points.reshape(-1, 2)
+            status = st.reshape(-1).astype(bool)
+
+        detections = []
+        lost = 0
+        offset = 0
+        for track, n in zip(self.tracks, counts):
+            old = track['points']
+            new = new_points[offset:offset + n]
+            ok = status[offset:offset + n]
+            offset += n
+            old, new = old[ok], new[ok]
+
+            box = track['box']
+            if len(new) >= self.min_points:
+                shift = np.median(new - old, axis=0)
+                # Scala: rapporto mediano delle distanze dei punti dal loro baricentro
+                d_old = np.linalg.norm(old - old.mean(axis=0), axis=1)
+                d_new = np.linalg.norm(new - new.mean(axis=0), axis=1)
+                valid = d_old > 1e-3
+                s = float(np.median(d_new[valid] / d_old[valid])) if np.any(valid) else 1.0
+                cx, cy = (box[0] + box[2]) / 2 + shift[0], (box[1] + box[3]) / 2 + shift[1]
+                half_w, half_h = (box[2] - box[0]) * s / 2, (box[3] - box[1]) * s / 2
+                box = np.array([cx - half_w, cy - half_h, cx + half_w, cy + half_h], dtype=np.float32)
+                track['box'] = box
+                track['points'] = new
+            else:
+                # Troppi pochi punti: il box resta fermo
+                lost += 1
+                track['points'] = new
+
+            # Ritorno alle coordinate del frame originale, restando dentro l'immagine
+            x1, y1, x2, y2 = (box / self.scale).tolist()
+            x1, x2 = int(min(max(x1, 0), w)), int(min(max(x2, 0), w))
+            y1, y2 = int(min(max(y1, 0), h)), int(min(max(y2, 0), h))
+            det = dict(track['det'])
+            det['bbox'] = (x1, y1, x2, y2)
+            det['center'] = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+            detections.append(det)
+
+        self.prev_gray = gray
+        if self.tracks and lost > len(self.tracks) / 2:
+            return None
+        return detections
@@ -0,0 +1,210 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+# Politiche di overflow della coda OCR
+DROP_OLDEST = "drop-oldest"                        # coda piena: scarta il ritaglio più vecchio in attesa
+DROP_TRACK_DUPLICATES = "drop-per-track-duplicates"  # un ritaglio nuovo sostituisce quello in attesa della stessa traccia
+BLOCK = "block"                                    # coda piena: il produttore attende (backpressure)
+
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_TRACK_DUPLICATES, BLOCK)
+
+# Modalità di scheduling di PlateRecognizer
+SCHEDULE_FIFO = "fifo"
+SCHEDULE_PRIORITY = "priority"
+
+# Stato di rischio della traccia -> urgenza dell'OCR
+STATE_RANK = {"DANGER": 2, "WARNING": 1, "SAFE": 0}
+
+
+def ocr_priority(state_name, crop_quality, plate_confirmed):
+    """
+    Priorità di un task OCR (prima la più alta), confrontata come tupla:
+    1. tracce senza targa confermata prima di quelle che ne hanno già una;
+    2. DANGER prima di WARNING prima di SAFE (uno stato sconosciuto vale SAFE);
+    3. ritagli migliori prima (vedi crop_quality: nitidi, grandi, non tagliati -> lettura valida più probabile).
+    """
+    return (0 if plate_confirmed else 1, STATE_RANK.get(state_name, 0), crop_quality)
+
+
+class OcrTask:
+    """Ritaglio di un veicolo in attesa di OCR, con l'istante di accodamento per le statistiche di latenza."""
+    __slots__ = ("vehicle_crop", "obj_id", "enqueued_at", "priority", "quality")
+
+    def __init__(self, vehicle_crop, obj_id, priority=None, quality=0.0):
+        self.vehicle_crop = vehicle_crop
+        self.obj_id = obj_id
+        self.enqueued_at = time.perf_counter()
+        self.priority = priority
+        self.quality = quality
+
+
+class OcrTaskQueue:
+    """
+    Coda FIFO limitata e thread-safe di OcrTask, con politica di overflow selezionabile.
+    La memoria resta limitata a maxsize ritagli qualunque sia la densità del traffico.
+    """
+    def __init__(self, maxsize=32, policy=DROP_OLDEST):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown OCR overflow policy: {policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, task, timeout=None):
+        """
+        Aggiunge un task applicando la politica di overflow.
+        Restituisce False se il task è stato rifiutato (possibile solo con 'block' e un timeout).
+        """
+        with self._cond:
+            if self.policy == DROP_TRACK_DUPLICATES:
+                for i, pending in enumerate(self._items):
+                    if pending.obj_id == task.obj_id:
+                        del self._items[i]
+                        self.dropped += 1
+                        break
+
+            if len(self._items) >= self.maxsize:
+                if self.policy == BLOCK:
+                    if not self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed, timeout):
+                        self.dropped += 1
+                        return False
+                else:
+                    self._items.popleft()
+                    self.dropped += 1
+
+            self._items.append(task)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Rimuove e restituisce il task successivo, oppure None allo scadere del timeout / dopo close()."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            task = self._items.popleft()
+            self._cond.notify_all()
+            return task
+
+    def close(self):
+        """Risveglia tutti i produttori e i consumatori in attesa."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class PriorityOcrQueue:
+    """
+    Coda OCR limitata che serve per prima la traccia più urgente (vedi ocr_priority).
+    Ogni traccia raccoglie una piccola finestra scorrevole di ritagli candidati e diventa idonea
+    quando la finestra è piena (o il candidato più vecchio ha atteso max_wait secondi); le tracce
+    DANGER e WARNING sono idonee dal primo candidato, non possono aspettare la finestra. Quando un
+    worker si libera, all'OCR va solo il candidato migliore della traccia idonea più urgente.
+    A coda piena (maxsize tracce) viene scartata la traccia meno urgente (anche quella in arrivo).
+    Stessa interfaccia di OcrTaskQueue.
+    """
+    def __init__(self, maxsize=32, window=5, max_wait=1.0):
+        self.maxsize = max(1, int(maxsize))
+        self.window = max(1, int(window))
+        self.max_wait = max_wait
+        self.dropped = 0             # candidati mai arrivati all'OCR
+        self._by_track = {}          # obj_id -> [voce dello heap o None mentre raccoglie, deque dei candidati]
+        self._heap = []              # [(-priorità..., seq, obj_id)], voci invalidate in modo pigro
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._by_track)
+
+    @staticmethod
+    def _key(candidates):
+        # Stato e conferma dal candidato più recente, qualità dal migliore.
+        # heapq è un min-heap: ogni componente è negata per estrarre prima la priorità più alta.
+        newest = candidates[-1].priority
+        priority = newest[:-1] + (max(c.priority[-1] for c in candidates),)
+        return tuple(-p for p in priority)
+
+    def _schedule(self, obj_id, slot):
+        """Rende idonea la traccia (o ne aggiorna la priorità se lo è già)."""
+        slot[0] = (self._key(slot[1]), next(self._seq), obj_id)
+        heapq.heappush(self._heap, slot[0])
+
+    def put(self, task, timeout=None):
+        with self._cond:
+            slot = self._by_track.get(task.obj_id)
+            if slot is None:
+                if len(self._by_track) >= self.maxsize:
+                    # La chiave negata "più grande" è la traccia meno urgente
+                    lowest_id = max(self._by_track, key=lambda oid: self._key(self._by_track[oid][1]))
+                    if self._key(self._by_track[lowest_id][1]) <= self._key([task]):
+                        self.dropped += 1
+                        return False
+                    self.dropped += len(self._by_track.pop(lowest_id)[1])
+                slot = [None, deque(maxlen=self.window)]
+                self._by_track[task.obj_id] = slot
+
+            candidates = slot[1]
+            if len(candidates) == candidates.maxlen:
+                self.dropped += 1
+            candidates.append(task)
+
+            urgent = task.priority is not None and task.priority[1] >= STATE_RANK["WARNING"]
+            if slot[0] is not None or urgent or len(candidates) >= self.window:
+                self._schedule(task.obj_id, slot)
+                self._cond.notify_all()
+            return True
+
+    def _promote_stale(self):
+        """Le tracce che raccolgono da troppo tempo diventano idonee con quello che hanno."""
+        now = time.perf_counter()
+        for obj_id, slot in self._by_track.items():
+            if slot[0] is None and now - slot[1][0].enqueued_at >= self.max_wait:
+                self._schedule(obj_id, slot)
+
+    def _pop_valid(self):
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            slot = self._by_track.get(entry[2])
+            if slot is not None and slot[0] is entry:
+                del self._by_track[entry[2]]
+                candidates = slot[1]
+                best = max(candidates, key=lambda c: c.quality)
+                self.dropped += len(candidates) - 1
+                return best
+        return None
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while True:
+                self._promote_stale()
+                task = self._pop_valid()
+                if task is not None:
+                    self._cond.notify_all()
+                    return task
+                if self._closed:
+                    return None
+                wait = self.max_wait
+                if deadline is not None:
+                    wait = min(wait, deadline - time.perf_counter())
+                    if wait <= 0:
+                        return None
+                self._cond.wait(wait)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,205 @@
+import queue
+import threading
+import time
+
+# Modalità del runner
+MODE_LATENCY = "latency-first"        # sotto carico si scartano i frame in attesa: si elabora sempre il più recente
+MODE_THROUGHPUT = "throughput-first"  # nessun frame scartato: le code piene rallentano gli stadi a monte
+PIPELINE_MODES = (MODE_LATENCY, MODE_THROUGHPUT)
+
+_EOF = object()  # sentinella di fine stream, attraversa tutte le code
+
+
+class Stage:
+    """
+    A pipeline stage: fn(item) -> item. Returning None drops the item (it is not forwarded).
+    droppable: in latency-first mode, a full input queue discards its oldest item instead of blocking
+    (only for stages that can skip frames without breaking state, e.g. detection or rendering).
+    """
+    def __init__(self, name, fn, droppable=False):
+        self.name = name
+        self.fn = fn
+        self.droppable = droppable
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self._depth_sum = 0
+        self._depth_samples = 0
+
+    def get_stats(self, wall_time):
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "avg_ms": 1000.0 * self.busy_time / self.processed if self.processed else 0.0,
+            # Frazione del tempo totale passata a lavorare: lo stadio vicino a 1.0 è il collo di bottiglia
+            "occupancy": self.busy_time / wall_time if wall_time > 0 else 0.0,
+            "avg_queue": self._depth_sum / self._depth_samples if self._depth_samples else 0.0,
+        }
+
+
+class PipelineRunner:
+    """
+    Runs source -> stage 1 -> ... -> stage N with one worker thread per stage, connected by bounded
+    queues. A single worker per stage and FIFO queues keep frames in order; every item (e.g. a
+    per-frame dict) carries its own results from one stage to the next.
+    The last stage runs in the calling thread (cv2.imshow must stay on the main thread).
+    With threaded=False every stage runs in the calling thread, one frame at a time.
+    """
+    def __init__(self, source, stages, mode=MODE_THROUGHPUT, queue_size=2, threaded=True, on_stage=None):
+        """
+        :param source: callable returning the next item, or None at end of stream.
+        :param stages: list of Stage.
+        :param on_stage: optional callback(stage_name, seconds) after every stage call
+                         (e.g. QualityScheduler.record), invoked from the stage's thread.
+        """
+        if mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {mode}")
+        if not stages:
+            raise ValueError("The pipeline needs at least one stage")
+        self.source = source
+        self.stages = stages
+        self.mode = mode
+        self.threaded = threaded
+        self.on_stage = on_stage
+        self.queue_size = max(1, int(queue_size))
+        self.frames_in = 0
+        self.wall_time = 0.0
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        self._stop = threading.Event()
+        self._error = None
+
+    def stop(self):
+        """Asks every stage to stop (e.g. 'q' pressed in the render stage)."""
+        self._stop.set()
+
+    # --- CODE ---
+    def _put(self, index, item):
+        """Puts an item in the input queue of stages[index], honouring the mode. False if stopped."""
+        q = self._queues[index]
+        stage = self.stages[index]
+        drop_oldest = self.mode == MODE_LATENCY and stage.droppable and item is not _EOF
+        while not self._stop.is_set():
+            if drop_oldest:
+                try:
+                    q.put_nowait(item)
+                    return True
+                except queue.Full:
+                    # Coda piena: si scarta l'elemento più vecchio (la fine stream arriva sempre per ultima)
+                    try:
+                        q.get_nowait()
+                        stage.dropped += 1
+                    except queue.Empty:
+                        pass
+            else:
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+        return False
+
+    def _get(self, index):
+        """Next item for stages[index], or _EOF once stopped."""
+        q = self._queues[index]
+        stage = self.stages[index]
+        while not self._stop.is_set():
+            stage._depth_sum += q.qsize()
+            stage._depth_samples += 1
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _EOF
+
+    def _run_stage(self, stage, item):
+        start = time.perf_counter()
+        result = stage.fn(item)
+        elapsed = time.perf_counter() - start
+        stage.busy_time += elapsed
+        stage.processed += 1
+        if self.on_stage is not None:
+            self.on_stage(stage.name, elapsed)
+        return result
+
+    # --- THREAD ---
+    def _source_worker(self):
+        try:
+            while not self._stop.is_set():
+                item = self.source()
+                if item is None:
+                    break
+                self.frames_in += 1
+                if not self._put(0, item):
+                    return
+            self._put(0, _EOF)
+        except Exception as e:
+            self._fail(e)
+
+    def _stage_worker(self, index):
+        stage = self.stages[index]
+        try:
+            while True:
+                item = self._get(index)
+                if item is _EOF:
+                    self._put(index + 1, _EOF)
+                    return
+                result = self._run_stage(stage, item)
+                if result is not None and not self._put(index + 1, result):
+                    return
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    # --- ESECUZIONE ---
+    def run(self):
+        """Processes the whole stream (or until stop()); re-raises the first error of any stage."""
+        start = time.perf_counter()
+        try:
+            if self.threaded:
+                self._run_threaded()
+            else:
+                self._run_sequential()
+        finally:
+            self.wall_time = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+
+    def _run_sequential(self):
+        while not self._stop.is_set():
+            item = self.source()
+            if item is None:
+                break
+            self.frames_in += 1
+            for stage in self.stages:
+                item = self._run_stage(stage, item)
+                if item is None:
+                    break
+
+    def _run_threaded(self):
+        workers = [threading.Thread(target=self._source_worker, daemon=True)]
+        workers += [threading.Thread(target=self._stage_worker, args=(i,), daemon=True)
+                    for i in range(len(self.stages) - 1)]
+        for worker in workers:
+            worker.start()
+
+        last = len(self.stages) - 1
+        try:
+            while True:
+                item = self._get(last)
+                if item is _EOF:
+                    break
+                self._run_stage(self.stages[last], item)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for worker in workers:
+                worker.join(timeout=2.0)
+
+    def get_stats(self):
+        """Per-stage counters: processed, dropped, avg_ms, occupancy (0-1) and average input queue depth."""
+        return {stage.name: stage.get_stats(self.wall_time) for stage in self.stages}
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+# Filtri sulla geometria della targa (relativi al ritaglio del veicolo)
+MIN_ASPECT = 2.0          # larghezza / altezza di una targa: da ~2 (USA, quasi quadrate) a ~5 (UE)
+MAX_ASPECT = 6.5
+MIN_WIDTH_RATIO = 0.10    # larghezza della targa come frazione di quella del veicolo
+MAX_WIDTH_RATIO = 0.70
+MIN_HEIGHT_PX = 8
+PADDING = 0.10            # margine attorno a ogni candidato per non tagliare i caratteri
+
+
+def locate_plate_candidates(gray, max_candidates=3):
+    """
+    Trova i rettangoli che sembrano targhe nel ritaglio in scala di grigi di un veicolo,
+    con una pipeline classica ed economica (nessuna rete neurale):
+    1. la morfologia black-hat mette in risalto i caratteri scuri su sfondo chiaro;
+    2. gradiente di Sobel orizzontale + chiusura uniscono i caratteri in un'unica regione;
+    3. soglia di Otsu e contorni, filtrati per proporzioni e dimensioni della targa.
+    I candidati sono ordinati per quanto riempiono il proprio rettangolo e per quanto sono in basso
+    nel ritaglio (la targa di solito è nella metà inferiore del veicolo).
+    :return: lista di (x1, y1, x2, y2) in coordinate del ritaglio, dal migliore.
+    """
+    h, w = gray.shape[:2]
+    if h < MIN_HEIGHT_PX or w < 20:
+        return []
+
+    kernel_w = max(9, w // 20)
+    rect_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_w, max(3, kernel_w // 3)))
+    blackhat = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, rect_kernel)
+
+    grad = np.abs(cv2.Sobel(blackhat, cv2.CV_32F, 1, 0, ksize=3))
+    grad_max = grad.max()
+    if grad_max <= 0:
+        return []
+    grad = (255 * grad / grad_max).astype(np.uint8)
+
+    grad = cv2.GaussianBlur(grad, (5, 5), 0)
+    grad = cv2.morphologyEx(grad, cv2.MORPH_CLOSE, rect_kernel)
+    _, mask = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mask = cv2.erode(mask, None, iterations=1)
+    mask = cv2.dilate(mask, None, iterations=2)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    scored = []
+    for contour in contours:
+        x, y, cw, ch = cv2.boundingRect(contour)
+        if ch < MIN_HEIGHT_PX:
+            continue
+        aspect = cw / ch
+        width_ratio = cw / w
+        if not (MIN_ASPECT <= aspect <= MAX_ASPECT and MIN_WIDTH_RATIO <= width_ratio <= MAX_WIDTH_RATIO):
+            continue
+        fill = cv2.contourArea(contour) / float(cw * ch)
+        vertical = (y + ch / 2) / h
+        scored.append((fill + 0.5 * vertical, (x, y, cw, ch)))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    candidates = []
+    for _, (x, y, cw, ch) in scored[:max_candidates]:
+        pad_x, pad_y = int(cw * PADDING), int(ch * PADDING)
+        candidates.append((max(0, x - pad_x), max(0, y - pad_y), min(w, x + cw + pad_x), min(h, y + ch + pad_y)))
+    return candidates
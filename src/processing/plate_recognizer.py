@@ -1,177 +1,519 @@
-import cv2
-import numpy as np
-import easyocr
-import threading
-import queue
-from collections import Counter
-from src.data.db_manager import DBManager
-
-class PlateRecognizer:
-    def __init__(self):
-        self.ocr_available = False
-        self.plate_history = {} # {obj_id: [list of detected plates]}
-        self.processing_queue = queue.Queue()
-        self.pending_reassignments = queue.Queue() # Queue for ID reassignments
-        
-        try:
-            print("Initializing EasyOCR...")
-            # gpu=False per evitare errori se non c'è una GPU NVIDIA
-            self.reader = easyocr.Reader(['en'], gpu=False) 
-            self.db_manager = DBManager()
-            self.ocr_available = True
-            print("EasyOCR and DBManager initialized successfully.")
-            
-            # Start background worker thread
-            self.worker_thread = threading.Thread(target=self._worker, daemon=True)
-            self.worker_thread.start()
-            print("OCR Worker thread started.")
-            
-        except Exception as e:
-            print(f"Error initializing OCR or DB: {e}")
-
-    def add_to_queue(self, frame, obj_id, bbox):
-        """
-        Adds a task to the OCR queue. Non-blocking.
-        """
-        if not self.ocr_available:
-            return
-
-        x1, y1, x2, y2 = bbox
-        h, w, _ = frame.shape
-        
-        # Boundary checks
-        x1, y1 = max(0, x1), max(0, y1)
-        x2, y2 = min(w, x2), min(h, y2)
-        
-        # Size check (fast fail)
-        if (x2 - x1) < 40 or (y2 - y1) < 10:
-            return
-
-        # Crop and COPY the image so main thread can continue safely
-        vehicle_crop = frame[y1:y2, x1:x2].copy()
-        
-        # Put in queue
-        self.processing_queue.put((vehicle_crop, obj_id))
-
-    def _worker(self):
-        """
-        Background thread that processes images from the queue.
-        """
-        while True:
-            try:
-                # Get task from queue
-                vehicle_crop, obj_id = self.processing_queue.get()
-                
-                # Perform OCR (Heavy operation)
-                plate_text = self._recognize_from_crop(vehicle_crop)
-                
-                if plate_text:
-                    self._update_history_and_db(obj_id, plate_text)
-                
-                self.processing_queue.task_done()
-            except Exception as e:
-                print(f"Error in OCR worker: {e}")
-
-    def _update_history_and_db(self, obj_id, plate_text):
-        """
-        Updates history and saves to DB if we are confident.
-        """
-        if obj_id not in self.plate_history:
-            self.plate_history[obj_id] = []
-        
-        self.plate_history[obj_id].append(plate_text)
-        
-        # Keep only last 10 readings
-        if len(self.plate_history[obj_id]) > 10:
-            self.plate_history[obj_id].pop(0)
-            
-        # Voting system
-        counts = Counter(self.plate_history[obj_id])
-        most_common, count = counts.most_common(1)[0]
-        
-        # If we have seen this plate at least 2 times (CONFIDENCE >= 2)
-        # Reduced from 3 to 2 to make it easier to confirm plates
-        if count >= 2:
-            print(f"CONFIRMED PLATE for ID {obj_id}: {most_common} (Confidence: {count}/{len(self.plate_history[obj_id])})")
-            try:
-                # Check if this plate already exists in the DB
-                existing_id = self.db_manager.get_object_id_by_plate(most_common)
-                print(f"DEBUG: Existing ID for plate '{most_common}': {existing_id}")
-
-                if existing_id is not None :
-                    if existing_id != obj_id or existing_id == obj_id:
-                        print(f"[ID REASSIGN] Plate '{most_common}' already in DB with ID {existing_id}. Should reassign this detection from {obj_id} to {existing_id}.")
-                        self.pending_reassignments.put((obj_id, 7))
-                else:
-                    # New plate, save it to DB
-                    print(f"[DB SAVE] New plate '{most_common}' for ID {obj_id}.")
-                    self.db_manager.update_object_plate(obj_id, most_common)
-
-            except Exception as e:
-                print(f"Error in DB check/update: {e}")
-
-    def get_pending_reassignments(self):
-        """
-        Returns a list of (old_id, new_id) tuples from the queue.
-        """
-        reassignments = []
-        while not self.pending_reassignments.empty():
-            try:
-                reassignments.append(self.pending_reassignments.get_nowait())
-            except queue.Empty:
-                break
-        return reassignments
-
-    def merge_history(self, old_id, new_id):
-        """
-        Merges the plate history of old_id into new_id.
-        """
-        if old_id in self.plate_history:
-            if new_id not in self.plate_history:
-                self.plate_history[new_id] = []
-            self.plate_history[new_id].extend(self.plate_history[old_id])
-            # Keep only last 10 readings
-            if len(self.plate_history[new_id]) > 10:
-                self.plate_history[new_id] = self.plate_history[new_id][-10:]
-            del self.plate_history[old_id]
-            print(f"Merged history of {old_id} into {new_id}")
-
-    def _recognize_from_crop(self, vehicle_crop):
-        """
-        Internal method to run OCR on a pre-cropped image.
-        """
-        # Preprocessing
-        gray = cv2.cvtColor(vehicle_crop, cv2.COLOR_RGB2GRAY)
-
-        try:
-            results = self.reader.readtext(gray)
-            
-            if not results:
-                return None
-
-            results.sort(key=lambda x: x[2], reverse=True)
-
-            for (bbox_ocr, text, prob) in results:
-                text_clean = ''.join(c for c in text if c.isalnum()).upper()
-                
-                if self.is_valid_plate(text_clean) and prob > 0.35:
-                    print(f"DEBUG: OCR saw '{text_clean}' (prob={prob:.2f})")
-                    return text_clean
-        except Exception as e:
-            print(f"OCR Error: {e}")
-            
-        return None
-
-    # Legacy method wrapper if needed, but we should use add_to_queue
-    def recognize_and_save(self, frame, obj_id, bbox):
-        self.add_to_queue(frame, obj_id, bbox)
-        return None # Returns None because it's async now
-
-    def recognize(self, frame, bbox):
-        # Deprecated for main loop use, but kept for compatibility
-        return None
-
-    def is_valid_plate(self, text):
-        if len(text) < 5 or len(text) > 8:
-            return False
-        return True
+import cv2
+import numpy as np
+import multiprocessing
+import threading
+import queue
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.data.db_manager import DBManager
+from src.processing.crop_quality import crop_quality
+from src.processing.plate_localizer import locate_plate_candidates
+from src.processing.ocr_queue import (OcrTask, OcrTaskQueue, PriorityOcrQueue, ocr_priority,
+                                     DROP_OLDEST, SCHEDULE_FIFO, SCHEDULE_PRIORITY)
+
+OCR_LANGUAGES = ['en']
+
+# Each OCR worker (process, or the single thread when num_workers=0) owns its own reader
+_worker_reader = None
+
+
+def _init_ocr_worker(languages):
+    """Executor initializer: loads one EasyOCR reader per worker."""
+    global _worker_reader
+    import easyocr
+    # gpu=False per evitare errori se non c'è una GPU NVIDIA
+    _worker_reader = easyocr.Reader(languages, gpu=False)
+
+
+def _ocr_worker_batch(vehicle_crops, localize=True):
+    """Runs in the worker: one (plate_text, error) pair per crop."""
+    return recognize_plates_batch(_worker_reader, vehicle_crops, localize=localize)
+
+
+def is_valid_plate(text):
+    if len(text) < 5 or len(text) > 8:
+        return False
+    return True
+
+
+def _best_plate(results):
+    """Picks the most confident valid plate text from EasyOCR results, or None."""
+    results.sort(key=lambda x: x[2], reverse=True)
+
+    for (bbox_ocr, text, prob) in results:
+        text_clean = ''.join(c for c in text if c.isalnum()).upper()
+
+        if is_valid_plate(text_clean) and prob > 0.35:
+            print(f"DEBUG: OCR saw '{text_clean}' (prob={prob:.2f})")
+            return text_clean
+    return None
+
+
+def recognize_plate(reader, vehicle_crop, localize=True):
+    """
+    Runs OCR on a pre-cropped vehicle image and returns the best valid plate text, or None.
+    With localize=True, candidate plate rectangles are found first (plate_localizer) and only
+    those are passed to the recognizer, skipping EasyOCR's text detection over the whole car.
+    If no candidate yields a valid plate, the full crop is read as before.
+    """
+    # Preprocessing
+    gray = cv2.cvtColor(vehicle_crop, cv2.COLOR_RGB2GRAY)
+
+    try:
+        if localize:
+            candidates = locate_plate_candidates(gray)
+            if candidates:
+                # EasyOCR expects [x_min, x_max, y_min, y_max] boxes
+                boxes = [[x1, x2, y1, y2] for (x1, y1, x2, y2) in candidates]
+                plate = _best_plate(reader.recognize(gray, horizontal_list=boxes, free_list=[]))
+                if plate:
+                    return plate
+
+        results = reader.readtext(gray)
+
+        if not results:
+            return None
+
+        return _best_plate(results)
+    except Exception as e:
+        print(f"OCR Error: {e}")
+
+    return None
+
+
+def crop_hash(vehicle_crop):
+    """
+    64-bit difference hash (dHash) of a crop: compares neighbouring pixels of a 9x8 grayscale thumbnail.
+    Near-identical crops (same car, same pose, one frame apart) differ by only a few bits.
+    """
+    gray = cv2.cvtColor(vehicle_crop, cv2.COLOR_BGR2GRAY) if vehicle_crop.ndim == 3 else vehicle_crop
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _pad_to_same_size(images):
+    """Pads grayscale images (bottom/right) to a common shape so they can be stacked in one batch."""
+    h = max(img.shape[0] for img in images)
+    w = max(img.shape[1] for img in images)
+    return [cv2.copyMakeBorder(img, 0, h - img.shape[0], 0, w - img.shape[1], cv2.BORDER_CONSTANT, value=0)
+            for img in images]
+
+
+def recognize_plates_batch(reader, vehicle_crops, localize=True):
+    """
+    Batched version of recognize_plate.
+    Localized recognition runs per crop (it is already cheap); the crops still unresolved go
+    through EasyOCR's text detector together with one readtext_batched call.
+    Errors are isolated per item: if the batched call fails, each crop is retried alone.
+    :return: list of (plate_text or None, error message or None), in input order.
+    """
+    results = [(None, None)] * len(vehicle_crops)
+    grays = {}
+    for i, crop in enumerate(vehicle_crops):
+        try:
+            gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+            if localize:
+                candidates = locate_plate_candidates(gray)
+                if candidates:
+                    boxes = [[x1, x2, y1, y2] for (x1, y1, x2, y2) in candidates]
+                    plate = _best_plate(reader.recognize(gray, horizontal_list=boxes, free_list=[]))
+                    if plate:
+                        results[i] = (plate, None)
+                        continue
+            grays[i] = gray
+        except Exception as e:
+            results[i] = (None, str(e))
+
+    if not grays:
+        return results
+
+    indices = list(grays)
+    try:
+        batch = reader.readtext_batched(_pad_to_same_size([grays[i] for i in indices]),
+                                        batch_size=len(indices))
+        for i, item_results in zip(indices, batch):
+            results[i] = (_best_plate(item_results) if item_results else None, None)
+    except Exception:
+        for i in indices:
+            try:
+                item_results = reader.readtext(grays[i])
+                results[i] = (_best_plate(item_results) if item_results else None, None)
+            except Exception as e:
+                results[i] = (None, str(e))
+    return results
+
+
+class PlateRecognizer:
+    def __init__(self, num_workers=2, queue_size=32, overflow_policy=DROP_OLDEST, scheduling=SCHEDULE_PRIORITY,
+                 candidate_window=5, localize_plates=True, batch_size=4, batch_timeout_ms=20,
+                 reverify_interval=None, duplicate_hash_distance=4, db_manager=None):
+        """
+        :param num_workers: number of OCR worker processes, each with its own EasyOCR reader.
+                            0 runs OCR on a single background thread of this process.
+        :param queue_size: maximum number of crops waiting for OCR.
+        :param overflow_policy: 'drop-oldest', 'drop-per-track-duplicates' or 'block' (fifo scheduling only).
+        :param scheduling: 'priority' serves DANGER/WARNING tracks, big crops and unconfirmed plates first,
+                           sending only the best of the last candidate_window crops of each track;
+                           'fifo' serves crops in arrival order.
+        :param localize_plates: run OCR only on candidate plate rectangles (full crop as fallback).
+        :param batch_size: maximum crops sent to a worker together (1 disables batching).
+        :param batch_timeout_ms: how long the dispatcher waits to fill a batch once it has one crop.
+        :param reverify_interval: seconds after which a confirmed plate is OCR'd again (None = never).
+        :param duplicate_hash_distance: crops whose dHash differs from the track's last queued crop
+                                        by at most this many bits are skipped (negative disables)
+                                        until that crop has been OCR'd: an unconfirmed track can
+                                        then send the same view again to collect a second reading.
+        :param db_manager: shared DBManager (a new one is created if None). A database that is down
+                           never disables OCR: the DBManager buffers writes and retries on its own.
+        """
+        self.ocr_available = False
+        self.plate_history = {} # {obj_id: [list of detected plates]}
+        self._history_lock = threading.Lock() # plate_history is written by the collector and merged from the main loop
+        self.identity = None # shared IdentityRegistry: readings of merged IDs go to the canonical ID
+        self.confirmed_plates = {} # {obj_id: plate_text} once the vote reaches the confidence threshold
+        self.confirmed_at = {} # {obj_id: time of the last confirmation}
+        # Read-only copy of confirmed_plates for other threads: replaced (never mutated) on every change,
+        # so readers get a consistent dict in O(1) without locking
+        self._confirmed_snapshot = {}
+        self._confirm_lock = threading.Lock()
+        self.reverify_interval = reverify_interval
+        self.duplicate_hash_distance = duplicate_hash_distance
+        self._last_hash = {} # {obj_id: dHash of the last crop queued for that track, until it is OCR'd}
+        if scheduling == SCHEDULE_PRIORITY:
+            self.processing_queue = PriorityOcrQueue(maxsize=queue_size, window=candidate_window)
+        elif scheduling == SCHEDULE_FIFO:
+            self.processing_queue = OcrTaskQueue(maxsize=queue_size, policy=overflow_policy)
+        else:
+            raise ValueError(f"Unknown OCR scheduling mode: {scheduling}")
+        self.pending_reassignments = queue.Queue() # Queue for ID reassignments
+        self.results_queue = queue.Queue() # (obj_id, plate_text) coming back from the workers
+
+        # Stats
+        self.num_workers = num_workers
+        self.localize_plates = localize_plates
+        self.batch_size = max(1, int(batch_size))
+        self.batch_timeout = batch_timeout_ms / 1000.0
+        self.candidates = 0 # crops offered through add_to_queue
+        self.skipped_confirmed = 0 # crops not queued because the track already has a confirmed plate
+        self.skipped_duplicates = 0 # crops not queued because they look like the previous one
+        self.ocr_calls = 0 # crops actually sent to a worker
+        self.processed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=100) # enqueue -> result, seconds
+        self.batch_sizes = deque(maxlen=100)
+        self._stats_lock = threading.Lock()
+        # Limits the batches in flight to one per worker, the rest wait in the bounded queue
+        self._slots = threading.Semaphore(max(1, num_workers))
+
+        self.db_manager = db_manager
+        if self.db_manager is None:
+            try:
+                self.db_manager = DBManager()
+            except Exception as e:
+                print(f"Error initializing DBManager, plates will not be stored: {e}")
+
+        self.executor = None
+        try:
+            print(f"Initializing EasyOCR ({num_workers} worker processes)..." if num_workers > 0
+                  else "Initializing EasyOCR (in-process thread)...")
+            if num_workers > 0:
+                # spawn, not fork: by now the capture, torch/OpenCV and dispatcher threads are running,
+                # and a forked child could inherit one of their locks held forever
+                self.executor = ProcessPoolExecutor(max_workers=num_workers, initializer=_init_ocr_worker,
+                                                    initargs=(OCR_LANGUAGES,),
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=1, initializer=_init_ocr_worker,
+                                                   initargs=(OCR_LANGUAGES,))
+            self.ocr_available = True
+            print("OCR pool initialized successfully.")
+
+            # Background threads: one feeds the pool, one applies the results
+            self.dispatcher_thread = threading.Thread(target=self._dispatcher, daemon=True)
+            self.dispatcher_thread.start()
+            self.collector_thread = threading.Thread(target=self._collector, daemon=True)
+            self.collector_thread.start()
+            print("OCR dispatcher and collector threads started.")
+
+        except Exception as e:
+            print(f"Error initializing OCR: {e}")
+            self.ocr_available = False
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def add_to_queue(self, frame, obj_id, bbox, state_name=None):
+        """
+        Adds a task to the OCR queue. Non-blocking unless the overflow policy is 'block'.
+        :param state_name: risk state of the track ('SAFE', 'WARNING', 'DANGER'), used to prioritize.
+        """
+        if not self.ocr_available:
+            return
+
+        # Early stop: confirmed tracks are only re-read every reverify_interval seconds
+        confirmed_at = self.confirmed_at.get(obj_id)
+        if confirmed_at is not None and (self.reverify_interval is None or
+                                         time.perf_counter() - confirmed_at < self.reverify_interval):
+            with self._stats_lock:
+                self.skipped_confirmed += 1
+            return
+
+        x1, y1, x2, y2 = bbox
+        h, w, _ = frame.shape
+        
+        # Boundary checks
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        
+        # Size check (fast fail)
+        if (x2 - x1) < 40 or (y2 - y1) < 10:
+            return
+
+        # Skip near-duplicates of the crop already queued for this track
+        if self.duplicate_hash_distance >= 0:
+            crop_h = crop_hash(frame[y1:y2, x1:x2])
+            last_h = self._last_hash.get(obj_id)
+            if last_h is not None and bin(crop_h ^ last_h).count("1") <= self.duplicate_hash_distance:
+                with self._stats_lock:
+                    self.skipped_duplicates += 1
+                return
+            self._last_hash[obj_id] = crop_h
+
+        # Crop and COPY the image so main thread can continue safely
+        vehicle_crop = frame[y1:y2, x1:x2].copy()
+        
+        quality = crop_quality(vehicle_crop, (x1, y1, x2, y2), frame.shape)
+        priority = ocr_priority(state_name, quality, obj_id in self._confirmed_snapshot)
+
+        # Put in the bounded queue (the scheduler decides what gets served or dropped)
+        with self._stats_lock:
+            self.candidates += 1
+        self.processing_queue.put(OcrTask(vehicle_crop, obj_id, priority, quality))
+
+    def _dispatcher(self):
+        """
+        Background thread that moves tasks from the bounded queue to the worker pool.
+        Once a worker is free it drains up to batch_size tasks, waiting at most batch_timeout
+        after the first one, and submits them as a single batch.
+        """
+        while self.ocr_available:
+            self._slots.acquire()
+            batch = self._collect_batch()
+            if not batch:
+                self._slots.release()
+                continue
+            try:
+                future = self.executor.submit(_ocr_worker_batch, [t.vehicle_crop for t in batch],
+                                              self.localize_plates)
+                with self._stats_lock:
+                    self.ocr_calls += len(batch)
+            except Exception as e:
+                self._slots.release()
+                self._handle_worker_error(e)
+                continue
+            future.add_done_callback(lambda f, b=batch: self._on_batch_done(f, b))
+
+    def _collect_batch(self):
+        task = self.processing_queue.get(timeout=0.5)
+        if task is None:
+            return []
+        batch = [task]
+        deadline = time.perf_counter() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            task = self.processing_queue.get(timeout=remaining)
+            if task is None:
+                break
+            batch.append(task)
+        return batch
+
+    def _on_batch_done(self, future, batch):
+        """Called by the executor when a batch of crops has been processed."""
+        self._slots.release()
+        now = time.perf_counter()
+        with self._stats_lock:
+            self.latencies.extend(now - t.enqueued_at for t in batch)
+            self.batch_sizes.append(len(batch))
+        try:
+            results = future.result()
+        except Exception as e:
+            for task in batch:
+                self._last_hash.pop(task.obj_id, None)
+            self._handle_worker_error(e)
+            return
+        for task, (plate_text, error) in zip(batch, results):
+            # The crop has been read: a steady vehicle must be able to send the same view again,
+            # otherwise it never collects the second agreeing reading needed to confirm
+            self._last_hash.pop(task.obj_id, None)
+            if error is not None:
+                self._handle_worker_error(error)
+                continue
+            with self._stats_lock:
+                self.processed += 1
+            if plate_text:
+                self.results_queue.put((task.obj_id, plate_text))
+
+    def _handle_worker_error(self, error):
+        with self._stats_lock:
+            self.failed += 1
+        print(f"Error in OCR worker: {error}")
+        if isinstance(error, BrokenProcessPool):
+            # A worker died (e.g. EasyOCR failed to load): stop accepting crops
+            self.ocr_available = False
+            self.processing_queue.close()
+
+    def _collector(self):
+        """
+        Background thread that applies OCR results: history, voting and DB.
+        """
+        while True:
+            try:
+                obj_id, plate_text = self.results_queue.get()
+                self._update_history_and_db(obj_id, plate_text)
+            except Exception as e:
+                print(f"Error in OCR collector: {e}")
+
+    def get_stats(self):
+        """
+        Returns OCR queue depth, dropped crops, per-task latency (enqueue -> result, in ms)
+        and how many OCR calls were spent per confirmed plate.
+        """
+        with self._stats_lock:
+            latencies = list(self.latencies)
+            processed, failed = self.processed, self.failed
+            candidates, ocr_calls = self.candidates, self.ocr_calls
+            batch_sizes = list(self.batch_sizes)
+        confirmed = len(self.confirmed_plates)
+        return {
+            "candidates": candidates,
+            "skipped_confirmed": self.skipped_confirmed,
+            "skipped_duplicates": self.skipped_duplicates,
+            "ocr_calls": ocr_calls,
+            "confirmed_plates": confirmed,
+            "calls_per_confirmed_plate": ocr_calls / confirmed if confirmed else float('inf'),
+            "queue_depth": len(self.processing_queue),
+            "dropped": self.processing_queue.dropped,
+            "processed": processed,
+            "failed": failed,
+            "avg_latency_ms": 1000.0 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "max_latency_ms": 1000.0 * max(latencies) if latencies else 0.0,
+            "avg_batch_size": sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+        }
+
+    def _update_history_and_db(self, obj_id, plate_text):
+        """
+        Updates history and saves to DB if we are confident.
+        Readings of a track merged into another ID (see IdentityRegistry) go to the surviving ID.
+        """
+        if self.identity is not None:
+            obj_id = self.identity.resolve(obj_id)
+        with self._history_lock:
+            self._record_reading(obj_id, plate_text)
+
+    def _record_reading(self, obj_id, plate_text):
+        if obj_id not in self.plate_history:
+            self.plate_history[obj_id] = []
+        
+        self.plate_history[obj_id].append(plate_text)
+        
+        # Keep only last 10 readings
+        if len(self.plate_history[obj_id]) > 10:
+            self.plate_history[obj_id].pop(0)
+            
+        # Voting system
+        counts = Counter(self.plate_history[obj_id])
+        most_common, count = counts.most_common(1)[0]
+        
+        # If we have seen this plate at least 2 times (CONFIDENCE >= 2)
+        # Reduced from 3 to 2 to make it easier to confirm plates
+        if count >= 2:
+            with self._confirm_lock:
+                previous = self.confirmed_plates.get(obj_id)
+                self.confirmed_plates[obj_id] = most_common
+                self.confirmed_at[obj_id] = time.perf_counter()
+                if previous != most_common:
+                    self._confirmed_snapshot = dict(self.confirmed_plates)
+            if previous == most_common:
+                # Re-verification agreed with the cached plate: nothing to look up again
+                return
+            print(f"CONFIRMED PLATE for ID {obj_id}: {most_common} (Confidence: {count}/{len(self.plate_history[obj_id])})")
+            if self.db_manager is None:
+                return
+            try:
+                # Check if this plate already exists in the DB
+                existing_id = self.db_manager.get_object_id_by_plate(most_common)
+                print(f"DEBUG: Existing ID for plate '{most_common}': {existing_id}")
+
+                if existing_id is not None :
+                    if existing_id != obj_id:
+                        print(f"[ID REASSIGN] Plate '{most_common}' already in DB with ID {existing_id}. Should reassign this detection from {obj_id} to {existing_id}.")
+                        self.pending_reassignments.put((obj_id, existing_id))
+                else:
+                    # New plate, save it to DB
+                    print(f"[DB SAVE] New plate '{most_common}' for ID {obj_id}.")
+                    self.db_manager.update_object_plate(obj_id, most_common)
+
+            except Exception as e:
+                print(f"Error in DB check/update: {e}")
+
+    def get_confirmed_plates(self):
+        """
+        Thread-safe, O(1) snapshot of the confirmed plates: {obj_id: plate_text}.
+        The returned dict is never modified afterwards; treat it as read-only.
+        """
+        return self._confirmed_snapshot
+
+    def get_pending_reassignments(self):
+        """
+        Returns a list of (old_id, new_id) tuples from the queue.
+        """
+        reassignments = []
+        while not self.pending_reassignments.empty():
+            try:
+                reassignments.append(self.pending_reassignments.get_nowait())
+            except queue.Empty:
+                break
+        return reassignments
+
+    def merge_history(self, old_id, new_id):
+        """
+        Merges the plate history of old_id into new_id.
+        """
+        with self._history_lock:
+            self._merge_history(old_id, new_id)
+
+    def _merge_history(self, old_id, new_id):
+        if old_id in self.plate_history:
+            if new_id not in self.plate_history:
+                self.plate_history[new_id] = []
+            self.plate_history[new_id].extend(self.plate_history[old_id])
+            # Keep only last 10 readings
+            if len(self.plate_history[new_id]) > 10:
+                self.plate_history[new_id] = self.plate_history[new_id][-10:]
+            del self.plate_history[old_id]
+            print(f"Merged history of {old_id} into {new_id}")
+        with self._confirm_lock:
+            if old_id in self.confirmed_plates:
+                plate = self.confirmed_plates.pop(old_id)
+                confirmed_at = self.confirmed_at.pop(old_id)
+                if new_id not in self.confirmed_plates:
+                    self.confirmed_plates[new_id] = plate
+                    self.confirmed_at[new_id] = confirmed_at
+                self._confirmed_snapshot = dict(self.confirmed_plates)
+        self._last_hash.pop(old_id, None)
+
+    # Legacy method wrapper if needed, but we should use add_to_queue
+    def recognize_and_save(self, frame, obj_id, bbox):
+        self.add_to_queue(frame, obj_id, bbox)
+        return None # Returns None because it's async now
+
+    def recognize(self, frame, bbox):
+        # Deprecated for main loop use, but kept for compatibility
+        return None
+
+    def is_valid_plate(self, text):
+        return is_valid_plate(text)
@@ -0,0 +1,145 @@
+import threading
+import time
+
+# Livelli di degradazione, dal più leggero al più pesante: ognuno include i precedenti
+LEVEL_FULL = 0           # qualità piena
+LEVEL_NO_OCR = 1         # nessun nuovo ritaglio inviato all'OCR
+LEVEL_LOW_RES = 2        # YOLO a risoluzione ridotta (imgsz)
+LEVEL_SPARSE_KEYFRAMES = 3  # YOLO meno spesso, box propagati con optical flow negli altri frame
+LEVEL_DROP_FRAMES = 4    # si elabora solo un frame ogni drop_stride
+LEVEL_NAMES = ("full", "no-ocr", "low-res", "sparse-keyframes", "drop-frames")
+
+
+class QualityScheduler:
+    """
+    Scheduler adattivo della qualità per il tempo reale.
+    Il budget per frame è 1/fps della sorgente. Le latenze degli stadi (record) vengono mediate
+    con una media mobile esponenziale; il costo di un frame è lo stadio più lento se la pipeline
+    è a thread (il throughput lo decide il collo di bottiglia), altrimenti la somma degli stadi.
+    - Costo sopra budget per degrade_after secondi -> si scende di un livello (vedi LEVEL_*).
+    - Costo sotto headroom * budget per restore_after secondi -> si risale di un livello.
+    Dopo ogni cambio di livello il conteggio riparte, così le medie hanno il tempo di adattarsi.
+    I frame scartati non vanno misurati (vanno saltati prima degli stadi): a livello drop-frames
+    ogni frame elaborato ha a disposizione drop_stride periodi, e si risale solo quando un frame
+    torna a stare nel budget pieno.
+    """
+    def __init__(self, fps, pipelined=True, budget_ratio=1.0, base_imgsz=640, reduced_imgsz=480,
+                 base_keyframe_interval=1, degraded_keyframe_interval=3, drop_stride=2,
+                 degrade_after=1.0, restore_after=3.0, headroom=0.75, smoothing=0.1,
+                 max_level=LEVEL_DROP_FRAMES):
+        """
+        :param fps: frame al secondo della sorgente (se non valido si assume 30).
+        :param budget_ratio: frazione del periodo di frame concessa all'elaborazione.
+        :param smoothing: peso del nuovo campione nella media mobile delle latenze.
+        """
+        fps = fps if fps and fps > 0 else 30.0
+        self.budget = budget_ratio / fps
+        self.pipelined = pipelined
+        self.base_imgsz = base_imgsz
+        self.reduced_imgsz = reduced_imgsz
+        self.base_keyframe_interval = max(1, int(base_keyframe_interval))
+        self.degraded_keyframe_interval = max(self.base_keyframe_interval, int(degraded_keyframe_interval))
+        self.drop_stride = max(1, int(drop_stride))
+        self.degrade_after = degrade_after
+        self.restore_after = restore_after
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.max_level = max(LEVEL_FULL, min(LEVEL_DROP_FRAMES, int(max_level)))
+
+        self.level = LEVEL_FULL
+        self.level_changes = 0
+        self.time_over_budget = 0.0    # secondi passati con il costo sopra budget
+        self.time_at_level = [0.0] * len(LEVEL_NAMES)
+        self._stage_ema = {}           # stadio -> latenza media (s)
+        self._over_since = None
+        self._under_since = None
+        self._last_eval = None
+        self._lock = threading.Lock()
+
+    # --- IMPOSTAZIONI PER IL LIVELLO CORRENTE ---
+    @property
+    def ocr_enabled(self):
+        return self.level < LEVEL_NO_OCR
+
+    @property
+    def imgsz(self):
+        return self.reduced_imgsz if self.level >= LEVEL_LOW_RES else self.base_imgsz
+
+    @property
+    def keyframe_interval(self):
+        return self.degraded_keyframe_interval if self.level >= LEVEL_SPARSE_KEYFRAMES else self.base_keyframe_interval
+
+    @property
+    def frame_stride(self):
+        return self.drop_stride if self.level >= LEVEL_DROP_FRAMES else 1
+
+    def _budget_for(self, level):
+        return self.budget * (self.drop_stride if level >= LEVEL_DROP_FRAMES else 1)
+
+    def should_process(self, frame_index):
+        """False per i frame da scartare al livello corrente."""
+        return frame_index % self.frame_stride == 0
+
+    # --- MISURA ---
+    def frame_cost(self):
+        """Costo stimato di un frame (s) secondo le medie correnti degli stadi."""
+        if not self._stage_ema:
+            return 0.0
+        values = self._stage_ema.values()
+        return max(values) if self.pipelined else sum(values)
+
+    def record(self, stage_name, seconds):
+        """Registra la latenza di uno stadio e aggiorna il livello se serve (thread-safe)."""
+        with self._lock:
+            previous = self._stage_ema.get(stage_name)
+            if previous is None:
+                self._stage_ema[stage_name] = seconds
+            else:
+                self._stage_ema[stage_name] = previous + self.smoothing * (seconds - previous)
+            self._evaluate(time.perf_counter())
+
+    def _evaluate(self, now):
+        elapsed = 0.0 if self._last_eval is None else now - self._last_eval
+        self._last_eval = now
+        self.time_at_level[self.level] += elapsed
+
+        cost = self.frame_cost()
+        if cost > self._budget_for(self.level):
+            self.time_over_budget += elapsed
+            self._under_since = None
+            if self._over_since is None:
+                self._over_since = now
+            elif now - self._over_since >= self.degrade_after and self.level < self.max_level:
+                self._set_level(self.level + 1, now)
+        elif cost < self.headroom * self._budget_for(max(LEVEL_FULL, self.level - 1)):
+            self._over_since = None
+            if self._under_since is None:
+                self._under_since = now
+            elif now - self._under_since >= self.restore_after and self.level > LEVEL_FULL:
+                self._set_level(self.level - 1, now)
+        else:
+            # Nella fascia di isteresi: nessun cambio
+            self._over_since = None
+            self._under_since = None
+
+    def _set_level(self, level, now):
+        print(f"[QUALITY] Livello {LEVEL_NAMES[self.level]} -> {LEVEL_NAMES[level]} "
+              f"(costo frame {1000.0 * self.frame_cost():.1f} ms, budget {1000.0 * self.budget:.1f} ms)")
+        self.level = level
+        self.level_changes += 1
+        self._over_since = now if self._over_since is not None else None
+        self._under_since = now if self._under_since is not None else None
+
+    def get_stats(self):
+        """Livello corrente, costo stimato vs budget, tempo passato sopra budget e per livello."""
+        with self._lock:
+            return {
+                "level": self.level,
+                "level_name": LEVEL_NAMES[self.level],
+                "level_changes": self.level_changes,
+                "budget_ms": 1000.0 * self.budget,
+                "frame_cost_ms": 1000.0 * self.frame_cost(),
+                "stage_ms": {name: 1000.0 * value for name, value in self._stage_ema.items()},
+                "time_over_budget_s": self.time_over_budget,
+                "time_at_level_s": dict(zip(LEVEL_NAMES, self.time_at_level)),
+            }
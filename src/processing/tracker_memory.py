@@ -1,99 +1,337 @@
-import cv2
-import numpy as np
-
-class VisualMemory:
-    """
-    Implementa la logica TOOCM:
-    1. Aggiornamento Dinamico: Memorizza sempre l'ultima texture vista.
-    2. Recupero Storico: Cerca corrispondenze basate su posizione e colore precedente.
-    """
-    def __init__(self):
-        # Struttura: { id: {'hist': istogramma, 'center': (x,y), 'frames_lost': 0} }
-        self.history = {}
-        
-        # PARAMETRI DI RECUPERO (Vanishing Feature Recovery)
-        # Se l'oggetto si sposta di max 150px mentre è "perso", lo consideriamo lo stesso.
-        self.max_distance = 150 
-        # Soglia somiglianza colore (0.0 diverso, 1.0 identico).
-        self.color_threshold = 0.50 
-        # Quanti frame ricordiamo un oggetto "svanito" (Memory persistence)
-        self.max_frames_to_remember = 60 
-
-    def _get_color_hist(self, crop):
-        """Estrae la 'texture' sotto forma di istogramma colore."""
-        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
-        # Usiamo Hue e Saturation per essere robusti alla luce
-        hist = cv2.calcHist([hsv], [0, 1], None, [30, 32], [0, 180, 0, 256])
-        cv2.normalize(hist, hist, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
-        return hist
-
-    def update_memory(self, obj_id, crop, center):
-        """
-        PRINCIPIO 'DYNAMIC UPDATE'[cite: 14]:
-        Aggiorniamo costantemente la rappresentazione dell'oggetto.
-        Se l'auto gira o cambia luce, la memoria si adatta al nuovo aspetto.
-        """
-        if crop.size == 0: return
-        
-        hist = self._get_color_hist(crop)
-        self.history[obj_id] = {
-            'hist': hist,            # La "texture" corrente
-            'center': center,        # La posizione corrente
-            'frames_lost': 0         # È visibile, quindi 0 persi
-        }
-
-    def increment_lost_counters(self):
-        """Invecchia i ricordi (simula il passare del tempo t)."""
-        to_delete = []
-        for obj_id in self.history:
-            self.history[obj_id]['frames_lost'] += 1
-            # Se passa troppo tempo, dimentichiamo l'oggetto
-            if self.history[obj_id]['frames_lost'] > self.max_frames_to_remember:
-                to_delete.append(obj_id)
-        
-        for obj_id in to_delete:
-            del self.history[obj_id]
-
-    def find_match(self, new_crop, new_center):
-        """
-        PRINCIPIO 'VANISHING FEATURE RECOVERY'[cite: 447]:
-        Cerca tra gli oggetti persi (frames_lost > 0) quello più simile
-        per posizione e texture.
-        """
-        if new_crop.size == 0: return None
-
-        new_hist = self._get_color_hist(new_crop)
-        best_id = None
-        best_score = 0 
-
-        for old_id, data in self.history.items():
-            # Consideriamo solo oggetti che YOLO ha perso (frames_lost >= 1)
-            # Se frames_lost è 0, YOLO lo sta già tracciando, non serve intervenire.
-            if data['frames_lost'] < 1:
-                continue
-
-            # 1. Confronto Posizione (Spostamento nel tempo)
-            old_center = data['center']
-            dist = np.linalg.norm(np.array(old_center) - np.array(new_center))
-            
-            if dist > self.max_distance:
-                continue 
-
-            # 2. Confronto Texture (Istogramma)
-            color_sim = cv2.compareHist(data['hist'], new_hist, cv2.HISTCMP_CORREL)
-            
-            if color_sim < self.color_threshold:
-                continue 
-
-            # Punteggio combinato
-            score = color_sim + (1 - (dist / self.max_distance))
-
-            if score > best_score:
-                best_score = score
-                best_id = old_id
-
-        if best_id is not None:
-            print(f"✅ RECOVERY: ID {best_id} recuperato dalla memoria (Score: {best_score:.2f})")
-            return best_id
-
-        return None
\ No newline at end of file
+import cv2
+import numpy as np
+from collections import OrderedDict
+from scipy.optimize import linear_sum_assignment
+
+# Politiche di eliminazione quando la memoria è piena
+EVICT_OLDEST = "oldest"                     # l'oggetto non visto da più tempo
+EVICT_LEAST_MATCHABLE = "least-matchable"   # l'oggetto perso recuperato meno volte
+
+class VisualMemory:
+    """
+    Implementa la logica TOOCM:
+    1. Aggiornamento Dinamico: Memorizza sempre l'ultima texture vista.
+    2. Recupero Storico: Cerca corrispondenze basate su posizione e colore precedente.
+
+    La memoria è organizzata in array NumPy contigui (una riga per ID), così la ricerca
+    confronta tutti i candidati con un'unica operazione vettoriale invece di un ciclo Python.
+    Al posto dei contatori 'frames_lost' si salva il frame in cui l'oggetto è stato visto l'ultima volta:
+    far passare il tempo costa O(1) e gli oggetti scaduti si eliminano partendo dai più vecchi.
+    """
+    HIST_BINS = (30, 32)
+
+    def __init__(self, max_entries=256, eviction_policy=EVICT_OLDEST, feature_max_side=None):
+        if eviction_policy not in (EVICT_OLDEST, EVICT_LEAST_MATCHABLE):
+            raise ValueError(f"Politica di eliminazione sconosciuta: {eviction_policy}")
+        # Capacità massima: oltre questo numero di ID uno viene eliminato secondo eviction_policy
+        self.max_entries = max(1, int(max_entries))
+        self.eviction_policy = eviction_policy
+        # Se impostato, l'istogramma si calcola su una copia del ritaglio ridotta a questo lato massimo
+        self.feature_max_side = feature_max_side
+
+        # Struttura a righe: riga i -> (id, istogramma, centro, ultimo frame visto)
+        self._ids = []                 # riga -> id
+        # id -> riga, ordinato per ultimo frame visto (il primo è il ricordo più vecchio)
+        self._rows = OrderedDict()
+        size = int(np.prod(self.HIST_BINS))
+        # Istogrammi già centrati (media sottratta) e relativa somma dei quadrati:
+        # è tutto ciò che serve per la correlazione di cv2.compareHist(HISTCMP_CORREL)
+        self._hists = np.zeros((self.max_entries, size), dtype=np.float64)
+        self._hist_ss = np.zeros(self.max_entries, dtype=np.float64)
+        self._centers = np.zeros((self.max_entries, 2), dtype=np.float64)
+        self._last_seen = np.zeros(self.max_entries, dtype=np.int64)
+        self._match_hits = np.zeros(self.max_entries, dtype=np.int64)  # recuperi riusciti per riga
+
+        # Tempo della memoria: avanza di 1 a ogni increment_lost_counters()
+        self.frame_index = 0
+
+        # Statistiche
+        self.hits = 0          # rilevazioni associate a un ID perso
+        self.misses = 0        # rilevazioni senza corrispondenza
+        self.evictions = 0     # ID eliminati per capacità
+        self.expirations = 0   # ID dimenticati perché persi da troppo tempo
+
+        # PARAMETRI DI RECUPERO (Vanishing Feature Recovery)
+        # Se l'oggetto si sposta di max 150px mentre è "perso", lo consideriamo lo stesso.
+        self.max_distance = 150
+        # Soglia somiglianza colore (0.0 diverso, 1.0 identico).
+        self.color_threshold = 0.50
+        # Quanti frame ricordiamo un oggetto "svanito" (Memory persistence)
+        self.max_frames_to_remember = 60
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, obj_id):
+        return obj_id in self._rows
+
+    def frames_lost(self, obj_id):
+        """Da quanti frame l'oggetto non viene visto (None se non è in memoria)."""
+        row = self._rows.get(obj_id)
+        return None if row is None else int(self.frame_index - self._last_seen[row])
+
+    def get_stats(self):
+        """Statistiche della memoria: occupazione, recuperi, mancati recuperi, eliminazioni."""
+        return {
+            "size": len(self._ids),
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _get_color_hist(self, crop):
+        """Estrae la 'texture' sotto forma di istogramma colore."""
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+        # Usiamo Hue e Saturation per essere robusti alla luce
+        hist = cv2.calcHist([hsv], [0, 1], None, list(self.HIST_BINS), [0, 180, 0, 256])
+        cv2.normalize(hist, hist, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
+        return hist
+
+    def compute_feature(self, crop):
+        """
+        Descrittore di aspetto di un ritaglio: istogramma HS centrato e sua somma dei quadrati.
+        Va calcolato una sola volta per rilevazione e passato sia al recupero sia all'aggiornamento.
+        I ritagli grandi (veicoli vicini) vengono prima ridotti a feature_max_side, se impostato:
+        l'istogramma normalizzato cambia poco, la conversione HSV costa molto meno.
+        """
+        if crop is None or crop.size == 0:
+            return None
+        if self.feature_max_side:
+            h, w = crop.shape[:2]
+            scale = self.feature_max_side / max(h, w)
+            if scale < 1.0:
+                crop = cv2.resize(crop, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                  interpolation=cv2.INTER_AREA)
+        return self._center_hist(self._get_color_hist(crop))
+
+    @staticmethod
+    def _center_hist(hist):
+        """Istogramma appiattito e centrato, con la sua somma dei quadrati."""
+        flat = hist.ravel().astype(np.float64)
+        flat = flat - flat.mean()
+        return flat, float(flat @ flat)
+
+    def _remove_rows(self, rows):
+        """Rimuove le righe indicate spostando l'ultima riga al loro posto (O(1) per riga)."""
+        for row in sorted(rows, reverse=True):
+            last = len(self._ids) - 1
+            removed_id = self._ids[row]
+            if row != last:
+                moved_id = self._ids[last]
+                self._hists[row] = self._hists[last]
+                self._hist_ss[row] = self._hist_ss[last]
+                self._centers[row] = self._centers[last]
+                self._last_seen[row] = self._last_seen[last]
+                self._match_hits[row] = self._match_hits[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids.pop()
+            del self._rows[removed_id]
+
+    def update_memory(self, obj_id, crop, center, feature=None):
+        """
+        PRINCIPIO 'DYNAMIC UPDATE'[cite: 14]:
+        Aggiorniamo costantemente la rappresentazione dell'oggetto.
+        Se l'auto gira o cambia luce, la memoria si adatta al nuovo aspetto.
+        :param feature: descrittore già calcolato con compute_feature (evita di ricalcolarlo dal ritaglio).
+        """
+        if feature is None:
+            feature = self.compute_feature(crop)
+        if feature is None: return
+
+        hist, ss = feature
+        row = self._rows.get(obj_id)
+        if row is None:
+            if len(self._ids) >= self.max_entries:
+                self._evict()
+            row = len(self._ids)
+            self._ids.append(obj_id)
+            self._rows[obj_id] = row
+            self._match_hits[row] = 0
+        else:
+            self._rows.move_to_end(obj_id)
+
+        self._hists[row] = hist              # La "texture" corrente
+        self._hist_ss[row] = ss
+        self._centers[row] = center          # La posizione corrente
+        self._last_seen[row] = self.frame_index  # È visibile, quindi 0 frame persi
+
+    def keep_alive(self, obj_ids):
+        """
+        Segna come visti in questo frame oggetti che il detector non poteva vedere
+        (es. fuori dal ritaglio ROI): non invecchiano e non sono candidati al recupero.
+        """
+        for obj_id in obj_ids:
+            row = self._rows.get(obj_id)
+            if row is not None:
+                self._rows.move_to_end(obj_id)
+                self._last_seen[row] = self.frame_index
+
+    def merge_ids(self, old_id, new_id):
+        """
+        Unione di identità (vedi IdentityRegistry): il ricordo di old_id passa a new_id.
+        Se sono in memoria entrambi resta il più recente, con la somma dei recuperi.
+        """
+        old_row = self._rows.get(old_id)
+        if old_row is None:
+            return
+        new_row = self._rows.get(new_id)
+        if new_row is not None:
+            if self._last_seen[new_row] > self._last_seen[old_row]:
+                self._match_hits[new_row] += self._match_hits[old_row]
+                self._remove_rows([old_row])
+                return
+            hits = self._match_hits[new_row]
+            self._remove_rows([new_row])
+            old_row = self._rows[old_id]   # la riga può essere stata spostata dalla rimozione
+            self._match_hits[old_row] += hits
+        self._ids[old_row] = new_id
+        # Stessa posizione nell'ordine per ultimo frame visto (unioni rare: ricostruzione O(n) accettabile)
+        self._rows = OrderedDict((new_id if k == old_id else k, row) for k, row in self._rows.items())
+
+    def _evict(self):
+        """Libera una riga secondo la politica di eliminazione scelta."""
+        if self.eviction_policy == EVICT_LEAST_MATCHABLE:
+            n = len(self._ids)
+            lost = np.flatnonzero(self._last_seen[:n] < self.frame_index)
+            if lost.size:
+                # Meno recuperi prima; a parità, il più vecchio
+                order = np.lexsort((self._last_seen[lost], self._match_hits[lost]))
+                row = int(lost[order[0]])
+            else:
+                row = self._rows[next(iter(self._rows))]
+        else:
+            row = self._rows[next(iter(self._rows))]
+        self._remove_rows([row])
+        self.evictions += 1
+
+    def increment_lost_counters(self):
+        """
+        Invecchia i ricordi (simula il passare del tempo t).
+        Avanza solo l'orologio della memoria; si eliminano gli ID scaduti partendo dal più vecchio,
+        quindi il costo dipende dagli ID scaduti e non da quanti ne sono ricordati.
+        """
+        self.frame_index += 1
+        # Se passa troppo tempo, dimentichiamo l'oggetto
+        oldest_allowed = self.frame_index - self.max_frames_to_remember
+        expired = []
+        for obj_id, row in self._rows.items():
+            if self._last_seen[row] >= oldest_allowed:
+                break
+            expired.append(row)
+        if expired:
+            self._remove_rows(expired)
+            self.expirations += len(expired)
+
+    def _score_candidates(self, feature, new_center):
+        """
+        Punteggio combinato di TUTTI gli oggetti in memoria rispetto a una nuova rilevazione,
+        calcolato in un colpo solo. Le righe non ammissibili valgono -inf.
+        """
+        n = len(self._ids)
+        hist, ss = feature
+
+        # Consideriamo solo oggetti che YOLO ha perso (non visti nel frame corrente)
+        lost = self._last_seen[:n] < self.frame_index
+
+        # 1. Confronto Posizione (Spostamento nel tempo)
+        dist = np.linalg.norm(self._centers[:n] - np.asarray(new_center, dtype=np.float64), axis=1)
+
+        # 2. Confronto Texture: stessa formula di cv2.compareHist(HISTCMP_CORREL)
+        num = self._hists[:n] @ hist
+        denom = self._hist_ss[:n] * ss
+        safe = np.abs(denom) > np.finfo(np.float64).eps
+        color_sim = np.ones(n, dtype=np.float64)
+        color_sim[safe] = num[safe] / np.sqrt(denom[safe])
+
+        # Punteggio combinato
+        score = color_sim + (1 - (dist / self.max_distance))
+        valid = lost & (dist <= self.max_distance) & (color_sim >= self.color_threshold)
+        return np.where(valid, score, -np.inf)
+
+    def find_match(self, new_crop, new_center, feature=None):
+        """
+        PRINCIPIO 'VANISHING FEATURE RECOVERY'[cite: 447]:
+        Cerca tra gli oggetti persi (frames_lost > 0) quello più simile
+        per posizione e texture.
+        """
+        if not self._ids: return None
+        if feature is None:
+            feature = self.compute_feature(new_crop)
+        if feature is None: return None
+
+        scores = self._score_candidates(feature, new_center)
+        best = int(np.argmax(scores))
+        best_score = scores[best]
+
+        if best_score > 0:
+            self.hits += 1
+            self._match_hits[best] += 1
+            best_id = self._ids[best]
+            print(f"✅ RECOVERY: ID {best_id} recuperato dalla memoria (Score: {best_score:.2f})")
+            return best_id
+
+        self.misses += 1
+        return None
+
+    def find_matches(self, features, centers, exclude_ids=()):
+        """
+        Recupero TOOCM per un intero frame: costruisce un'unica matrice dei punteggi
+        (rilevazioni x oggetti persi) e la risolve come assegnamento globale (algoritmo ungherese).
+        Ogni ID perso può essere assegnato al massimo a una rilevazione e l'esito non dipende
+        dall'ordine delle rilevazioni.
+        :param features: descrittori (compute_feature) delle rilevazioni; None se il ritaglio è vuoto.
+        :param exclude_ids: ID già presenti nel frame (non recuperabili).
+        :return: dizionario {indice rilevazione: ID recuperato}.
+        """
+        n = len(self._ids)
+        det_rows = [i for i, feature in enumerate(features) if feature is not None]
+        if not det_rows:
+            return {}
+        if n == 0:
+            self.misses += len(det_rows)
+            return {}
+
+        new_hists = np.empty((len(det_rows), self._hists.shape[1]), dtype=np.float64)
+        new_ss = np.empty(len(det_rows), dtype=np.float64)
+        for k, i in enumerate(det_rows):
+            new_hists[k], new_ss[k] = features[i]
+        new_centers = np.asarray([centers[i] for i in det_rows], dtype=np.float64)
+
+        # Candidati: oggetti persi e non già visibili in questo frame
+        candidates = self._last_seen[:n] < self.frame_index
+        if exclude_ids:
+            for obj_id in exclude_ids:
+                row = self._rows.get(obj_id)
+                if row is not None:
+                    candidates[row] = False
+
+        dist = np.linalg.norm(new_centers[:, None, :] - self._centers[None, :n, :], axis=2)
+        num = new_hists @ self._hists[:n].T
+        denom = new_ss[:, None] * self._hist_ss[None, :n]
+        safe = np.abs(denom) > np.finfo(np.float64).eps
+        color_sim = np.ones_like(num)
+        color_sim[safe] = num[safe] / np.sqrt(denom[safe])
+
+        score = color_sim + (1 - (dist / self.max_distance))
+        valid = candidates[None, :] & (dist <= self.max_distance) & (color_sim >= self.color_threshold)
+        if not valid.any():
+            self.misses += len(det_rows)
+            return {}
+
+        # Massimizziamo il punteggio totale; le coppie non ammissibili hanno costo proibitivo
+        cost = np.where(valid, -score, 1e6)
+        det_idx, mem_idx = linear_sum_assignment(cost)
+
+        matches = {}
+        for k, row in zip(det_idx, mem_idx):
+            if valid[k, row]:
+                best_id = self._ids[row]
+                matches[det_rows[k]] = best_id
+                self._match_hits[row] += 1
+                print(f"✅ RECOVERY: ID {best_id} recuperato dalla memoria (Score: {score[k, row]:.2f})")
+        self.hits += len(matches)
+        self.misses += len(det_rows) - len(matches)
+        return matches
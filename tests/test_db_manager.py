@@ -0,0 +1,168 @@
+import time
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from src.data.db_manager import DBManager, DUPLICATE_KEY_ERROR
+
+
+class FakeCollection:
+    """Stand-in for a pymongo collection: records bulk writes, fails on demand."""
+    def __init__(self, documents=(), failures=(), reachable=True):
+        self.documents = list(documents)
+        self.reachable = reachable
+        self.indexes = []
+        self.batches = []
+        self.failures = list(failures)   # exceptions raised by the next calls, in order (None = succeed)
+
+    def _check_reachable(self):
+        if not self.reachable:
+            raise AutoReconnect("connection refused")
+
+    def create_index(self, key):
+        self._check_reachable()
+        self.indexes.append(key)
+
+    def find(self, query, projection):
+        self._check_reachable()
+        return [dict(doc) for doc in self.documents if "plate" in doc]
+
+    def bulk_write(self, operations, ordered=True):
+        failure = self.failures.pop(0) if self.failures else None
+        if failure is not None:
+            raise failure
+        self.batches.append(list(operations))
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def make_manager(collection, **kwargs):
+    kwargs.setdefault("flush_interval", 60.0)
+    return DBManager(collection=collection, **kwargs)
+
+
+def bulk_error(index, code, n_inserted=0):
+    return BulkWriteError({
+        "writeErrors": [{"index": index, "code": code, "errmsg": "error"}],
+        "nInserted": n_inserted, "nUpserted": 0, "nModified": 0,
+    })
+
+
+def test_writes_are_buffered_until_flush():
+    collection = FakeCollection()
+    db = make_manager(collection, flush_size=10)
+    for i in range(3):
+        db.save_detection({"track_id": i})
+    assert collection.batches == []
+
+    db.flush()
+    assert len(collection.batches) == 1
+    assert [op._doc["track_id"] for op in collection.batches[0]] == [0, 1, 2]
+    db.close()
+
+
+def test_flush_on_size():
+    collection = FakeCollection()
+    db = make_manager(collection, flush_size=3)
+    for i in range(3):
+        db.save_detection({"track_id": i})
+    assert wait_until(lambda: collection.batches)
+    assert len(collection.batches[0]) == 3
+    db.close()
+
+
+def test_flush_on_interval():
+    collection = FakeCollection()
+    db = make_manager(collection, flush_size=100, flush_interval=0.05)
+    db.update_object_plate(1, "AB123CD")
+    assert wait_until(lambda: collection.batches)
+    assert isinstance(collection.batches[0][0], UpdateOne)
+    db.close()
+
+
+def test_plate_index_warmed_from_collection_and_updated_locally():
+    collection = FakeCollection(documents=[{"track_id": 4, "plate": "AB123CD"},
+                                           {"track_id": 9, "plate": "AB123CD"},
+                                           {"track_id": 5, "plate": "EF456GH"}])
+    db = make_manager(collection, flush_interval=0.01)
+    assert wait_until(lambda: db.ready)
+    assert collection.indexes == ["plate", "track_id"]
+    assert db.get_object_id_by_plate("AB123CD") == 4  # il primo documento trovato vince
+    assert db.get_object_id_by_plate("EF456GH") == 5
+
+    db.update_object_plate(5, "ZZ999ZZ")
+    assert db.get_object_id_by_plate("ZZ999ZZ") == 5
+    assert db.get_object_id_by_plate("EF456GH") is None
+    db.close()
+
+
+def test_constructor_does_no_io_and_warm_up_is_retried():
+    collection = FakeCollection(reachable=False)
+    start = time.perf_counter()
+    db = make_manager(collection, flush_interval=0.01)
+    assert time.perf_counter() - start < 0.5
+    db.update_object_plate(3, "AB123CD")
+    assert db.get_object_id_by_plate("AB123CD") == 3
+    time.sleep(0.05)
+    assert not db.ready and collection.batches == []
+
+    # Il server torna raggiungibile: indici e indice targhe vengono caricati, i dati locali restano
+    collection.reachable = True
+    collection.documents = [{"track_id": 3, "plate": "OLD0000"}, {"track_id": 8, "plate": "XY000ZZ"}]
+    assert wait_until(lambda: db.ready and collection.batches)
+    assert db.get_object_id_by_plate("AB123CD") == 3
+    assert db.get_object_id_by_plate("OLD0000") is None
+    assert db.get_object_id_by_plate("XY000ZZ") == 8
+    db.close()
+
+
+def test_failed_flush_is_retried():
+    collection = FakeCollection(failures=[AutoReconnect("connection reset")])
+    db = make_manager(collection)
+    db.save_detection({"track_id": 1})
+    db.save_detection({"track_id": 2})
+
+    db.flush()
+    assert collection.batches == []
+    db.flush()
+    assert [op._doc["track_id"] for op in collection.batches[0]] == [1, 2]
+    db.close()
+
+
+def test_partial_bulk_failure_resends_only_the_unapplied_tail():
+    # Le prime due operazioni sono state applicate, la terza è rifiutata
+    collection = FakeCollection(failures=[bulk_error(2, 121, n_inserted=2)])
+    db = make_manager(collection)
+    for i in range(5):
+        db.save_detection({"track_id": i})
+
+    db.flush()
+    assert [[op._doc["track_id"] for op in batch] for batch in collection.batches] == [[3, 4]]
+    assert db.dropped_writes == 1
+    db.close()
+
+
+def test_duplicate_key_after_interrupted_flush_is_dropped():
+    # Primo tentativo interrotto dopo aver scritto il primo documento: al nuovo invio
+    # la sua InsertOne (con lo stesso _id) dà duplicate key e non va rimandata
+    collection = FakeCollection(failures=[AutoReconnect("connection reset"),
+                                          bulk_error(0, DUPLICATE_KEY_ERROR)])
+    db = make_manager(collection)
+    for i in range(3):
+        db.save_detection({"track_id": i})
+
+    db.flush()
+    db.flush()
+    assert [[op._doc["track_id"] for op in batch] for batch in collection.batches] == [[1, 2]]
+    assert isinstance(collection.batches[0][0], InsertOne)
+    assert db.dropped_writes == 0
+    with db._lock:
+        assert db._pending == []
+    db.close()
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from src.data.detection_history import DetectionHistory, FileHistoryBackend, MongoHistoryBackend
+
+
+def track(obj_id, state_name="SAFE", ttc=float('inf')):
+    return SimpleNamespace(id=obj_id, info={'bbox': (10, 20, 110, 90), 'class_id': 2},
+                           state=SimpleNamespace(name=state_name), ttc=ttc)
+
+
+def record_run(path, states):
+    history = DetectionHistory(FileHistoryBackend(str(path)), chunk_frames=2)
+    for frame, state_name in enumerate(states, start=1):
+        history.record(frame, [track(1, state_name, ttc=12.0)])
+    return history
+
+
+def test_queries_are_scoped_to_the_current_run(tmp_path):
+    path = tmp_path / "history.jsonl"
+    first = record_run(path, ["SAFE", "DANGER", "DANGER", "SAFE"])
+    first.close()
+
+    # Stesso file, nuova esecuzione: ID e indici di frame ripartono da capo
+    second = record_run(path, ["SAFE", "SAFE", "DANGER"])
+    assert second.run_id != first.run_id
+    assert [row["frame"] for row in second.trajectory(1)] == [1, 2, 3]
+    assert len(second.frame_range(1, 4)) == 3
+    assert [(e["frame_start"], e["frame_end"]) for e in second.danger_episodes()] == [(3, 3)]
+
+    # Le esecuzioni precedenti restano interrogabili con il loro run_id
+    assert [(e["frame_start"], e["frame_end"]) for e in second.danger_episodes(run_id=first.run_id)] == [(2, 3)]
+    assert len(second.trajectory(1, run_id=first.run_id)) == 4
+    second.close()
+
+
+class FakeCollection:
+    """Collection finta: finché reachable è False ogni operazione fallisce come un server spento."""
+    def __init__(self):
+        self.reachable = False
+        self.indexes = []
+        self.documents = []
+
+    def _check(self):
+        if not self.reachable:
+            raise ConnectionError("server selection timeout")
+
+    def create_index(self, keys):
+        self._check()
+        self.indexes.append(keys)
+
+    def insert_many(self, documents, ordered=True):
+        self._check()
+        self.documents.extend(documents)
+
+
+def test_mongo_backend_prepares_indexes_on_the_writer_thread():
+    collection = FakeCollection()
+    # Il costruttore non tocca il server: con Mongo spento l'avvio non si blocca
+    history = DetectionHistory(MongoHistoryBackend(collection=collection), chunk_frames=1)
+    history.record(1, [track(1)])
+    history.record(2, [track(1)])
+    history.flush()
+    assert collection.indexes == [] and history.chunks_written == 0
+
+    # Server di nuovo raggiungibile: gli indici vengono creati al tentativo successivo
+    collection.reachable = True
+    history.record(3, [track(1)])
+    history.flush()
+    assert len(collection.indexes) == 3
+    assert history.chunks_written == 1
@@ -0,0 +1,88 @@
+import sys
+import threading
+
+from src.behavior.risk_observer import TrackManager, Observer
+from src.processing.identity_registry import IdentityRegistry
+
+FRAME_W, FRAME_H = 1280, 720
+
+
+class RecordingObserver(Observer):
+    def __init__(self):
+        self.events = []
+
+    def update(self, event_type, track_id, message=""):
+        self.events.append((event_type, track_id))
+
+
+def detection(obj_id, x=600):
+    return {'id': obj_id, 'bbox': (x, 400, x + 80, 460), 'center': (x + 40, 430)}
+
+
+def test_merge_and_update_tracks_do_not_deadlock():
+    identity = IdentityRegistry()
+    manager = TrackManager()
+    manager.identity = identity
+    # Un componente che prende il proprio lock nel callback, mentre l'altro thread
+    # chiama resolve() tenendo lo stesso lock: l'ordine dei lock non deve invertirsi
+    identity.on_merge(manager.merge_ids)
+    rounds = 2000
+    errors = []
+
+    def merger():
+        try:
+            for i in range(rounds):
+                identity.merge(2 * i + 1, 2 * i)
+        except Exception as e:
+            errors.append(e)
+
+    def updater():
+        try:
+            for i in range(rounds):
+                manager.update_tracks([detection(2 * i + 1), detection(2 * i + 3, x=200)], FRAME_W, FRAME_H)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=merger, daemon=True), threading.Thread(target=updater, daemon=True)]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # cambi di thread frequenti: l'interleaving critico capita subito
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=30)
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert not any(t.is_alive() for t in threads), "merge / update_tracks deadlock"
+    assert not errors
+
+
+def test_update_tracks_applies_pending_merges():
+    identity = IdentityRegistry()
+    manager = TrackManager()
+    manager.identity = identity
+    observer = RecordingObserver()
+    manager.attach(observer)
+
+    manager.update_tracks([detection(7)], FRAME_W, FRAME_H)
+    track = manager.tracks[7]
+    identity.merge(7, 3)  # nessun callback: il manager si riallinea al frame successivo
+    manager.update_tracks([detection(7)], FRAME_W, FRAME_H)
+
+    assert list(manager.tracks) == [3]
+    assert manager.tracks[3] is track and track.id == 3
+    assert observer.events == [("NEW_TRACK", 7), ("MERGED", 7)]
+
+
+def test_merge_into_active_track_notifies_merged_old_id():
+    manager = TrackManager()
+    observer = RecordingObserver()
+    manager.attach(observer)
+    manager.update_tracks([detection(1), detection(2, x=200)], FRAME_W, FRAME_H)
+
+    manager.merge_ids(1, 2)
+
+    assert list(manager.tracks) == [2]
+    # 1 prosegue come 2, che resta attiva: nessun LOST_TRACK
+    assert observer.events[-1] == ("MERGED", 1)
+    assert ("LOST_TRACK", 2) not in observer.events
@@ -0,0 +1,20 @@
+import time
+
+from src.processing.ocr_queue import OcrTask, PriorityOcrQueue, ocr_priority
+
+
+def task(obj_id, state_name, quality=1.0):
+    return OcrTask(None, obj_id, ocr_priority(state_name, quality, False), quality)
+
+
+def test_danger_track_is_eligible_on_its_first_candidate():
+    queue = PriorityOcrQueue(window=5, max_wait=1.0)
+    queue.put(task(1, "SAFE"))
+    queue.put(task(2, "DANGER"))
+
+    # Nessuna attesa della finestra per la traccia in pericolo
+    start = time.perf_counter()
+    assert queue.get(timeout=0.5).obj_id == 2
+    assert time.perf_counter() - start < 0.1
+    # La traccia SAFE invece aspetta ancora altri candidati (o max_wait)
+    assert queue.get(timeout=0.05) is None
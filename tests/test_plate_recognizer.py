@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+from src.processing import plate_recognizer as plate_recognizer_module
+from src.processing.plate_recognizer import PlateRecognizer
+
+
+class FakeDB:
+    def get_object_id_by_plate(self, plate_text):
+        return None
+
+    def update_object_plate(self, obj_id, plate_text):
+        pass
+
+
+def fake_ocr_batch(vehicle_crops, localize=True):
+    # OCR lento e sempre d'accordo: nel frattempo arrivano altri crop identici
+    time.sleep(0.02)
+    return [("AB123CD", None) for _ in vehicle_crops]
+
+
+def test_static_crop_still_reaches_confirmation(monkeypatch):
+    monkeypatch.setattr(plate_recognizer_module, "_init_ocr_worker", lambda languages: None)
+    monkeypatch.setattr(plate_recognizer_module, "_ocr_worker_batch", fake_ocr_batch)
+    recognizer = PlateRecognizer(num_workers=0, candidate_window=1, batch_size=1, db_manager=FakeDB())
+
+    # Veicolo seguito a distanza costante: ogni frame produce esattamente lo stesso crop
+    frame = np.random.default_rng(0).integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    deadline = time.perf_counter() + 5.0
+    while 7 not in recognizer.get_confirmed_plates() and time.perf_counter() < deadline:
+        recognizer.add_to_queue(frame, 7, (50, 50, 250, 200), state_name="DANGER")
+        time.sleep(0.005)
+
+    assert recognizer.get_confirmed_plates().get(7) == "AB123CD"
+    # I duplicati sono comunque scartati finché il crop precedente è in lettura
+    assert recognizer.skipped_duplicates > 0
+    recognizer.ocr_available = False
@@ -0,0 +1,93 @@
+import math
+import random
+
+from src.behavior.risk_observer import TrackManager, Observer
+
+FRAME_W, FRAME_H = 1280, 720
+
+
+def approaching(frame):
+    """Veicolo in corsia con area che cresce linearmente con i frame della sorgente."""
+    area = 4000 + 400 * frame
+    side = math.sqrt(area)
+    x1, y1 = 640 - side / 2, 400 - side / 2
+    return {'id': 1, 'bbox': (x1, y1, x1 + side, y1 + side), 'center': (640, 400)}
+
+
+def test_ttc_is_measured_in_source_frames_when_frames_are_dropped():
+    for vectorized in (True, False):
+        every_frame = TrackManager(vectorized=vectorized)
+        for frame in range(1, 41):
+            every_frame.update_tracks([approaching(frame)], FRAME_W, FRAME_H)
+
+        every_other = TrackManager(vectorized=vectorized)
+        for frame in range(2, 41, 2):
+            every_other.update_tracks([approaching(frame)], FRAME_W, FRAME_H, frame_gap=2)
+
+        expected = every_frame.tracks[1].ttc
+        assert math.isfinite(expected)
+        assert math.isclose(every_other.tracks[1].ttc, expected, rel_tol=1e-9)
+
+
+class RecordingObserver(Observer):
+    def __init__(self):
+        self.events = []
+
+    def update(self, event_type, track_id, message=""):
+        self.events.append((event_type, track_id, message))
+
+
+def random_frames(num_frames, seed=0):
+    """Tracce che entrano, escono, si avvicinano e cambiano corsia, con qualche ID ripetuto nel frame."""
+    rng = random.Random(seed)
+    boxes = {}
+    frames = []
+    for _ in range(num_frames):
+        for obj_id in list(boxes):
+            if rng.random() < 0.03:
+                del boxes[obj_id]
+        while len(boxes) < 6 and rng.random() < 0.3:
+            w, h = rng.uniform(40, 200), rng.uniform(30, 150)
+            boxes[rng.randint(1, 40)] = [rng.uniform(0, FRAME_W - w), rng.uniform(200, FRAME_H - h), w, h]
+        detections = []
+        for obj_id, box in boxes.items():
+            growth = rng.uniform(0.97, 1.12)
+            box[2], box[3] = min(box[2] * growth, FRAME_W * 0.8), min(box[3] * growth, FRAME_H * 0.8)
+            box[0] = min(max(0.0, box[0] + rng.uniform(-15, 15)), FRAME_W - box[2])
+            x1, y1, w, h = box
+            det = {'id': obj_id, 'bbox': (int(x1), int(y1), int(x1 + w), int(y1 + h)),
+                   'center': (int(x1 + w / 2), int(y1 + h / 2))}
+            detections.append(det)
+        if detections and rng.random() < 0.05:
+            detections.append(dict(detections[0]))
+        frames.append(detections)
+    return frames
+
+
+def replay(vectorized, frames):
+    manager = TrackManager(vectorized=vectorized)
+    observer = RecordingObserver()
+    manager.attach(observer)
+    history = []
+    for detections in frames:
+        manager.update_tracks([dict(det) for det in detections], FRAME_W, FRAME_H)
+        history.append((sorted((obj.id, obj.state.name, obj.ttc) for obj in manager.get_tracks()),
+                        list(observer.events)))
+        observer.events.clear()
+    return history
+
+
+def test_vectorized_evaluation_matches_per_object_update():
+    for seed in range(3):
+        frames = random_frames(400, seed=seed)
+        vectorized, per_object = replay(True, frames), replay(False, frames)
+        states_seen = {state for tracks, _ in vectorized for _, state, _ in tracks}
+        assert states_seen == {"SAFE", "WARNING", "DANGER"}
+        for frame, (expected, actual) in enumerate(zip(per_object, vectorized)):
+            expected_tracks, expected_events = expected
+            actual_tracks, actual_events = actual
+            assert len(actual_tracks) == len(expected_tracks), frame
+            for (id_a, state_a, ttc_a), (id_b, state_b, ttc_b) in zip(actual_tracks, expected_tracks):
+                assert (id_a, state_a) == (id_b, state_b), frame
+                assert ttc_a == ttc_b or math.isclose(ttc_a, ttc_b, rel_tol=1e-9), frame
+            assert actual_events == expected_events, frame
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import numpy as np
+
+from src.input_ouput import video_writer as video_writer_module
+from src.input_ouput.hud_renderer import HudRenderer
+from src.input_ouput.video_writer import AsyncVideoWriter
+
+DISPLAY_SIZE = (64, 48)
+
+
+class SlowVideoWriter:
+    """Finto cv2.VideoWriter lento: registra il contenuto del frame all'inizio e alla fine della codifica."""
+    def __init__(self, *args, **kwargs):
+        self.written = []
+        self.lock = threading.Lock()
+
+    def isOpened(self):
+        return True
+
+    def write(self, frame):
+        before = frame.copy()
+        time.sleep(0.005)
+        with self.lock:
+            self.written.append((before, frame.copy()))
+
+    def release(self):
+        pass
+
+
+def test_slow_writer_never_sees_overwritten_or_reordered_frames(monkeypatch):
+    monkeypatch.setattr(video_writer_module.cv2, "VideoWriter", SlowVideoWriter)
+    hud = HudRenderer(DISPLAY_SIZE, num_buffers=2)
+    writer = AsyncVideoWriter("unused.mp4", 25, DISPLAY_SIZE, queue_size=4, on_done=hud.recycle)
+
+    # Il renderer è molto più veloce del writer: la coda si riempie e alcuni frame vengono scartati
+    accepted = []
+    for value in range(1, 60):
+        frame = np.full((DISPLAY_SIZE[1], DISPLAY_SIZE[0], 3), value, dtype=np.uint8)
+        if writer.write(hud.render(frame, [])):
+            accepted.append(value)
+    writer.release()
+
+    values = []
+    for before, after in writer.writer.written:
+        # Nessun buffer è stato riscritto durante la codifica e ogni frame è integro
+        assert np.array_equal(before, after)
+        assert (before == before.flat[0]).all()
+        values.append(int(before.flat[0]))
+    assert values == accepted
+    assert writer.frames_dropped > 0
+    # Tutti i buffer sono tornati al renderer, che ne ha allocati solo quanti ne servivano in coda
+    assert len(hud._free) == hud.buffers_allocated
+    assert hud.buffers_allocated <= writer.queue_size + 2